@@ -0,0 +1,453 @@
+#!/usr/bin/env python3
+"""
+Kebabalab Server Microbenchmarks
+================================
+Times the server's hot paths in-process: NLP parsers, pricing, cart and
+SMS formatting, session reads/writes (memory and Redis), modification
+normalisation and webhook dispatch.
+
+Usage:
+    python benchmarks/bench.py                       # run and print
+    python benchmarks/bench.py --save baseline.json  # save a JSON baseline
+    python benchmarks/bench.py --compare baseline.json [--threshold 10]
+    python benchmarks/bench.py --filter parse_ --quick
+
+--compare exits 1 when any benchmark's median is more than --threshold
+percent slower than in the baseline. Compare baselines taken on the same
+machine; numbers from different hardware aren't comparable.
+
+The Redis session benchmarks use REDIS_HOST when a server answers, fall
+back to fakeredis if it's installed, and are skipped otherwise.
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.dirname(BENCH_DIR)
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from kebabalab import server  # noqa: E402
+from kebabalab.cart import dumps_cart, loads_cart  # noqa: E402
+from kebabalab.menu_index import MenuIndex, compile_menu, load_menu_index  # noqa: E402
+
+PHRASES = [
+    "large chicken kebab with lettuce tomato and garlic sauce",
+    "small lamb hsp no onion extra cheese and chilli",
+    "2 large mix kebabs with everything and bbq",
+    "falafel kebab with tabouli hummus and sweet chilli",
+    "three small chips and a coke",
+]
+
+MODIFICATIONS = [
+    {"size": "large", "salads": ["lettuce", "tomato"], "sauces": "garlic, chilli"},
+    [{"protein": "lamb"}, ("extras", ["cheese"])],
+    '{"quantity": 2, "sauces": ["bbq"]}',
+]
+
+
+class SkipBenchmark(Exception):
+    pass
+
+
+class Benchmark(NamedTuple):
+    name: str
+    # Returns (the function to time, teardown)
+    setup: Callable[[], Tuple[Callable[[], Any], Callable[[], None]]]
+
+
+def _no_teardown() -> None:
+    pass
+
+
+def _request_context(payload: Optional[Dict[str, Any]] = None):
+    payload = payload or {"message": {"call": {"id": "bench-call", "customer": {"number": "+61400000000"}}}}
+    ctx = server.app.test_request_context(json=payload)
+    ctx.push()
+    return ctx
+
+
+def _sample_cart() -> List[Dict[str, Any]]:
+    ctx = _request_context()
+    try:
+        server.session_set("cart", [])
+        for phrase in ("large chicken kebab with lettuce and garlic", "small lamb hsp with cheese", "large chips", "coke"):
+            server.tool_quick_add_item({"description": phrase})
+        server.tool_convert_items_to_meals({"itemIndices": [0]})
+        return server.session_get("cart", [])
+    finally:
+        server.session_clear()
+        ctx.pop()
+
+
+# ----- benchmark definitions -----
+
+def _parser(func: Callable[[str], Any]) -> Callable:
+    def setup():
+        def run():
+            for phrase in PHRASES:
+                func(phrase)
+        return run, _no_teardown
+    return setup
+
+
+def _calculate_price():
+    items = [item for item in _sample_cart() if not item.get("is_combo")]
+
+    def run():
+        for item in items:
+            server.calculate_price(item)
+    return run, _no_teardown
+
+
+def _format_cart_item():
+    cart = _sample_cart()
+
+    def run():
+        for index, item in enumerate(cart):
+            server.format_cart_item(item, index)
+    return run, _no_teardown
+
+
+def _format_item_for_sms(compact: bool):
+    def setup():
+        cart = _sample_cart()
+
+        def run():
+            for item in cart:
+                server._format_item_for_sms(item, compact=compact)
+        return run, _no_teardown
+    return setup
+
+
+def _cart_codec(op: str):
+    def setup():
+        cart = _sample_cart()
+        text = dumps_cart(cart)
+
+        def run():
+            if op == "dumps":
+                dumps_cart(cart)
+            else:
+                loads_cart(text)
+        return run, _no_teardown
+    return setup
+
+
+def _menu_load(source: str):
+    """Cold start of one menu: JSON parse + index build, or the compiled artifact"""
+    def setup():
+        tmp_dir = tempfile.mkdtemp(prefix="bench-menu-")
+        menu_file = os.path.join(tmp_dir, "menu.json")
+        with open(server.MENU_FILE, "rb") as src, open(menu_file, "wb") as dst:
+            dst.write(src.read())
+        compile_menu(menu_file)
+
+        def run():
+            if source == "json":
+                with open(menu_file, "r", encoding="utf-8") as f:
+                    MenuIndex.from_menu(json.load(f))
+            else:
+                load_menu_index(menu_file, use_mmap=source == "mmap", write_back=False)
+
+        def teardown():
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        return run, teardown
+    return setup
+
+
+def _normalise_modifications():
+    def run():
+        for raw in MODIFICATIONS:
+            server._normalise_modifications(raw)
+    return run, _no_teardown
+
+
+def _use_session_backend(client) -> Callable[[], None]:
+    """Point the server's sessions at ``client`` (None = memory); returns a restore function"""
+    saved = (server.REDIS_CLIENT, server._REDIS_CHECKED, server.redis)
+    server.REDIS_CLIENT, server._REDIS_CHECKED = client, True
+    if client is not None and server.redis is None:
+        import redis
+        server.redis = redis
+
+    def restore():
+        server.REDIS_CLIENT, server._REDIS_CHECKED, server.redis = saved
+    return restore
+
+
+def _redis_client():
+    try:
+        import redis
+    except ImportError:
+        return None, None
+    try:
+        client = redis.Redis(
+            host=os.getenv("REDIS_HOST", "localhost"),
+            port=int(os.getenv("REDIS_PORT", "6379")),
+            db=int(os.getenv("REDIS_DB", "0")),
+            password=os.getenv("REDIS_PASSWORD") or None,
+            decode_responses=True,
+            socket_connect_timeout=0.5,
+        )
+        client.ping()
+        return client, "redis"
+    except Exception:
+        pass
+    try:
+        import fakeredis
+    except ImportError:
+        return None, None
+    return fakeredis.FakeRedis(decode_responses=True), "fakeredis"
+
+
+SESSION_BACKEND: Dict[str, str] = {}
+
+
+def _session(backend: str, op: str):
+    def setup():
+        if backend == "memory":
+            client = None
+        else:
+            client, kind = _redis_client()
+            if client is None:
+                raise SkipBenchmark("no Redis server and fakeredis not installed")
+            SESSION_BACKEND["redis"] = kind
+        restore = _use_session_backend(client)
+        ctx = _request_context()
+        cart = _sample_cart()
+        server.session_set("cart", cart)
+
+        def run():
+            if op == "get":
+                server.session_get("cart")
+            else:
+                server.session_set("cart", cart)
+
+        def teardown():
+            server.session_clear()
+            ctx.pop()
+            restore()
+        return run, teardown
+    return setup
+
+
+def _webhook(tool: str):
+    def setup():
+        restore = _use_session_backend(None)
+        payload = {
+            "message": {
+                "type": "tool-calls",
+                "toolCalls": [{"id": "bench", "type": "function", "function": {"name": tool, "arguments": "{}"}}],
+                "call": {"id": "bench-webhook", "customer": {"number": "+61400000001"}},
+            }
+        }
+        ctx = _request_context(payload)
+        server.session_set("cart", _sample_cart())
+
+        def run():
+            server.webhook()
+
+        def teardown():
+            server.session_clear()
+            ctx.pop()
+            restore()
+        return run, teardown
+    return setup
+
+
+BENCHMARKS: List[Benchmark] = [
+    Benchmark("parse_protein", _parser(server.parse_protein)),
+    Benchmark("parse_size", _parser(server.parse_size)),
+    Benchmark("parse_salads", _parser(server.parse_salads)),
+    Benchmark("parse_sauces", _parser(server.parse_sauces)),
+    Benchmark("parse_extras", _parser(server.parse_extras)),
+    Benchmark("parse_quantity", _parser(server.parse_quantity)),
+    Benchmark("calculate_price", _calculate_price),
+    Benchmark("format_cart_item", _format_cart_item),
+    Benchmark("format_item_for_sms", _format_item_for_sms(False)),
+    Benchmark("format_item_for_sms_compact", _format_item_for_sms(True)),
+    Benchmark("normalise_modifications", _normalise_modifications),
+    Benchmark("cart_dumps", _cart_codec("dumps")),
+    Benchmark("cart_loads", _cart_codec("loads")),
+    Benchmark("menu_load_json", _menu_load("json")),
+    Benchmark("menu_load_compiled", _menu_load("artifact")),
+    Benchmark("menu_load_compiled_mmap", _menu_load("mmap")),
+    Benchmark("session_get_memory", _session("memory", "get")),
+    Benchmark("session_set_memory", _session("memory", "set")),
+    Benchmark("session_get_redis", _session("redis", "get")),
+    Benchmark("session_set_redis", _session("redis", "set")),
+    Benchmark("webhook_get_cart_state", _webhook("getCartState")),
+    Benchmark("webhook_price_cart", _webhook("priceCart")),
+]
+
+
+# ----- harness -----
+
+
+def time_function(func: Callable[[], Any], repeat: int = 5, min_time: float = 0.1) -> Dict[str, Any]:
+    """
+    Time ``func`` like timeit: pick a loop count so one repeat takes at
+    least ``min_time`` seconds, then report per-call times over ``repeat``
+    repeats in microseconds.
+    """
+    func()  # warm caches and lazy loads
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or loops >= 1_000_000:
+            break
+        loops *= 10 if elapsed < min_time / 10 else 2
+
+    samples = [elapsed / loops]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(loops):
+            func()
+        samples.append((time.perf_counter() - start) / loops)
+
+    return {
+        "median_us": round(statistics.median(samples) * 1e6, 3),
+        "min_us": round(min(samples) * 1e6, 3),
+        "stdev_us": round(statistics.pstdev(samples) * 1e6, 3),
+        "loops": loops,
+        "repeat": repeat,
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR, capture_output=True, text=True, timeout=5,
+        ).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def run_benchmarks(name_filter: Optional[str] = None, repeat: int = 5, min_time: float = 0.1) -> Dict[str, Any]:
+    saved_db, saved_limits = server.DB_FILE, server.RATE_LIMITS_ENABLED
+    server.RATE_LIMITS_ENABLED = False  # the webhook benchmarks replay one caller thousands of times
+    server.DB_FILE = os.path.join(tempfile.mkdtemp(prefix="kebabalab-bench-"), "orders.db")
+    server.init_database()
+    restore_sessions = _use_session_backend(None)  # memory unless a benchmark says otherwise
+    results: Dict[str, Any] = {}
+    skipped: Dict[str, str] = {}
+    try:
+        for bench in BENCHMARKS:
+            if name_filter and name_filter not in bench.name:
+                continue
+            try:
+                func, teardown = bench.setup()
+            except SkipBenchmark as reason:
+                skipped[bench.name] = str(reason)
+                continue
+            try:
+                results[bench.name] = time_function(func, repeat=repeat, min_time=min_time)
+            finally:
+                teardown()
+    finally:
+        restore_sessions()
+        server.DB_FILE, server.RATE_LIMITS_ENABLED = saved_db, saved_limits
+
+    return {
+        "meta": {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "redis_backend": SESSION_BACKEND.get("redis"),
+        },
+        "results": results,
+        "skipped": skipped,
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[Dict[str, Any]]:
+    """Per-benchmark change in median time versus ``baseline``; ``regressed`` marks slow-downs over ``threshold`` %"""
+    rows = []
+    base_results = baseline.get("results", {})
+    for name, result in current.get("results", {}).items():
+        base = base_results.get(name)
+        if not base or not base.get("median_us"):
+            rows.append({"name": name, "median_us": result["median_us"], "baseline_us": None,
+                         "change_pct": None, "regressed": False})
+            continue
+        change = (result["median_us"] - base["median_us"]) / base["median_us"] * 100.0
+        rows.append({
+            "name": name,
+            "median_us": result["median_us"],
+            "baseline_us": base["median_us"],
+            "change_pct": round(change, 1),
+            "regressed": change > threshold,
+        })
+    return rows
+
+
+def print_results(report: Dict[str, Any], rows: Optional[List[Dict[str, Any]]] = None) -> None:
+    print(f"\n{'benchmark':<32}{'median µs':>12}{'min µs':>12}{'stdev':>10}{'loops':>10}", end="")
+    print(f"{'baseline':>12}{'change':>10}" if rows is not None else "")
+    by_name = {row["name"]: row for row in rows or []}
+    for name, result in report["results"].items():
+        line = f"{name:<32}{result['median_us']:>12.2f}{result['min_us']:>12.2f}{result['stdev_us']:>10.2f}{result['loops']:>10}"
+        row = by_name.get(name)
+        if row is not None:
+            if row["baseline_us"] is None:
+                line += f"{'-':>12}{'new':>10}"
+            else:
+                flag = "  REGRESSED" if row["regressed"] else ""
+                line += f"{row['baseline_us']:>12.2f}{row['change_pct']:>+9.1f}%{flag}"
+        print(line)
+    for name, reason in report.get("skipped", {}).items():
+        print(f"{name:<32}  skipped: {reason}")
+    print()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Kebabalab server microbenchmarks")
+    parser.add_argument("--filter", default=None, help="Only run benchmarks whose name contains this")
+    parser.add_argument("--save", default=None, help="Write results to this JSON baseline file")
+    parser.add_argument("--compare", default=None, help="Compare against this JSON baseline file")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Regression threshold in percent")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.1, help="Minimum seconds per repeat")
+    parser.add_argument("--quick", action="store_true", help="Fewer, shorter repeats (noisier)")
+    args = parser.parse_args(argv)
+
+    repeat, min_time = (3, 0.02) if args.quick else (args.repeat, args.min_time)
+    report = run_benchmarks(args.filter, repeat=repeat, min_time=min_time)
+
+    rows = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            rows = compare(report, json.load(f), args.threshold)
+    print_results(report, rows)
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline written to {args.save}")
+
+    regressions = [row for row in rows or [] if row["regressed"]]
+    if regressions:
+        print(f"{len(regressions)} benchmark(s) regressed by more than {args.threshold:g}%: "
+              + ", ".join(row["name"] for row in regressions))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -58,24 +58,31 @@ echo ""
 
 # Kill any existing instances
 echo "Checking for existing server instances..."
-pkill -f server_simplified.py 2>/dev/null && echo "✓ Stopped old instance" || echo "✓ No existing instances"
+pkill -f "kebabalab serve" 2>/dev/null && echo "✓ Stopped old instance" || echo "✓ No existing instances"
 echo ""
 
 # Backup database before starting
 if [ -f data/orders.db ]; then
-    BACKUP_FILE="backups/orders.db.backup-$(date +%Y%m%d-%H%M%S)"
-    echo "Creating database backup: $BACKUP_FILE"
-    cp data/orders.db "$BACKUP_FILE"
-    echo "✓ Backup created"
+    echo "Creating database backup..."
+    python3 -m kebabalab backup --backup-dir backups && echo "✓ Backup created" || echo "⚠ Backup failed"
     echo ""
 fi
 
+# Key orders written before the customer_key column existed, for every shop (a no-op once done)
+python3 -m kebabalab backfill-customer-keys && echo "✓ Customer keys up to date" || echo "⚠ Customer key backfill failed"
+echo ""
+
+# Compile menus so workers start without parsing menu.json
+python3 -m kebabalab compile-menu && echo "✓ Menu compiled" || echo "⚠ Menu not compiled (workers will build it from JSON)"
+echo ""
+
 # Display configuration
 echo "=========================================="
 echo "Configuration:"
 echo "=========================================="
 echo "Environment: ${ENVIRONMENT:-production}"
 echo "Port: $PORT"
+echo "Workers: ${WEB_WORKERS:-$(nproc 2>/dev/null || echo 1)} x ${WEB_THREADS:-4} threads"
 echo "Log Level: ${LOG_LEVEL:-INFO}"
 echo "Log File: ${LOG_FILE:-logs/kebabalab_production.log}"
 echo "=========================================="
@@ -93,24 +100,6 @@ echo ""
 echo "Starting server..."
 echo ""
 
-# Choose how to run
-if command -v gunicorn &> /dev/null; then
-    echo "Using Gunicorn (production-grade)..."
-    # Run with gunicorn for production
-    gunicorn \
-        -w 4 \
-        -b 0.0.0.0:$PORT \
-        --timeout 120 \
-        --log-level ${LOG_LEVEL:-info} \
-        --access-logfile logs/access.log \
-        --error-logfile logs/error.log \
-        --capture-output \
-        --enable-stdio-inheritance \
-        server_simplified:app
-else
-    echo "Gunicorn not found, using Flask development server"
-    echo "For production, install gunicorn: pip install gunicorn"
-    echo ""
-    # Fallback to Flask development server
-    python3 server_simplified.py
-fi
+# Pre-forked workers: one per CPU core by default (WEB_WORKERS / WEB_THREADS to override).
+# SIGTERM lets in-flight requests finish for up to DRAIN_TIMEOUT seconds.
+exec python3 -m kebabalab serve --port "$PORT"
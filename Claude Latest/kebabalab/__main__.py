@@ -0,0 +1,5 @@
+"""Allow ``python -m kebabalab`` to run the server CLI."""
+
+from .server import main
+
+raise SystemExit(main())
@@ -0,0 +1,221 @@
+"""
+Monthly order archives
+======================
+
+Keeps ``orders.db`` small by moving old orders (and their line items) into
+per-month SQLite files such as ``orders-2025-03.db``. Archives are attached
+to an existing connection only when a history lookup needs them, newest
+month first, and detached again straight away.
+"""
+
+import glob
+import logging
+import os
+import re
+import sqlite3
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_PREFIX = "orders-"
+_MONTH_RE = re.compile(r"^orders-(\d{4}-\d{2})\.db$")
+
+# Tables moved by the rollover, parent first
+_ARCHIVED_TABLES = ("orders", "order_items")
+
+
+def archive_path(archive_dir: str, month: str) -> str:
+    """Return the archive file for a ``YYYY-MM`` month."""
+    return os.path.join(archive_dir, f"{ARCHIVE_PREFIX}{month}.db")
+
+
+def list_archives(archive_dir: str) -> List[Tuple[str, str]]:
+    """Return ``(month, path)`` pairs for existing archives, newest first."""
+    archives = []
+    for path in glob.glob(os.path.join(archive_dir, f"{ARCHIVE_PREFIX}*.db")):
+        match = _MONTH_RE.match(os.path.basename(path))
+        if match:
+            archives.append((match.group(1), path))
+    archives.sort(reverse=True)
+    return archives
+
+
+def _next_month(month: str) -> str:
+    year, mon = (int(part) for part in month.split("-"))
+    return f"{year + mon // 12:04d}-{mon % 12 + 1:02d}"
+
+
+def months_back(months: int, now: Optional[datetime] = None) -> str:
+    """Return the ``YYYY-MM`` month ``months`` calendar months before ``now``'s."""
+    now = now or datetime.now()
+    index = now.year * 12 + now.month - 1 - months
+    return f"{index // 12:04d}-{index % 12 + 1:02d}"
+
+
+def _table_exists(conn: sqlite3.Connection, schema: str, table: str) -> bool:
+    row = conn.execute(
+        f"SELECT 1 FROM {schema}.sqlite_master WHERE type = 'table' AND name = ?",
+        (table,),
+    ).fetchone()
+    return row is not None
+
+
+def _columns(conn: sqlite3.Connection, schema: str, table: str) -> List[Tuple[str, str]]:
+    return [(row[1], row[2]) for row in conn.execute(f"PRAGMA {schema}.table_info({table})")]
+
+
+def _ensure_archive_schema(conn: sqlite3.Connection) -> None:
+    """
+    Mirror hot table columns into the attached ``arc`` schema. Columns the
+    hot table gained since an archive was made are appended to it too, so
+    rows still copy across by position.
+    """
+    for table in _ARCHIVED_TABLES:
+        if not _table_exists(conn, "main", table):
+            continue
+        conn.execute(f"CREATE TABLE IF NOT EXISTS arc.{table} AS SELECT * FROM main.{table} WHERE 0")
+        archived = {name for name, _ in _columns(conn, "arc", table)}
+        for name, declared_type in _columns(conn, "main", table):
+            if name not in archived:
+                conn.execute(f"ALTER TABLE arc.{table} ADD COLUMN {name} {declared_type}")
+    conn.execute("CREATE INDEX IF NOT EXISTS arc.idx_arc_customer_phone ON orders(customer_phone, created_at)")
+    if any(name == "customer_key" for name, _ in _columns(conn, "arc", "orders")):
+        conn.execute("CREATE INDEX IF NOT EXISTS arc.idx_arc_customer_key ON orders(customer_key, created_at)")
+    if _table_exists(conn, "arc", "order_items"):
+        conn.execute("CREATE INDEX IF NOT EXISTS arc.idx_arc_order_items_order ON order_items(order_id)")
+
+
+def upgrade_archives(db_path: str, archive_dir: str) -> List[str]:
+    """Bring every archive's schema up to the hot database's; returns their paths, newest first."""
+    paths = [path for _month, path in list_archives(archive_dir)]
+    if not paths:
+        return paths
+    conn = sqlite3.connect(db_path, timeout=10.0, isolation_level=None)
+    try:
+        for path in paths:
+            conn.execute("ATTACH DATABASE ? AS arc", (path,))
+            try:
+                _ensure_archive_schema(conn)
+            finally:
+                conn.execute("DETACH DATABASE arc")
+    finally:
+        conn.close()
+    return paths
+
+
+def rollover_orders(
+    db_path: str,
+    archive_dir: str,
+    older_than_days: int,
+    now: Optional[datetime] = None,
+    vacuum: bool = False,
+) -> Dict[str, int]:
+    """
+    Move orders older than ``older_than_days`` into monthly archive files.
+
+    Each month is moved in a single transaction spanning the hot database
+    and the attached archive, so an order is never in both or neither.
+    ``created_at`` is stored as UTC ``YYYY-MM-DD HH:MM:SS`` by SQLite, so
+    the cutoff is compared in the same format.
+    """
+    os.makedirs(archive_dir, exist_ok=True)
+    now = now or datetime.utcnow()
+    cutoff = (now - timedelta(days=older_than_days)).strftime("%Y-%m-%d %H:%M:%S")
+    stats = {"orders": 0, "items": 0, "months": 0}
+
+    conn = sqlite3.connect(db_path, timeout=10.0, isolation_level=None)
+    try:
+        months = [
+            row[0]
+            for row in conn.execute(
+                "SELECT DISTINCT substr(created_at, 1, 7) FROM orders WHERE created_at < ? ORDER BY 1",
+                (cutoff,),
+            )
+            if row[0]
+        ]
+        has_items = _table_exists(conn, "main", "order_items")
+
+        for month in months:
+            conn.execute("ATTACH DATABASE ? AS arc", (archive_path(archive_dir, month),))
+            try:
+                _ensure_archive_schema(conn)
+                window = (f"{month}-01", _next_month(month) + "-01", cutoff)
+                where = "created_at >= ? AND created_at < ? AND created_at < ?"
+
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    moved = conn.execute(
+                        f"INSERT INTO arc.orders SELECT * FROM main.orders WHERE {where}", window
+                    ).rowcount
+                    items = 0
+                    if has_items:
+                        items = conn.execute(
+                            f"""
+                            INSERT INTO arc.order_items
+                            SELECT * FROM main.order_items
+                            WHERE order_id IN (SELECT id FROM main.orders WHERE {where})
+                            """,
+                            window,
+                        ).rowcount
+                        conn.execute(
+                            f"""
+                            DELETE FROM main.order_items
+                            WHERE order_id IN (SELECT id FROM main.orders WHERE {where})
+                            """,
+                            window,
+                        )
+                    conn.execute(f"DELETE FROM main.orders WHERE {where}", window)
+                    conn.execute("COMMIT")
+                except Exception:
+                    conn.execute("ROLLBACK")
+                    raise
+            finally:
+                conn.execute("DETACH DATABASE arc")
+
+            stats["orders"] += moved
+            stats["items"] += items
+            stats["months"] += 1
+            logger.info(f"Archived {moved} orders ({items} items) for {month}")
+
+        if vacuum and stats["orders"]:
+            conn.execute("VACUUM")
+    finally:
+        conn.close()
+
+    return stats
+
+
+def iter_archived_rows(
+    conn: sqlite3.Connection,
+    archive_dir: str,
+    query: str,
+    params: Sequence[Any] = (),
+    limit: Optional[int] = None,
+    since: Optional[str] = None,
+) -> Iterator[sqlite3.Row]:
+    """
+    Run ``query`` against each archive, newest month first.
+
+    ``query`` refers to the archive schema as ``arc`` (e.g. ``arc.orders``).
+    Each archive is attached only while it is being read. Iteration stops
+    once ``limit`` rows have been produced, or at the first archive older
+    than the ``since`` month (``YYYY-MM``).
+    """
+    produced = 0
+    for month, path in list_archives(archive_dir):
+        if since is not None and month < since:
+            return
+        conn.execute("ATTACH DATABASE ? AS arc", (path,))
+        try:
+            if not _table_exists(conn, "arc", "orders"):
+                continue
+            rows = conn.execute(query, tuple(params)).fetchall()
+        finally:
+            conn.execute("DETACH DATABASE arc")
+
+        for row in rows:
+            yield row
+            produced += 1
+            if limit is not None and produced >= limit:
+                return
@@ -0,0 +1,240 @@
+"""
+Online database backups
+=======================
+
+Snapshots ``orders.db`` with SQLite's online backup API while the server
+keeps taking orders. The copy goes a few pages per step; SQLite holds the
+source's read lock only inside a step, and the pause between steps lets a
+waiting ``createOrder`` commit. If another connection writes mid-backup,
+SQLite restarts the copy from its next step, so the snapshot is always
+consistent; after ``max_restarts`` such restarts (a busy lunch rush) the
+whole copy is redone in a single step so the backup still finishes.
+
+Each snapshot is written to a temporary file, checked with
+``PRAGMA integrity_check`` and only then renamed into place as
+``orders-backup-YYYYMMDD-HHMMSS.db``; the oldest snapshots beyond ``keep``
+are removed.
+
+``BackupScheduler`` runs backups from a background thread. Every worker of
+a pre-forked server has one; a lock file and the age of the newest
+snapshot keep them from backing up more than once per interval.
+"""
+
+import contextlib
+import glob
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows: single process, no lock needed
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+BACKUP_PREFIX = "orders-backup-"
+_LOCK_NAME = ".backup.lock"
+
+
+class BackupError(Exception):
+    """A snapshot could not be taken or failed verification."""
+
+
+class _TooManyRestarts(Exception):
+    pass
+
+
+def list_backups(backup_dir: str) -> List[str]:
+    """Snapshot paths, newest first"""
+    return sorted(glob.glob(os.path.join(backup_dir, f"{BACKUP_PREFIX}*.db")), reverse=True)
+
+
+def newest_backup_age(backup_dir: str, now: Optional[float] = None) -> Optional[float]:
+    """Seconds since the newest snapshot was written, None if there are none"""
+    backups = list_backups(backup_dir)
+    if not backups:
+        return None
+    return (now or time.time()) - os.path.getmtime(backups[0])
+
+
+def verify_backup(path: str) -> None:
+    """Raise BackupError unless ``path`` passes SQLite's integrity check"""
+    conn = sqlite3.connect(path)
+    try:
+        result = conn.execute("PRAGMA integrity_check").fetchone()[0]
+        conn.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+    except sqlite3.DatabaseError as e:
+        raise BackupError(f"{path} is not a readable database: {e}") from e
+    finally:
+        conn.close()
+    if result != "ok":
+        raise BackupError(f"{path} failed integrity check: {result}")
+
+
+def rotate_backups(backup_dir: str, keep: int) -> List[str]:
+    """Delete all but the ``keep`` newest snapshots; returns the deleted paths"""
+    removed = []
+    for path in list_backups(backup_dir)[max(1, keep):]:
+        try:
+            os.remove(path)
+            removed.append(path)
+        except OSError as e:
+            logger.warning(f"Could not remove old backup {path}: {e}")
+    return removed
+
+
+def backup_database(
+    db_path: str,
+    backup_dir: str,
+    pages_per_step: int = 64,
+    step_pause: float = 0.005,
+    keep: int = 24,
+    verify: bool = True,
+    now: Optional[datetime] = None,
+    max_restarts: int = 5,
+) -> Dict[str, Any]:
+    """
+    Take one snapshot of ``db_path`` into ``backup_dir``.
+
+    Returns the snapshot path, page count, step count, restarts, duration,
+    pages per second and size. Raises BackupError (the partial file is
+    removed) if the copy or verification fails.
+    """
+    os.makedirs(backup_dir, exist_ok=True)
+    stamp = (now or datetime.now()).strftime("%Y%m%d-%H%M%S")
+    final_path = os.path.join(backup_dir, f"{BACKUP_PREFIX}{stamp}.db")
+    tmp_path = final_path + ".part"
+
+    progress = {"steps": 0, "restarts": 0, "pages": 0, "last_remaining": None}
+
+    def on_step(status, remaining, total):
+        progress["steps"] += 1
+        progress["pages"] = total
+        if progress["last_remaining"] is not None and remaining > progress["last_remaining"]:
+            progress["restarts"] += 1  # source changed by another connection; SQLite started over
+            if progress["restarts"] > max_restarts:
+                raise _TooManyRestarts()
+        progress["last_remaining"] = remaining
+        if remaining and step_pause:
+            time.sleep(step_pause)  # no lock is held here, so writers get their turn
+
+    started = time.monotonic()
+    source = sqlite3.connect(db_path, timeout=10.0)
+    target = sqlite3.connect(tmp_path)
+    try:
+        try:
+            source.backup(target, pages=max(1, int(pages_per_step)), progress=on_step)
+        except _TooManyRestarts:
+            progress["restarts"] -= 1
+            logger.info(f"Backup of {db_path} restarted {max_restarts} times; copying it in one step")
+            source.backup(target, progress=on_step)
+    except sqlite3.Error as e:
+        target.close()
+        _remove_quietly(tmp_path)
+        raise BackupError(f"Backup of {db_path} failed: {e}") from e
+    finally:
+        source.close()
+    target.close()
+    elapsed = time.monotonic() - started
+
+    try:
+        if verify:
+            verify_backup(tmp_path)
+        os.replace(tmp_path, final_path)
+    except (BackupError, OSError):
+        _remove_quietly(tmp_path)
+        raise
+
+    removed = rotate_backups(backup_dir, keep)
+    stats = {
+        "path": final_path,
+        "pages": progress["pages"],
+        "steps": progress["steps"],
+        "restarts": progress["restarts"],
+        "seconds": round(elapsed, 4),
+        "pages_per_second": round(progress["pages"] / elapsed, 1) if elapsed > 0 else 0.0,
+        "bytes": os.path.getsize(final_path),
+        "verified": verify,
+        "removed": len(removed),
+    }
+    logger.info(
+        f"Backup {os.path.basename(final_path)}: {stats['pages']} pages in {stats['seconds']:.2f}s "
+        f"({stats['pages_per_second']:.0f} pages/s, {stats['steps']} steps, {stats['restarts']} restarts)"
+    )
+    return stats
+
+
+def _remove_quietly(path: str) -> None:
+    with contextlib.suppress(OSError):
+        os.remove(path)
+
+
+@contextlib.contextmanager
+def _exclusive(backup_dir: str):
+    """Yield True if this process holds the backup lock, False if another one does"""
+    if fcntl is None:
+        yield True
+        return
+    os.makedirs(backup_dir, exist_ok=True)
+    with open(os.path.join(backup_dir, _LOCK_NAME), "a") as handle:
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+class BackupScheduler:
+    """Background thread taking a snapshot every ``interval`` seconds."""
+
+    def __init__(self, backup_dir: str, interval: float, run: Callable[[], Any], check_every: float = 60.0):
+        self.backup_dir = backup_dir
+        self.interval = float(interval)
+        self.check_every = min(float(check_every), self.interval)
+        self._run_backup = run
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> "BackupScheduler":
+        if not self.running:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name="db-backup", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._thread = None
+
+    def run_if_due(self) -> bool:
+        """Take a snapshot if none is newer than the interval; True if one was taken"""
+        with _exclusive(self.backup_dir) as owner:
+            if not owner:
+                return False
+            age = newest_backup_age(self.backup_dir)
+            if age is not None and age < self.interval:
+                return False
+            self._run_backup()
+            return True
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.check_every):
+            try:
+                self.run_if_due()
+            except Exception:
+                logger.exception("Scheduled backup failed")
@@ -0,0 +1,166 @@
+"""
+Compact cart items
+==================
+
+Tools work with cart items as plain dicts. When a cart is kept in a
+Redis session each item is converted to a ``CartItem`` and written
+positionally instead of repeating a dozen keys per item::
+
+    {"category": "kebabs", "name": "Small Lamb Kebab", "size": "small", ...}
+    ->  [1535, "kebabs", "Small Lamb Kebab", "small", ...]
+
+The first element is a bitmask of which ``FIELDS`` are present (absent
+keys stay absent rather than becoming None). Keys outside ``FIELDS`` are
+kept in a trailing dict, flagged by the bit after the last field, so a
+round trip reproduces the original dict exactly. Decoding accepts old
+dict-per-item carts too.
+
+The positional layout depends on ``FIELDS`` and carries no version, so it
+is only for short-lived session state. ``orders.cart_json`` keeps plain
+item dicts that stay readable as the fields change; ``loads_cart`` still
+reads the few order rows an earlier build wrote compactly.
+"""
+
+import copy
+import json
+from typing import Any, Dict, Iterable, List, Optional
+
+FIELDS = (
+    "category",
+    "name",
+    "size",
+    "protein",
+    "salads",
+    "sauces",
+    "extras",
+    "quantity",
+    "is_combo",
+    "cheese",
+    "price",
+    "chips_size",
+    "chips_salt",
+    "drink_brand",
+    "salt_type",
+)
+_FIELD_SET = frozenset(FIELDS)
+_LIST_FIELDS = frozenset(("salads", "sauces", "extras"))
+_OTHER_BIT = 1 << len(FIELDS)
+
+_COMPACT_SEPARATORS = (",", ":")
+
+
+class CartItem:
+    """One cart line with a slot per known field; unknown keys live in ``other``."""
+
+    __slots__ = FIELDS + ("other",)
+
+    def __init__(self, **fields: Any):
+        for name in FIELDS:
+            if name in fields:
+                setattr(self, name, fields.pop(name))
+        self.other: Optional[Dict[str, Any]] = fields or None
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "CartItem":
+        item = cls.__new__(cls)
+        other = None
+        for key, value in data.items():
+            if key in _FIELD_SET:
+                setattr(item, key, value)
+            else:
+                if other is None:
+                    other = {}
+                other[key] = value
+        item.other = other
+        return item
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {}
+        for name in FIELDS:
+            try:
+                data[name] = getattr(self, name)
+            except AttributeError:
+                continue
+        if self.other:
+            data.update(self.other)
+        return data
+
+    def to_wire(self) -> List[Any]:
+        mask = 0
+        values: List[Any] = [0]
+        for bit, name in enumerate(FIELDS):
+            try:
+                values.append(getattr(self, name))
+            except AttributeError:
+                continue
+            mask |= 1 << bit
+        if self.other:
+            mask |= _OTHER_BIT
+            values.append(self.other)
+        values[0] = mask
+        return values
+
+    @classmethod
+    def from_wire(cls, values: List[Any]) -> "CartItem":
+        item = cls.__new__(cls)
+        mask = values[0]
+        position = 1
+        for bit, name in enumerate(FIELDS):
+            if mask & (1 << bit):
+                setattr(item, name, values[position])
+                position += 1
+        item.other = values[position] if mask & _OTHER_BIT else None
+        return item
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, CartItem) and self.to_dict() == other.to_dict()
+
+    def __repr__(self) -> str:
+        return f"CartItem({self.to_dict()!r})"
+
+
+def encode_cart(cart: Iterable[Any]) -> List[Any]:
+    """Cart of item dicts -> JSON-ready list of positional items"""
+    return [CartItem.from_dict(item).to_wire() if isinstance(item, dict) else item for item in cart]
+
+
+def decode_cart(data: Any) -> Any:
+    """Positional (or legacy dict) items -> list of item dicts; non-lists are returned unchanged"""
+    if not isinstance(data, list):
+        return data
+    cart = []
+    for entry in data:
+        if isinstance(entry, list) and entry and isinstance(entry[0], int):
+            cart.append(CartItem.from_wire(entry).to_dict())
+        else:
+            cart.append(entry)
+    return cart
+
+
+def dumps_cart(cart: Iterable[Any]) -> str:
+    """Compact session JSON for a cart; not for anything persisted (see module docstring)"""
+    return json.dumps(encode_cart(cart), separators=_COMPACT_SEPARATORS)
+
+
+def loads_cart(text: Optional[str]) -> Any:
+    """Parse stored cart JSON in either format; raises ValueError on bad JSON"""
+    return decode_cart(json.loads(text or "[]"))
+
+
+def copy_cart(cart: Iterable[Any]) -> List[Any]:
+    """Independent copy of a cart (replaces the json.loads(json.dumps(cart)) round trip)"""
+    copied = []
+    for item in cart:
+        if not isinstance(item, dict):
+            copied.append(copy.deepcopy(item))
+            continue
+        clone = {}
+        for key, value in item.items():
+            if key in _LIST_FIELDS and isinstance(value, list):
+                clone[key] = list(value)
+            elif isinstance(value, (dict, list)):
+                clone[key] = copy.deepcopy(value)
+            else:
+                clone[key] = value
+        copied.append(clone)
+    return copied
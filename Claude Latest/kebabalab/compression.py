@@ -0,0 +1,75 @@
+"""
+Session value compression
+=========================
+
+Large session values (big office carts, last order snapshots) are
+compressed before they go to Redis. A compressed value starts with a
+header byte and a codec tag, followed by the compressed payload in
+base85 so it survives the text-mode (``decode_responses``) Redis client::
+
+    "\\x1fz" + base85(zlib(value))
+
+JSON never starts with the header byte (``json.dumps`` escapes control
+characters), so values written before compression existed, and values
+under the threshold, are stored and read back unchanged.
+"""
+
+import base64
+import zlib
+from typing import NamedTuple, Optional
+
+HEADER = "\x1f"
+CODEC_ZLIB = "z"
+
+
+class Compressed(NamedTuple):
+    value: str
+    raw_bytes: int
+    stored_bytes: int
+
+    @property
+    def compressed(self) -> bool:
+        return self.value.startswith(HEADER)
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.raw_bytes - self.stored_bytes
+
+    @property
+    def ratio(self) -> float:
+        return self.raw_bytes / self.stored_bytes if self.stored_bytes else 1.0
+
+
+def compress_value(text: str, threshold: int = 1024, level: int = 6) -> Compressed:
+    """
+    Compress ``text`` if it is at least ``threshold`` bytes (0 disables).
+
+    Values that would not get smaller are returned as they are.
+    """
+    raw = text.encode("utf-8")
+    # A plain value that happens to start with the header is always packed,
+    # otherwise it would be mistaken for a compressed one on the way back
+    ambiguous = text.startswith(HEADER)
+    if not ambiguous and (threshold <= 0 or len(raw) < threshold):
+        return Compressed(text, len(raw), len(raw))
+    packed = HEADER + CODEC_ZLIB + base64.b85encode(zlib.compress(raw, level)).decode("ascii")
+    if len(packed) >= len(raw) and not ambiguous:
+        return Compressed(text, len(raw), len(raw))
+    return Compressed(packed, len(raw), len(packed))
+
+
+def decompress_value(stored: Optional[str]) -> Optional[str]:
+    """
+    Undo ``compress_value``; anything without the header is returned unchanged.
+
+    Raises ValueError for an unknown codec or a corrupt payload.
+    """
+    if not stored or not stored.startswith(HEADER):
+        return stored
+    codec, payload = stored[1:2], stored[2:]
+    if codec != CODEC_ZLIB:
+        raise ValueError(f"Unknown session value codec {codec!r}")
+    try:
+        return zlib.decompress(base64.b85decode(payload)).decode("utf-8")
+    except zlib.error as e:
+        raise ValueError(f"Corrupt compressed session value: {e}") from e
@@ -0,0 +1,116 @@
+"""
+Call deadlines
+==============
+
+VAPI stops waiting for a tool call after its timeout, so work done after
+that point is heard by nobody. Each webhook request sets a ``Deadline``;
+each tool call runs under the tighter of that and its own budget. Lower
+layers ask for their wait in terms of what's left (``time_left(cap)``)
+instead of a fixed timeout, and ``check_deadline()`` before starting
+something new raises ``DeadlineExceeded`` once the time is gone.
+
+The current deadline lives in a ContextVar, so it follows the request
+through the session, database and SMS helpers without being threaded
+through every signature, and never leaks into background threads. Work
+that gives up waiting records it with ``note_timeout()``, so the tool
+runner can tell a timeout from any other failure once the time is gone.
+"""
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional
+
+
+class DeadlineExceeded(TimeoutError):
+    """The caller's deadline passed before the work could start or finish."""
+
+
+class Deadline:
+    """A point in (monotonic) time by which the answer is needed."""
+
+    __slots__ = ("expires_at", "budget")
+
+    def __init__(self, seconds: float, now: Optional[float] = None):
+        self.budget = max(0.0, float(seconds))
+        self.expires_at = (time.monotonic() if now is None else now) + self.budget
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+    def within(self, seconds: float) -> "Deadline":
+        """A deadline ``seconds`` from now, or this one if it comes first"""
+        child = Deadline(seconds)
+        return self if self.expires_at <= child.expires_at else child
+
+    def timeout(self, cap: float, floor: float = 0.01) -> float:
+        """``cap`` seconds, or what's left if that is less (never below ``floor``)"""
+        return max(floor, min(cap, self.remaining()))
+
+    def check(self, what: str = "work") -> None:
+        if self.expired:
+            error = DeadlineExceeded(f"Deadline passed before {what}")
+            note_timeout(error)
+            raise error
+
+
+_CURRENT: ContextVar = ContextVar("deadline", default=None)
+_TIMEOUTS: ContextVar = ContextVar("deadline_timeouts", default=None)
+
+
+def current_deadline() -> Optional[Deadline]:
+    return _CURRENT.get()
+
+
+@contextmanager
+def deadline_scope(deadline: Optional[Deadline]) -> Iterator[Optional[Deadline]]:
+    """Make ``deadline`` current for the block (None clears it)"""
+    token = _CURRENT.set(deadline)
+    timeouts = _TIMEOUTS.set([])
+    try:
+        yield deadline
+    finally:
+        _TIMEOUTS.reset(timeouts)
+        _CURRENT.reset(token)
+
+
+def note_timeout(error: BaseException) -> None:
+    """Record that work in the current deadline scope gave up waiting"""
+    timeouts = _TIMEOUTS.get()
+    if timeouts is not None:
+        timeouts.append(error)
+
+
+def timed_out() -> bool:
+    """Whether anything in the current deadline scope has given up waiting"""
+    return bool(_TIMEOUTS.get())
+
+
+def time_left(cap: float, floor: float = 0.01) -> float:
+    """A layer's timeout: ``cap`` outside a deadline, else capped by what's left"""
+    deadline = _CURRENT.get()
+    return cap if deadline is None else deadline.timeout(cap, floor)
+
+
+def check_deadline(what: str = "work") -> None:
+    """Raise DeadlineExceeded if the current deadline has passed"""
+    deadline = _CURRENT.get()
+    if deadline is not None:
+        deadline.check(what)
+
+
+def parse_budgets(text: Optional[str]) -> Dict[str, float]:
+    """``"createOrder=10, sendReceipt=6"`` -> {tool: seconds}"""
+    budgets = {}
+    for part in (text or "").split(","):
+        tool, sep, value = part.partition("=")
+        if not sep or not tool.strip():
+            continue
+        seconds = float(value)
+        if seconds > 0:
+            budgets[tool.strip()] = seconds
+    return budgets
@@ -0,0 +1,156 @@
+"""
+Kitchen queue model
+===================
+
+Tracks the prep work of pending orders so ready-time estimates reflect how
+busy the kitchen actually is. Orders are added when they are created and
+removed when they are completed, cancelled or their pickup time passes, so
+an estimate is a constant-time read of the running total plus the new
+cart's own prep time.
+
+Prep times come from the ``kitchen`` section of menu.json::
+
+    "kitchen": {
+        "base_minutes": 8,
+        "stations": 2,
+        "min_minutes": 10,
+        "max_minutes": 90,
+        "prep_minutes": {"kebabs": 4, "hsp": 5, "chips": 3, "default": 2}
+    }
+"""
+
+import heapq
+import math
+import threading
+import time
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+DEFAULT_PREP_MINUTES = {
+    "kebabs": 4.0,
+    "hsp": 5.0,
+    "gozleme": 6.0,
+    "chips": 3.0,
+    "drinks": 0.0,
+    "default": 2.0,
+}
+# How long an order with no pickup time stays queued
+DEFAULT_HOLD_SECONDS = 4 * 3600
+
+
+class ReadyEstimate(NamedTuple):
+    minutes: int
+    orders_ahead: int
+    queued_minutes: float
+    cart_minutes: float
+
+
+class KitchenQueue:
+    """In-process model of the pending-order queue."""
+
+    def __init__(
+        self,
+        prep_minutes: Optional[Dict[str, float]] = None,
+        base_minutes: float = 8.0,
+        stations: int = 2,
+        min_minutes: int = 10,
+        max_minutes: int = 90,
+    ):
+        self.prep_minutes = dict(DEFAULT_PREP_MINUTES)
+        self.prep_minutes.update(prep_minutes or {})
+        self.base_minutes = float(base_minutes)
+        self.stations = max(1, int(stations))
+        self.min_minutes = int(min_minutes)
+        self.max_minutes = int(max_minutes)
+
+        self._lock = threading.Lock()
+        self._orders: Dict[str, Tuple[float, float]] = {}  # order -> (work, expires_at)
+        self._expiry: List[Tuple[float, str]] = []
+        self._total_work = 0.0
+        self.synced_at: Optional[float] = None
+
+    @classmethod
+    def from_menu(cls, menu: Dict[str, Any]) -> "KitchenQueue":
+        config = (menu or {}).get("kitchen", {}) or {}
+        return cls(
+            prep_minutes=config.get("prep_minutes"),
+            base_minutes=config.get("base_minutes", 8.0),
+            stations=config.get("stations", 2),
+            min_minutes=config.get("min_minutes", 10),
+            max_minutes=config.get("max_minutes", 90),
+        )
+
+    # ----- work accounting -----
+
+    def item_minutes(self, item: Dict[str, Any]) -> float:
+        category = item.get("category") or "default"
+        minutes = self.prep_minutes.get(category, self.prep_minutes["default"])
+        if item.get("is_combo") and category == "kebabs":
+            minutes += self.prep_minutes.get("chips", 0.0)
+        try:
+            quantity = max(1, int(item.get("quantity", 1) or 1))
+        except (TypeError, ValueError):
+            quantity = 1
+        return minutes * quantity
+
+    def cart_minutes(self, cart: Iterable[Dict[str, Any]]) -> float:
+        return sum(self.item_minutes(item) for item in cart if isinstance(item, dict))
+
+    # ----- queue updates -----
+
+    def add_order(self, order_number: str, cart: Iterable[Dict[str, Any]], expires_at: Optional[float] = None) -> None:
+        """Queue an order's work until it completes or ``expires_at`` (epoch seconds) passes."""
+        work = self.cart_minutes(cart)
+        expires_at = expires_at if expires_at is not None else time.time() + DEFAULT_HOLD_SECONDS
+        with self._lock:
+            self._discard(order_number)
+            self._orders[order_number] = (work, expires_at)
+            self._total_work += work
+            heapq.heappush(self._expiry, (expires_at, order_number))
+
+    def complete_order(self, order_number: str) -> bool:
+        with self._lock:
+            return self._discard(order_number)
+
+    def replace_all(self, orders: Iterable[Tuple[str, Iterable[Dict[str, Any]], Optional[float]]]) -> None:
+        """Rebuild from a snapshot of pending orders (startup or periodic resync)."""
+        default_expiry = time.time() + DEFAULT_HOLD_SECONDS
+        entries = {}
+        for order_number, cart, expires_at in orders:
+            entries[order_number] = (self.cart_minutes(cart), expires_at if expires_at is not None else default_expiry)
+        expiry = [(expires_at, order_number) for order_number, (_, expires_at) in entries.items()]
+        heapq.heapify(expiry)
+        with self._lock:
+            self._orders = entries
+            self._expiry = expiry
+            self._total_work = sum(work for work, _ in entries.values())
+            self.synced_at = time.time()
+
+    def _discard(self, order_number: str) -> bool:
+        entry = self._orders.pop(order_number, None)
+        if entry is None:
+            return False
+        self._total_work = max(0.0, self._total_work - entry[0])
+        # The heap entry is skipped lazily in _expire
+        return True
+
+    def _expire(self, now: float) -> None:
+        while self._expiry and self._expiry[0][0] <= now:
+            expires_at, order_number = heapq.heappop(self._expiry)
+            entry = self._orders.get(order_number)
+            if entry is not None and entry[1] == expires_at:
+                self._discard(order_number)
+
+    # ----- reads -----
+
+    def snapshot(self, now: Optional[float] = None) -> Tuple[int, float]:
+        """Return (orders queued, queued prep minutes)."""
+        with self._lock:
+            self._expire(time.time() if now is None else now)
+            return len(self._orders), self._total_work
+
+    def estimate(self, cart: Iterable[Dict[str, Any]], now: Optional[float] = None) -> ReadyEstimate:
+        orders_ahead, queued = self.snapshot(now)
+        cart_work = self.cart_minutes(cart)
+        minutes = self.base_minutes + (queued + cart_work) / self.stations
+        minutes = min(self.max_minutes, max(self.min_minutes, int(math.ceil(minutes))))
+        return ReadyEstimate(minutes, orders_ahead, round(queued, 1), round(cart_work, 1))
@@ -0,0 +1,320 @@
+"""
+Compiled menu
+=============
+
+``MenuIndex`` pairs a parsed ``menu.json`` with lookup tables derived from
+it, so pricing an item is a dict lookup rather than a scan of the
+category. Each table is filled by running the scan itself over every key
+the menu can produce (words of item names, drink names and brands, chip
+sizes, modifier names), so a hit gives exactly what the scan would have;
+a miss (free text the menu never mentions) falls back to the scan.
+
+``compile_menu`` writes the menu and its tables to a versioned binary
+artifact (``menu.json`` -> ``menu.compiled``) with a checksum of the
+payload and a fingerprint of the source. ``load_menu_index`` reads it in
+one read, optionally memory-mapped so workers share the page cache, and
+rebuilds from JSON whenever the artifact is missing, stale, corrupt or
+from another Python version.
+
+Artifact layout (big-endian)::
+
+    magic "KBMENU\\0" | format u16 | python major u8 | minor u8
+    source size u64 | source mtime_ns u64 | source sha256 (32)
+    payload sha256 (32) | payload length u64 | payload (marshal)
+"""
+
+import contextlib
+import hashlib
+import json
+import logging
+import marshal
+import mmap
+import os
+import re
+import struct
+import sys
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"KBMENU\x00"
+FORMAT_VERSION = 1
+ARTIFACT_SUFFIX = ".compiled"
+_HEADER = struct.Struct(">7sHBBQQ32s32sQ")
+_PYTHON = sys.version_info[:2]  # marshal's format may change between versions
+_WORD = re.compile(r"[a-z]+")
+
+
+class ArtifactError(ValueError):
+    """A compiled menu artifact can't be used (stale, corrupt or foreign)."""
+
+
+# ----- reference scans (the behaviour the tables precompute) -----
+
+def match_protein(items: List[Dict[str, Any]], protein: str) -> Optional[int]:
+    """Position of the first item whose name contains ``protein`` ("mix" and "mixed" are equivalent)"""
+    protein_lower = protein.lower()
+    for pos, menu_item in enumerate(items):
+        name = menu_item.get("name", "").lower()
+        if (
+            protein_lower in name
+            or (protein_lower == "mixed" and "mix" in name)
+            or (protein_lower == "mix" and "mixed" in name)
+        ):
+            return pos
+    return None
+
+
+def match_drink(items: List[Dict[str, Any]], drink_name: str) -> Optional[int]:
+    """Position of the drink matching ``drink_name`` by name (longest wins) or, overriding that, by brand"""
+    best = None
+    best_score = 0
+    for pos, menu_item in enumerate(items):
+        name = menu_item.get("name", "").lower()
+        if drink_name in name or name in drink_name:
+            score = len(name)
+            if score > best_score or best is None:
+                best = pos
+                best_score = score
+        for brand in menu_item.get("brands", []):
+            if drink_name in brand.lower() or brand.lower() in drink_name:
+                best = pos
+                break
+    return best
+
+
+def match_chips(items: List[Dict[str, Any]], size: str) -> Optional[int]:
+    for pos, menu_item in enumerate(items):
+        if "chip" in menu_item.get("name", "").lower() and menu_item.get("size", "") == size:
+            return pos
+    return None
+
+
+def match_extra(modifiers: List[Dict[str, Any]], extra: str) -> Optional[int]:
+    """Position of the first modifier named ``extra`` or containing it"""
+    for pos, modifier in enumerate(modifiers):
+        name = modifier.get("name", "").lower()
+        if extra == name or extra in name:
+            return pos
+    return None
+
+
+# ----- index -----
+
+def _words(*texts: str) -> List[str]:
+    return sorted({word for text in texts for word in _WORD.findall(text.lower())})
+
+
+def build_tables(menu: Dict[str, Any]) -> Dict[str, Any]:
+    """Derive the lookup tables for ``menu`` (plain dicts, so they marshal)"""
+    categories = menu.get("categories", {})
+    proteins: Dict[str, Dict[str, Optional[int]]] = {}
+    for category, items in categories.items():
+        if not isinstance(items, list) or not items:
+            continue
+        keys = _words(*(item.get("name", "") for item in items)) + ["mix", "mixed"]
+        proteins[category] = {key: match_protein(items, key) for key in keys}
+
+    drinks = categories.get("drinks") or []
+    drink_keys = {""}
+    for item in drinks:
+        drink_keys.add(item.get("name", "").lower())
+        drink_keys.update(brand.lower() for brand in item.get("brands", []))
+        drink_keys.update(_words(item.get("name", ""), *item.get("brands", [])))
+
+    chips = categories.get("chips") or []
+    chip_sizes = {item.get("size", "") for item in chips} | {"small", "large"}
+
+    extras = menu.get("modifiers", {}).get("extras", [])
+    extra_keys = set()
+    for modifier in extras:
+        extra_keys.add(modifier.get("name", "").lower())
+        extra_keys.update(_words(modifier.get("name", "")))
+
+    return {
+        "proteins": proteins,
+        "drinks": {key: match_drink(drinks, key) for key in sorted(drink_keys)},
+        "chips": {size: match_chips(chips, size) for size in sorted(chip_sizes)},
+        "extras": {key: match_extra(extras, key) for key in sorted(extra_keys)},
+    }
+
+
+_MISS = object()
+
+
+class MenuIndex:
+    """A menu plus its derived pricing tables."""
+
+    __slots__ = ("menu", "tables")
+
+    def __init__(self, menu: Dict[str, Any], tables: Dict[str, Any]):
+        self.menu = menu
+        self.tables = tables
+
+    @classmethod
+    def from_menu(cls, menu: Dict[str, Any]) -> "MenuIndex":
+        return cls(menu, build_tables(menu))
+
+    def _lookup(self, table: Dict[str, Optional[int]], key: str, scan, items: List, arg: str) -> Optional[int]:
+        pos = table.get(key, _MISS)
+        return scan(items, arg) if pos is _MISS else pos
+
+    def price(self, item: Dict[str, Any]) -> float:
+        """Menu price of one cart item: base price by category/size/protein plus extras"""
+        if item.get("is_combo"):
+            return item.get("price", 0.0)
+
+        price = 0.0
+        category = item.get("category", "")
+        size = item.get("size", "small")
+        protein = item.get("protein", "")
+        item_name = item.get("name", "").lower()
+        category_items = self.menu.get("categories", {}).get(category, [])
+
+        if category_items:
+            if protein:
+                table = self.tables["proteins"].get(category, {})
+                pos = self._lookup(table, protein.lower(), match_protein, category_items, protein)
+                if pos is not None:
+                    sizes = category_items[pos].get("sizes", {})
+                    if sizes and size:
+                        price = sizes.get(size, sizes.get("small", 0.0))
+                    else:
+                        price = category_items[pos].get("price", 0.0)
+            elif category == "drinks":
+                pos = self._lookup(self.tables["drinks"], item_name, match_drink, category_items, item_name)
+                price = category_items[0 if pos is None else pos].get("price", 0.0)
+            elif category == "chips":
+                pos = self._lookup(self.tables["chips"], size, match_chips, category_items, size)
+                if pos is not None:
+                    price = category_items[pos].get("price", 0.0)
+            elif category == "sweets":
+                for menu_item in category_items:
+                    if any(word in item_name for word in menu_item.get("name", "").lower().split()):
+                        price = menu_item.get("price", 0.0)
+                        break
+            else:
+                sizes = category_items[0].get("sizes", {})
+                price = sizes.get(size, sizes.get("small", 0.0)) if sizes else category_items[0].get("price", 0.0)
+
+        modifiers = self.menu.get("modifiers", {}).get("extras", [])
+        for extra in item.get("extras", []):
+            extra_lower = extra.lower()
+            pos = self._lookup(self.tables["extras"], extra_lower, match_extra, modifiers, extra_lower)
+            if pos is None:
+                continue
+            modifier = modifiers[pos]
+            applies_to = modifier.get("applies_to", [])
+            if applies_to and category not in applies_to:
+                continue
+            if extra_lower == "cheese" and category == "hsp":
+                continue  # cheese is included in HSPs
+            price += modifier.get("price", 0.0)
+
+        return price
+
+
+# ----- artifact -----
+
+def artifact_path(menu_file: str) -> str:
+    return os.path.splitext(menu_file)[0] + ARTIFACT_SUFFIX
+
+
+def _fingerprint(menu_file: str) -> Tuple[int, int]:
+    stat = os.stat(menu_file)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def compile_menu(menu_file: str, output: Optional[str] = None, menu: Optional[Dict[str, Any]] = None,
+                 source: Optional[bytes] = None) -> Dict[str, Any]:
+    """
+    Compile ``menu_file`` into its artifact (written atomically) and return
+    the artifact path and sizes. ``menu``/``source`` skip re-reading the file.
+    """
+    output = output or artifact_path(menu_file)
+    size, mtime_ns = _fingerprint(menu_file)
+    if source is None:
+        with open(menu_file, "rb") as f:
+            source = f.read()
+    if menu is None:
+        menu = json.loads(source)
+    index = MenuIndex.from_menu(menu)
+    payload = marshal.dumps({"menu": index.menu, "tables": index.tables}, 4)
+    header = _HEADER.pack(
+        MAGIC, FORMAT_VERSION, _PYTHON[0], _PYTHON[1], size, mtime_ns,
+        hashlib.sha256(source).digest(), hashlib.sha256(payload).digest(), len(payload),
+    )
+    tmp_path = f"{output}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(header + payload)
+        os.replace(tmp_path, output)
+    finally:
+        with contextlib.suppress(OSError):
+            os.remove(tmp_path)
+    return {"path": output, "sourceBytes": len(source), "artifactBytes": _HEADER.size + len(payload)}
+
+
+def _parse(data, menu_file: str) -> MenuIndex:
+    if len(data) < _HEADER.size:
+        raise ArtifactError("truncated header")
+    magic, version, major, minor, size, mtime_ns, source_sha, payload_sha, length = _HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ArtifactError("not a compiled menu")
+    if version != FORMAT_VERSION or (major, minor) != _PYTHON:
+        raise ArtifactError(f"built by format {version} on Python {major}.{minor}")
+    if (size, mtime_ns) != _fingerprint(menu_file):
+        # Touched (e.g. by a checkout) but maybe not changed: compare contents
+        with open(menu_file, "rb") as f:
+            if hashlib.sha256(f.read()).digest() != source_sha:
+                raise ArtifactError(f"stale: {menu_file} has changed")
+    payload = data[_HEADER.size:]
+    if len(payload) != length or hashlib.sha256(payload).digest() != payload_sha:
+        raise ArtifactError("checksum mismatch")
+    try:
+        compiled = marshal.loads(payload)
+    except (EOFError, ValueError, TypeError) as e:
+        raise ArtifactError(f"unreadable payload: {e}") from e
+    return MenuIndex(compiled["menu"], compiled["tables"])
+
+
+def read_artifact(path: str, menu_file: str, use_mmap: bool = False) -> MenuIndex:
+    """Load a compiled menu, raising ArtifactError unless it is current and intact"""
+    with open(path, "rb") as f:
+        if not use_mmap:
+            return _parse(f.read(), menu_file)
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            view = memoryview(mapped)
+            try:
+                return _parse(view, menu_file)
+            finally:
+                view.release()
+
+
+def load_menu_index(menu_file: str, artifact: Optional[str] = None, use_mmap: bool = False,
+                    write_back: bool = True) -> Tuple[MenuIndex, str]:
+    """
+    The compiled menu for ``menu_file`` and where it came from ("artifact"
+    or "json"). Falls back to parsing the JSON (and, with ``write_back``,
+    refreshing the artifact). JSON errors propagate to the caller.
+    """
+    artifact = artifact or artifact_path(menu_file)
+    try:
+        return read_artifact(artifact, menu_file, use_mmap), "artifact"
+    except FileNotFoundError:
+        pass
+    except (ArtifactError, OSError) as e:
+        logger.warning(f"Compiled menu {artifact} not used ({e}); rebuilding from {menu_file}")
+
+    with open(menu_file, "rb") as f:
+        source = f.read()
+    menu = json.loads(source)
+    if not isinstance(menu, dict):
+        raise ValueError("Menu must be a dictionary")
+    index = MenuIndex.from_menu(menu)
+    if write_back:
+        try:
+            compile_menu(menu_file, artifact, menu=menu, source=source)
+        except OSError as e:
+            logger.debug(f"Could not write compiled menu {artifact}: {e}")
+    return index, "json"
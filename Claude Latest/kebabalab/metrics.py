@@ -0,0 +1,87 @@
+"""
+In-process metrics
+==================
+
+Thread-safe counters and simple summaries (count/sum/min/max), keyed by
+metric name plus optional labels. Exposed as JSON on ``/metrics``.
+"""
+
+import threading
+from typing import Any, Dict, Tuple
+
+_LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, Any]) -> _LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None))
+
+
+def _format_name(name: str, key: _LabelKey) -> str:
+    if not key:
+        return name
+    return name + "{" + ",".join(f"{k}={v}" for k, v in key) + "}"
+
+
+class Metrics:
+    """A minimal metrics registry."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple[str, _LabelKey], float] = {}
+        self._gauges: Dict[Tuple[str, _LabelKey], float] = {}
+        self._summaries: Dict[Tuple[str, _LabelKey], Dict[str, float]] = {}
+
+    def incr(self, name: str, value: float = 1, **labels) -> None:
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def gauge(self, name: str, value: float, **labels) -> None:
+        with self._lock:
+            self._gauges[(name, _label_key(labels))] = value
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        key = (name, _label_key(labels))
+        with self._lock:
+            summary = self._summaries.get(key)
+            if summary is None:
+                self._summaries[key] = {"count": 1, "sum": value, "min": value, "max": value}
+                return
+            summary["count"] += 1
+            summary["sum"] += value
+            summary["min"] = min(summary["min"], value)
+            summary["max"] = max(summary["max"], value)
+
+    def get(self, name: str, **labels) -> float:
+        """Return a counter (or gauge) value, 0 if it was never set."""
+        key = (name, _label_key(labels))
+        with self._lock:
+            if key in self._counters:
+                return self._counters[key]
+            return self._gauges.get(key, 0)
+
+    def summary(self, name: str, **labels) -> Dict[str, float]:
+        with self._lock:
+            return dict(self._summaries.get((name, _label_key(labels)), {}))
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            summaries = {}
+            for (name, key), summary in self._summaries.items():
+                data = dict(summary)
+                data["avg"] = summary["sum"] / summary["count"] if summary["count"] else 0.0
+                summaries[_format_name(name, key)] = data
+            return {
+                "counters": {_format_name(n, k): v for (n, k), v in self._counters.items()},
+                "gauges": {_format_name(n, k): v for (n, k), v in self._gauges.items()},
+                "summaries": summaries,
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._summaries.clear()
+
+
+METRICS = Metrics()
@@ -0,0 +1,336 @@
+"""
+SMS notification subsystem
+==========================
+
+Outgoing SMS are written to a persistent ``sms_outbox`` table and delivered
+by a small pool of background worker threads, so Twilio latency never sits
+on the voice path. Failed sends are retried with exponential backoff; rows
+left in ``sending`` by a crash are picked up again on the next start.
+
+Transports:
+- TwilioTransport: one Twilio ``Client`` per process, created on first use
+- LocalTransport: records messages in memory (tests and local development)
+"""
+
+import logging
+import random
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+STATUS_PENDING = "pending"
+STATUS_SENDING = "sending"
+STATUS_SENT = "sent"
+STATUS_FAILED = "failed"
+
+
+# ==================== TRANSPORTS ====================
+
+class TwilioTransport:
+    """Sends SMS through a single, lazily created Twilio client (HTTP calls bounded by ``timeout``)."""
+
+    name = "twilio"
+
+    def __init__(self, account_sid: str, auth_token: str, from_number: str, timeout: Optional[float] = None):
+        self.account_sid = account_sid
+        self.auth_token = auth_token
+        self.from_number = from_number
+        self.timeout = timeout
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    from twilio.http.http_client import TwilioHttpClient  # optional dependency
+                    from twilio.rest import Client
+
+                    http_client = TwilioHttpClient(timeout=self.timeout) if self.timeout else None
+                    self._client = Client(self.account_sid, self.auth_token, http_client=http_client)
+        return self._client
+
+    def send(self, to: str, body: str) -> Optional[str]:
+        message = self.client.messages.create(body=body, from_=self.from_number, to=to)
+        return getattr(message, "sid", None)
+
+
+class LocalTransport:
+    """In-memory stand-in transport that records every message it is given."""
+
+    name = "local"
+
+    def __init__(self, fail_times: int = 0, delay: float = 0.0):
+        self.sent: List[Tuple[str, str]] = []
+        self.attempts = 0
+        self.fail_times = fail_times
+        self.delay = delay
+        self._lock = threading.Lock()
+
+    def send(self, to: str, body: str) -> Optional[str]:
+        if self.delay:
+            time.sleep(self.delay)
+        with self._lock:
+            self.attempts += 1
+            if self.attempts <= self.fail_times:
+                raise RuntimeError(f"simulated failure {self.attempts}")
+            self.sent.append((to, body))
+            return f"local-{len(self.sent)}"
+
+
+# ==================== OUTBOX ====================
+
+class SmsOutbox:
+    """Persistent queue of outgoing SMS stored in SQLite."""
+
+    def __init__(self, db_path: str, max_attempts: int = 5, backoff_base: float = 2.0, backoff_max: float = 300.0):
+        self.db_path = db_path
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.ensure_schema()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=10.0, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def ensure_schema(self) -> None:
+        conn = self._connect()
+        try:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS sms_outbox (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    to_number TEXT NOT NULL,
+                    body TEXT NOT NULL,
+                    kind TEXT,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    next_attempt_at REAL NOT NULL DEFAULT 0,
+                    last_error TEXT,
+                    provider_id TEXT,
+                    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                    sent_at TEXT
+                )
+            ''')
+            conn.execute(
+                'CREATE INDEX IF NOT EXISTS idx_sms_outbox_due ON sms_outbox(status, next_attempt_at)'
+            )
+        finally:
+            conn.close()
+
+    def enqueue(self, to_number: str, body: str, kind: Optional[str] = None) -> int:
+        conn = self._connect()
+        try:
+            cursor = conn.execute(
+                'INSERT INTO sms_outbox (to_number, body, kind, next_attempt_at) VALUES (?, ?, ?, ?)',
+                (to_number, body, kind, time.time()),
+            )
+            return cursor.lastrowid
+        finally:
+            conn.close()
+
+    def claim(self, now: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Atomically move the oldest due message to ``sending`` and return it."""
+        now = time.time() if now is None else now
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                '''
+                SELECT id, to_number, body, kind, attempts FROM sms_outbox
+                WHERE status = ? AND next_attempt_at <= ?
+                ORDER BY next_attempt_at, id
+                LIMIT 1
+                ''',
+                (STATUS_PENDING, now),
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                'UPDATE sms_outbox SET status = ?, attempts = attempts + 1 WHERE id = ?',
+                (STATUS_SENDING, row["id"]),
+            )
+            conn.execute("COMMIT")
+            job = dict(row)
+            job["attempts"] += 1
+            return job
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def next_due_in(self, now: Optional[float] = None) -> Optional[float]:
+        """Seconds until the next pending message is due, or None if idle."""
+        now = time.time() if now is None else now
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                'SELECT MIN(next_attempt_at) FROM sms_outbox WHERE status = ?',
+                (STATUS_PENDING,),
+            ).fetchone()
+        finally:
+            conn.close()
+        if row is None or row[0] is None:
+            return None
+        return max(0.0, row[0] - now)
+
+    def mark_sent(self, message_id: int, provider_id: Optional[str] = None) -> None:
+        conn = self._connect()
+        try:
+            conn.execute(
+                '''
+                UPDATE sms_outbox
+                SET status = ?, provider_id = ?, last_error = NULL, sent_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+                ''',
+                (STATUS_SENT, provider_id, message_id),
+            )
+        finally:
+            conn.close()
+
+    def backoff_delay(self, attempts: int) -> float:
+        delay = min(self.backoff_max, self.backoff_base * (2 ** max(0, attempts - 1)))
+        return delay * random.uniform(0.8, 1.2)
+
+    def mark_failed(self, message_id: int, attempts: int, error: str) -> bool:
+        """Record a failed attempt. Returns True if the message will be retried."""
+        retry = attempts < self.max_attempts
+        status = STATUS_PENDING if retry else STATUS_FAILED
+        next_attempt = time.time() + self.backoff_delay(attempts) if retry else 0
+        conn = self._connect()
+        try:
+            conn.execute(
+                'UPDATE sms_outbox SET status = ?, next_attempt_at = ?, last_error = ? WHERE id = ?',
+                (status, next_attempt, error[:500], message_id),
+            )
+        finally:
+            conn.close()
+        return retry
+
+    def requeue_stuck(self) -> int:
+        """Return messages left in ``sending`` (e.g. after a crash) to the queue."""
+        conn = self._connect()
+        try:
+            cursor = conn.execute(
+                'UPDATE sms_outbox SET status = ?, next_attempt_at = ? WHERE status = ?',
+                (STATUS_PENDING, time.time(), STATUS_SENDING),
+            )
+            return cursor.rowcount
+        finally:
+            conn.close()
+
+    def counts(self) -> Dict[str, int]:
+        conn = self._connect()
+        try:
+            rows = conn.execute('SELECT status, COUNT(*) FROM sms_outbox GROUP BY status').fetchall()
+        finally:
+            conn.close()
+        return {status: count for status, count in rows}
+
+
+# ==================== WORKER POOL ====================
+
+class NotificationService:
+    """Background worker pool draining an :class:`SmsOutbox` through a transport."""
+
+    def __init__(self, outbox: SmsOutbox, transport, workers: int = 2, poll_interval: float = 1.0):
+        self.outbox = outbox
+        self.transport = transport
+        self.workers = max(1, int(workers))
+        self.poll_interval = poll_interval
+        self.stats = {"sent": 0, "retried": 0, "failed": 0}
+        self._threads: List[threading.Thread] = []
+        self._stop = threading.Event()
+        self._wake = threading.Condition()
+        self._stats_lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return any(thread.is_alive() for thread in self._threads)
+
+    def start(self) -> "NotificationService":
+        if self.running:
+            return self
+        self._stop.clear()
+        recovered = self.outbox.requeue_stuck()
+        if recovered:
+            logger.warning(f"Requeued {recovered} SMS left in 'sending' state")
+        self._threads = [
+            threading.Thread(target=self._run, name=f"sms-worker-{i}", daemon=True)
+            for i in range(self.workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+        logger.info(f"SMS outbox started: {self.workers} workers via {getattr(self.transport, 'name', 'custom')}")
+        return self
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        with self._wake:
+            self._wake.notify_all()
+        deadline = time.monotonic() + timeout
+        for thread in self._threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+        self._threads = []
+
+    def enqueue(self, to_number: str, body: str, kind: Optional[str] = None) -> int:
+        message_id = self.outbox.enqueue(to_number, body, kind)
+        with self._wake:
+            self._wake.notify()
+        return message_id
+
+    def drain(self, timeout: float = 5.0) -> bool:
+        """Block until no pending or in-flight messages remain (used by tests and shutdown)."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            counts = self.outbox.counts()
+            if not counts.get(STATUS_PENDING) and not counts.get(STATUS_SENDING):
+                return True
+            time.sleep(0.01)
+        return False
+
+    def _bump(self, key: str) -> None:
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                job = self.outbox.claim()
+            except sqlite3.Error as exc:
+                logger.error(f"SMS outbox claim failed: {exc}")
+                job = None
+
+            if job is None:
+                wait = self.poll_interval
+                try:
+                    due = self.outbox.next_due_in()
+                    if due is not None:
+                        wait = min(wait, due)
+                except sqlite3.Error:
+                    pass
+                with self._wake:
+                    self._wake.wait(wait)
+                continue
+
+            try:
+                provider_id = self.transport.send(job["to_number"], job["body"])
+            except Exception as exc:
+                if self.outbox.mark_failed(job["id"], job["attempts"], str(exc)):
+                    self._bump("retried")
+                    logger.warning(f"SMS {job['id']} attempt {job['attempts']} failed, will retry: {exc}")
+                else:
+                    self._bump("failed")
+                    logger.error(f"SMS {job['id']} to {job['to_number']} failed permanently: {exc}")
+                continue
+
+            self.outbox.mark_sent(job["id"], provider_id)
+            self._bump("sent")
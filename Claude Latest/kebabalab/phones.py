@@ -0,0 +1,39 @@
+"""
+Customer phone keys
+===================
+
+Orders are looked up by the customer's phone number, which arrives in
+whatever shape the caller or the assistant gave it: ``0412 345 678`` from a
+spoken number, ``+61412345678`` from the carrier, ``61412345678`` from a
+form. ``customer_key`` maps all of them to one E.164 string, and it is the
+only place that decides what counts as the same customer: it fills the
+indexed ``orders.customer_key`` column and builds every history lookup.
+"""
+
+import re
+from typing import Optional
+
+_NON_DIGITS = re.compile(r"\D+")
+
+
+def customer_key(phone: Optional[str]) -> Optional[str]:
+    """
+    E.164 form of a phone number (Australian numbers without a country code
+    are taken as local), or None if it isn't one (e.g. "anonymous").
+    """
+    text = str(phone or "").strip()
+    digits = _NON_DIGITS.sub("", text)
+    international = text.startswith("+") or text.startswith("00")
+    if text.startswith("00"):
+        digits = digits[2:]  # international dialling prefix
+    if len(digits) == 11 and digits.startswith("61"):
+        return "+" + digits
+    if len(digits) == 12 and digits.startswith("610"):
+        return "+61" + digits[3:]  # "+61 0412 ..." as people often say it
+    if international:
+        return "+" + digits if 8 <= len(digits) <= 15 else None
+    if len(digits) == 10 and digits.startswith("0"):
+        return "+61" + digits[1:]
+    if len(digits) == 9 and digits[0] in "23478":
+        return "+61" + digits  # local number with its leading 0 dropped
+    return None
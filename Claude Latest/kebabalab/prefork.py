@@ -0,0 +1,223 @@
+"""
+Pre-fork WSGI server
+====================
+
+The master process loads the app (menu, hours index, schema) once, binds
+the listening socket and forks worker processes that share both, so the
+loaded data is shared copy-on-write. Each worker serves requests from a
+bounded thread pool on top of Werkzeug's HTTP server.
+
+Signals to the master:
+- SIGTERM / SIGINT: stop accepting, let in-flight requests finish for up
+  to ``drain_timeout`` seconds, then kill whatever is left
+
+Workers that die are replaced. On platforms without ``os.fork`` the
+server runs a single threaded process instead.
+"""
+
+import logging
+import os
+import signal
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional, Tuple
+
+from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+
+logger = logging.getLogger(__name__)
+
+
+def default_workers() -> int:
+    """One worker per CPU core"""
+    return max(1, os.cpu_count() or 1)
+
+
+def default_threads() -> int:
+    """Requests mostly wait on SQLite, Redis or the network, so a few threads per worker"""
+    return 4 if (os.cpu_count() or 1) > 1 else 8
+
+
+class _RequestHandler(WSGIRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Idle keep-alive connections give their pool thread back after this long
+    timeout = 5
+
+
+class PooledWSGIServer(BaseWSGIServer):
+    """Werkzeug server that hands each connection to a fixed-size thread pool."""
+
+    multithread = True
+
+    def __init__(self, host: str, port: int, app, threads: int, fd: Optional[int] = None):
+        super().__init__(host, port, app, handler=_RequestHandler, fd=fd)
+        self.threads = max(1, int(threads))
+        self._pool = ThreadPoolExecutor(self.threads, thread_name_prefix="http")
+
+    def process_request(self, request, client_address):
+        self._pool.submit(self._handle, request, client_address)
+
+    def _handle(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def drain(self) -> None:
+        """Wait for requests already accepted to finish"""
+        self._pool.shutdown(wait=True)
+
+
+class PreforkServer:
+    """Master process: binds, forks and supervises worker processes."""
+
+    def __init__(
+        self,
+        app,
+        host: str = "0.0.0.0",
+        port: int = 8000,
+        workers: Optional[int] = None,
+        threads: Optional[int] = None,
+        drain_timeout: float = 30.0,
+        post_fork: Optional[Callable[[], None]] = None,
+        worker_exit: Optional[Callable[[], None]] = None,
+    ):
+        self.app = app
+        self.host = host
+        self.port = port
+        self.workers = max(1, int(workers or default_workers()))
+        self.threads = max(1, int(threads or default_threads()))
+        self.drain_timeout = float(drain_timeout)
+        self.post_fork = post_fork
+        self.worker_exit = worker_exit
+
+        self.socket: Optional[socket.socket] = None
+        self._children: Dict[int, float] = {}  # pid -> started at
+        self._stopping = False
+
+    def bind(self) -> Tuple[str, int]:
+        """Open the shared listening socket; returns the bound (host, port)"""
+        family = socket.AF_INET6 if ":" in self.host else socket.AF_INET
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.host, self.port))
+        sock.listen(BaseWSGIServer.request_queue_size)
+        sock.set_inheritable(True)
+        self.socket = sock
+        self.port = sock.getsockname()[1]
+        return self.host, self.port
+
+    # ----- master -----
+
+    def run(self) -> int:
+        if self.socket is None:
+            self.bind()
+        if not hasattr(os, "fork"):
+            logger.warning("os.fork is unavailable; serving from a single process")
+            self._serve(install_signals=False)
+            return 0
+
+        signal.signal(signal.SIGTERM, self._on_stop)
+        signal.signal(signal.SIGINT, self._on_stop)
+
+        logger.info(
+            f"Listening on {self.host}:{self.port} with {self.workers} workers x {self.threads} threads"
+        )
+        for _ in range(self.workers):
+            self._spawn()
+
+        while not self._stopping:
+            self._reap()
+            for _ in range(self.workers - len(self._children)):
+                self._spawn()
+            time.sleep(0.2)
+
+        self._shutdown_workers()
+        self.socket.close()
+        return 0
+
+    def _on_stop(self, signum, frame) -> None:
+        self._stopping = True
+
+    def _spawn(self) -> None:
+        pid = os.fork()
+        if pid == 0:  # pragma: no cover - runs in the child
+            code = 0
+            try:
+                self._serve(install_signals=True)
+            except BaseException:
+                logger.exception("Worker crashed")
+                code = 1
+            finally:
+                os._exit(code)
+        self._children[pid] = time.monotonic()
+
+    def _reap(self) -> None:
+        while self._children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                self._children.clear()
+                return
+            if pid == 0:
+                return
+            started = self._children.pop(pid, None)
+            if started is not None and not self._stopping:
+                logger.warning(f"Worker {pid} exited with status {status}; replacing it")
+                if time.monotonic() - started < 1.0:
+                    time.sleep(1.0)  # don't spin if workers die on startup
+
+    def _shutdown_workers(self) -> None:
+        logger.info(f"Stopping {len(self._children)} workers (drain timeout {self.drain_timeout:.0f}s)")
+        self._terminate(list(self._children))
+
+    def _terminate(self, pids) -> None:
+        for pid in pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        deadline = time.monotonic() + self.drain_timeout
+        pending = set(pids)
+        while pending and time.monotonic() < deadline:
+            for pid in list(pending):
+                try:
+                    done, _ = os.waitpid(pid, os.WNOHANG)
+                except ChildProcessError:
+                    done = pid
+                if done:
+                    pending.discard(pid)
+                    self._children.pop(pid, None)
+            time.sleep(0.05)
+        for pid in pending:
+            logger.warning(f"Worker {pid} did not drain in time; killing it")
+            try:
+                os.kill(pid, signal.SIGKILL)
+                os.waitpid(pid, 0)
+            except (ProcessLookupError, ChildProcessError):
+                pass
+            self._children.pop(pid, None)
+
+    # ----- worker -----
+
+    def _serve(self, install_signals: bool) -> None:
+        if self.post_fork is not None:
+            self.post_fork()
+        server = PooledWSGIServer(self.host, self.port, self.app, self.threads, fd=self.socket.fileno())
+
+        def stop(signum, frame):
+            # shutdown() waits for serve_forever, so it can't run in this (the serving) thread
+            threading.Thread(target=server.shutdown, daemon=True).start()
+
+        if install_signals:
+            signal.signal(signal.SIGTERM, stop)
+            signal.signal(signal.SIGINT, stop)
+        try:
+            server.serve_forever(poll_interval=0.5)
+        finally:
+            server.drain()
+            if self.worker_exit is not None:
+                self.worker_exit()
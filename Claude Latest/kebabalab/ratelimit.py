@@ -0,0 +1,199 @@
+"""
+Webhook rate limits and admission control
+=========================================
+
+Token buckets hold ``capacity`` tokens and refill at ``capacity / seconds``
+per second; every tool call takes one token from each bucket that applies
+(the caller's session, and the session's bucket for that tool). A call is
+allowed only if every bucket has a token, and then all of them are charged
+together, so a denied call costs nothing.
+
+Stores:
+- MemoryBucketStore: per-process buckets (single worker / tests)
+- RedisBucketStore: buckets shared by every worker, checked atomically in Lua
+
+``AdmissionControl`` caps how many tool calls run at once in a process.
+A call that can't get a slot within a short wait is shed straight away,
+so the assistant hears "one moment" instead of waiting out its timeout
+behind a queue.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+_TAKE_LUA = """
+local now = tonumber(ARGV[1])
+local levels = {}
+local wait = 0
+local limiting = 0
+for i = 1, #KEYS do
+    local capacity = tonumber(ARGV[2 * i])
+    local rate = tonumber(ARGV[2 * i + 1])
+    local state = redis.call('HMGET', KEYS[i], 'tokens', 'ts')
+    local tokens = tonumber(state[1]) or capacity
+    local ts = tonumber(state[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+    levels[i] = tokens
+    if tokens < 1 and (1 - tokens) / rate > wait then
+        wait = (1 - tokens) / rate
+        limiting = i
+    end
+end
+for i = 1, #KEYS do
+    local capacity = tonumber(ARGV[2 * i])
+    local rate = tonumber(ARGV[2 * i + 1])
+    local tokens = levels[i]
+    if limiting == 0 then
+        tokens = tokens - 1
+    end
+    redis.call('HSET', KEYS[i], 'tokens', tostring(tokens), 'ts', tostring(now))
+    redis.call('EXPIRE', KEYS[i], math.ceil(capacity / rate) + 1)
+end
+return {limiting, tostring(wait)}
+"""
+
+
+class Limit(NamedTuple):
+    capacity: int
+    seconds: float
+
+    @property
+    def rate(self) -> float:
+        return self.capacity / self.seconds
+
+
+class Decision(NamedTuple):
+    allowed: bool
+    retry_after: float = 0.0
+    scope: Optional[str] = None  # which limit said no: "session" or "tool"
+
+
+ALLOWED = Decision(True)
+
+
+def parse_limit(text: Optional[str]) -> Optional[Limit]:
+    """``"30/60"`` (30 calls per 60 seconds, bursts of 30) -> Limit; empty or 0 -> None"""
+    text = (text or "").strip()
+    if not text or text == "0":
+        return None
+    count, _, seconds = text.partition("/")
+    limit = Limit(int(count), float(seconds or 1))
+    if limit.capacity <= 0 or limit.seconds <= 0:
+        return None
+    return limit
+
+
+def parse_tool_limits(text: Optional[str]) -> Dict[str, Limit]:
+    """``"createOrder=3/300, sendReceipt=2/600"`` -> {tool: Limit}"""
+    limits = {}
+    for part in (text or "").split(","):
+        tool, sep, value = part.partition("=")
+        if not sep or not tool.strip():
+            continue
+        limit = parse_limit(value)
+        if limit is not None:
+            limits[tool.strip()] = limit
+    return limits
+
+
+class MemoryBucketStore:
+    """Token buckets held in this process."""
+
+    def __init__(self, max_buckets: int = 10000):
+        self.max_buckets = max_buckets
+        self._lock = threading.Lock()
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+
+    def take(self, buckets: Sequence[Tuple[str, Limit]], now: float) -> Tuple[int, float]:
+        """Charge one token from every bucket or none; returns (1-based limiting bucket or 0, wait)"""
+        with self._lock:
+            levels: List[float] = []
+            wait, limiting = 0.0, 0
+            for i, (key, limit) in enumerate(buckets, 1):
+                tokens, ts = self._buckets.get(key, (limit.capacity, now))
+                tokens = min(limit.capacity, tokens + max(0.0, now - ts) * limit.rate)
+                levels.append(tokens)
+                if tokens < 1 and (1 - tokens) / limit.rate > wait:
+                    wait, limiting = (1 - tokens) / limit.rate, i
+            for (key, _), tokens in zip(buckets, levels):
+                self._buckets[key] = (tokens - 1 if not limiting else tokens, now)
+            if len(self._buckets) > self.max_buckets:
+                self._prune(now)
+            return limiting, wait
+
+    def _prune(self, now: float) -> None:
+        # Oldest-touched first; a bucket untouched this long is full again anyway
+        for key, _ in sorted(self._buckets.items(), key=lambda kv: kv[1][1])[: len(self._buckets) // 2]:
+            del self._buckets[key]
+
+
+class RedisBucketStore:
+    """Token buckets shared through Redis: one small hash per bucket."""
+
+    def __init__(self, client, prefix: str = "ratelimit"):
+        self.client = client
+        self.prefix = prefix
+        self._take = client.register_script(_TAKE_LUA)
+
+    def take(self, buckets: Sequence[Tuple[str, Limit]], now: float) -> Tuple[int, float]:
+        keys = [f"{self.prefix}:{key}" for key, _ in buckets]
+        args: List[float] = [now]
+        for _, limit in buckets:
+            args.extend((limit.capacity, limit.rate))
+        limiting, wait = self._take(keys=keys, args=args)
+        return int(limiting), float(wait)
+
+
+class RateLimiter:
+    """Per-session and per-session-per-tool token buckets."""
+
+    def __init__(self, store, session_limit: Optional[Limit], tool_limits: Optional[Dict[str, Limit]] = None):
+        self.store = store
+        self.session_limit = session_limit
+        self.tool_limits = dict(tool_limits or {})
+
+    def check(self, session_id: str, tool: str, now: Optional[float] = None) -> Decision:
+        buckets: List[Tuple[str, Limit]] = []
+        scopes: List[str] = []
+        if self.session_limit is not None:
+            buckets.append((session_id, self.session_limit))
+            scopes.append("session")
+        tool_limit = self.tool_limits.get(tool)
+        if tool_limit is not None:
+            buckets.append((f"{session_id}:{tool}", tool_limit))
+            scopes.append("tool")
+        if not buckets:
+            return ALLOWED
+        limiting, wait = self.store.take(buckets, time.time() if now is None else now)
+        if not limiting:
+            return ALLOWED
+        return Decision(False, round(wait, 2), scopes[limiting - 1])
+
+
+class AdmissionControl:
+    """At most ``max_concurrent`` tool calls at once; others wait up to ``wait_seconds``, then are shed."""
+
+    def __init__(self, max_concurrent: int, wait_seconds: float = 0.25):
+        self.max_concurrent = max(0, int(max_concurrent))
+        self.wait_seconds = wait_seconds
+        self._slots = threading.BoundedSemaphore(self.max_concurrent) if self.max_concurrent else None
+        self._lock = threading.Lock()
+        self.in_flight = 0
+
+    @contextmanager
+    def admit(self) -> Iterator[bool]:
+        """Yield True with a slot held for the block, or False if the call should be shed"""
+        if self._slots is not None and not self._slots.acquire(timeout=self.wait_seconds):
+            yield False
+            return
+        with self._lock:
+            self.in_flight += 1
+        try:
+            yield True
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+            if self._slots is not None:
+                self._slots.release()
@@ -0,0 +1,265 @@
+"""
+Call recorder
+=============
+
+An opt-in, structured log of webhook traffic: for every webhook with tool
+calls, the routing part of the VAPI message, and per tool call its
+arguments, the result sent back, the session keys it changed and how long
+it took. Recordings are for debugging calls that went wrong and for
+replaying real workloads against a local server (benchmarks, regression
+runs).
+
+Records are JSON-encoded on the request thread (so later changes to a cart
+can't leak into them) and handed to a background writer, which compresses
+them in blocks and appends them to one file per process. Recording never
+blocks a call: if the writer falls behind, records are dropped and counted.
+
+File layout (big-endian)::
+
+    magic "KBCALLS\\0" | format u16
+    block*: compressed length u32 | zlib(record*)
+    record: length u32 | JSON (UTF-8)
+
+A block is written with a single ``write``; a torn block at the end of a
+file (the process died mid-write) is ignored when reading.
+"""
+
+import json
+import logging
+import os
+import queue
+import struct
+import threading
+import time
+import zlib
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"KBCALLS\x00"
+FORMAT_VERSION = 1
+FILE_SUFFIX = ".kbrec"
+_HEADER = struct.Struct(">8sH")
+_LENGTH = struct.Struct(">I")
+
+# Result fields that legitimately differ between a recording and its replay
+VOLATILE_FIELDS = frozenset((
+    "orderNumber", "displayOrderNumber", "readyAt", "estimatedReadyTime", "currentTime", "message",
+    "closesAt", "opensAt", "retryAfterSeconds",
+))
+
+
+def encode_record(record: Dict[str, Any]) -> bytes:
+    """One record, framed for a block"""
+    data = json.dumps(record, separators=(",", ":"), default=str).encode("utf-8")
+    return _LENGTH.pack(len(data)) + data
+
+
+class CallRecorder:
+    """Buffers encoded records and appends them to ``<directory>/calls-<date>-<pid>.kbrec``."""
+
+    def __init__(self, directory: str, flush_interval: float = 1.0, max_pending: int = 10000,
+                 block_records: int = 256, level: int = 6):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.block_records = max(1, int(block_records))
+        self.level = level
+        self.recorded = 0
+        self.dropped = 0
+        self.written_bytes = 0
+        self._queue: "queue.Queue[Optional[bytes]]" = queue.Queue(maxsize=max_pending)
+        self._thread: Optional[threading.Thread] = None
+        self._path: Optional[str] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def path(self) -> Optional[str]:
+        return self._path
+
+    def start(self) -> "CallRecorder":
+        if not self.running:
+            os.makedirs(self.directory, exist_ok=True)
+            self._thread = threading.Thread(target=self._loop, name="call-recorder", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Write out everything recorded so far and stop the writer"""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout)
+        self._thread = None
+
+    def record(self, record: Dict[str, Any]) -> bool:
+        """Queue one record; False if it was dropped because the writer is behind"""
+        try:
+            self._queue.put_nowait(encode_record(record))
+        except queue.Full:
+            self.dropped += 1
+            return False
+        self.recorded += 1
+        return True
+
+    def _file_for(self, now: float) -> str:
+        day = time.strftime("%Y%m%d", time.localtime(now))
+        return os.path.join(self.directory, f"calls-{day}-{os.getpid()}{FILE_SUFFIX}")
+
+    def _write(self, frames: List[bytes]) -> None:
+        path = self._file_for(time.time())
+        block = zlib.compress(b"".join(frames), self.level)
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o600)
+        try:
+            if os.fstat(fd).st_size == 0:
+                os.write(fd, _HEADER.pack(MAGIC, FORMAT_VERSION))
+            os.write(fd, _LENGTH.pack(len(block)) + block)
+        finally:
+            os.close(fd)
+        self._path = path
+        self.written_bytes += _LENGTH.size + len(block)
+
+    def _loop(self) -> None:
+        stopping = False
+        while not stopping:
+            frames: List[bytes] = []
+            deadline = time.monotonic() + self.flush_interval
+            while len(frames) < self.block_records:
+                try:
+                    frame = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if frame is None:
+                    stopping = True
+                    break
+                frames.append(frame)
+            if frames:
+                try:
+                    self._write(frames)
+                except OSError as e:
+                    self.dropped += len(frames)
+                    logger.error(f"Call recorder could not write {len(frames)} records: {e}")
+
+
+def read_records(path: str) -> Iterator[Dict[str, Any]]:
+    """Records in one recording file, in the order they were written"""
+    with open(path, "rb") as f:
+        header = f.read(_HEADER.size)
+        if len(header) < _HEADER.size:
+            return
+        magic, version = _HEADER.unpack(header)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"{path} is not a call recording (format {version})")
+        while True:
+            length = f.read(_LENGTH.size)
+            if len(length) < _LENGTH.size:
+                return
+            block = f.read(_LENGTH.unpack(length)[0])
+            try:
+                data = zlib.decompress(block)
+            except zlib.error:
+                logger.warning(f"{path}: ignoring a torn block at the end of the file")
+                return
+            offset = 0
+            while offset < len(data):
+                (size,) = _LENGTH.unpack_from(data, offset)
+                offset += _LENGTH.size
+                yield json.loads(data[offset:offset + size])
+                offset += size
+
+
+def load_recordings(paths: Iterable[str]) -> List[Dict[str, Any]]:
+    """Records from several files (e.g. one per worker), merged in time order"""
+    records = [record for path in paths for record in read_records(path)]
+    records.sort(key=lambda record: record.get("t", 0))
+    return records
+
+
+def replay_message(record: Dict[str, Any]) -> Dict[str, Any]:
+    """The webhook message that reproduces a recorded one"""
+    message = dict(record.get("message") or {})
+    message["type"] = "tool-calls"
+    message["toolCalls"] = [
+        {"id": call.get("id"), "function": {"name": call["tool"], "arguments": call.get("args") or {}}}
+        for call in record.get("calls", [])
+    ]
+    return message
+
+
+def same_result(recorded: Any, replayed: Any) -> bool:
+    """Whether a replayed result matches the recording, ignoring times and order numbers"""
+    if not isinstance(recorded, dict) or not isinstance(replayed, dict):
+        return recorded == replayed
+    keys = (set(recorded) | set(replayed)) - VOLATILE_FIELDS
+    return all(recorded.get(key) == replayed.get(key) for key in keys)
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def replay(
+    records: List[Dict[str, Any]],
+    send: Callable[[Dict[str, Any]], List[Dict[str, Any]]],
+    speed: float = 1.0,
+    concurrency: int = 8,
+) -> Dict[str, Any]:
+    """
+    Re-send recorded webhooks through ``send(message) -> results``.
+
+    Calls are replayed concurrently (up to ``concurrency`` at once), each
+    call's webhooks in their recorded order and at their recorded offsets
+    divided by ``speed`` (0 sends them back to back). Every result is
+    compared with the recorded one.
+    """
+    by_call: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    for record in records:
+        by_call[record.get("callId") or record.get("session") or ""].append(record)
+    first = records[0].get("t", 0) if records else 0
+    started = time.monotonic()
+    lock = threading.Lock()
+    stats: Dict[str, Any] = {"webhooks": 0, "toolCalls": 0, "matched": 0, "mismatched": [], "errors": 0}
+    latencies: List[float] = []
+
+    def run(call_records: List[Dict[str, Any]]) -> None:
+        for record in call_records:
+            if speed > 0:
+                delay = started + (record.get("t", first) - first) / speed - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            sent = time.perf_counter()
+            try:
+                results = send(replay_message(record))
+            except Exception as e:
+                logger.warning(f"Replay of call {record.get('callId')} failed: {e}")
+                with lock:
+                    stats["errors"] += 1
+                continue
+            elapsed_ms = (time.perf_counter() - sent) * 1000
+            with lock:
+                stats["webhooks"] += 1
+                latencies.append(elapsed_ms)
+                for call, result in zip(record.get("calls", []), results):
+                    stats["toolCalls"] += 1
+                    if same_result(call.get("result"), result.get("result")):
+                        stats["matched"] += 1
+                    else:
+                        stats["mismatched"].append({"callId": record.get("callId"), "tool": call["tool"]})
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        list(pool.map(run, by_call.values()))
+
+    stats["seconds"] = round(time.monotonic() - started, 3)
+    stats["recordedSeconds"] = round((records[-1].get("t", 0) - first) if records else 0, 3)
+    stats["latencyMs"] = {
+        "p50": round(_percentile(latencies, 0.5), 2),
+        "p95": round(_percentile(latencies, 0.95), 2),
+        "max": round(max(latencies), 2) if latencies else 0.0,
+    }
+    return stats
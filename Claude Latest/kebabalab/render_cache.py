@@ -0,0 +1,75 @@
+"""
+Rendered cart line cache
+========================
+
+Cart lines are re-rendered for every getCartState, getOrderSummary,
+receipt and kitchen SMS, although an item rarely changes during a call.
+Renders are cached under the item's content, so editing an item (any
+field, in place or not) simply misses and renders afresh; stale entries
+age out of the LRU. ``clear()`` drops everything, for when the menu and
+therefore prices change.
+"""
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable
+
+
+def content_key(item: Dict[str, Any]) -> Hashable:
+    """
+    Hashable snapshot of an item's content.
+
+    Cart items are flat apart from their salad/sauce/extra lists, so a tuple
+    of (key, value) pairs is enough and costs far less than the render it
+    saves. Anything deeper falls back to a digest of the sorted JSON.
+    """
+    try:
+        key = tuple([(k, tuple(v) if type(v) is list else v) for k, v in item.items()])
+        hash(key)
+        return key
+    except TypeError:
+        data = json.dumps(item, sort_keys=True, separators=(",", ":"), default=str)
+        return hashlib.blake2b(data.encode("utf-8"), digest_size=16).digest()
+
+
+class RenderCache:
+    """Thread-safe LRU of rendered strings keyed by (kind, item content)."""
+
+    def __init__(self, maxsize: int = 4096):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, str]" = OrderedDict()  # (kind, content key) -> line
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, kind: str, item: Dict[str, Any], render: Callable[[Dict[str, Any]], str]) -> str:
+        if self.maxsize <= 0:
+            return render(item)
+        key = (kind, content_key(item))
+        with self._lock:
+            text = self._entries.get(key)
+            if text is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return text
+            self.misses += 1
+        text = render(item)
+        with self._lock:
+            self._entries[key] = text
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return text
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+    def __len__(self) -> int:
+        return len(self._entries)
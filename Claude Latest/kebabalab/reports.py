@@ -0,0 +1,279 @@
+"""
+Sales reports and order exports
+===============================
+
+Everything here streams rows straight off an SQLite cursor and folds them
+into fixed-size aggregates, so memory stays flat however many orders are
+covered. Monthly archives (see ``archive.py``) that overlap the requested
+range are attached one at a time and read the same way, oldest first, so a
+year of orders reads like one table.
+
+``orders.created_at`` is stored in UTC; days and hours in reports are in
+the shop's timezone. Cancelled orders are left out.
+"""
+
+import csv
+import io
+import json
+import sqlite3
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta, timezone, tzinfo
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .archive import list_archives
+
+SECTION_COLUMNS = {
+    "daily": ("date", "orders", "items", "subtotal", "gst", "total"),
+    "hourly": ("hour", "orders", "total"),
+    "items": ("category", "name", "size", "protein", "quantity", "revenue"),
+}
+SECTIONS = tuple(SECTION_COLUMNS)
+EXPORT_COLUMNS = (
+    "order_number", "created_at", "status", "customer_name", "customer_phone",
+    "items", "subtotal", "gst", "total", "ready_at",
+)
+
+_SALES_QUERY = """
+    SELECT o.id, o.created_at, o.subtotal, o.gst, o.total,
+           i.category, i.name, i.size, i.protein, i.quantity, i.unit_price
+    FROM {schema}.orders o
+    LEFT JOIN {schema}.order_items i ON i.order_id = o.id
+    WHERE o.status != 'cancelled' AND o.created_at >= ? AND o.created_at < ?
+    ORDER BY o.id, i.line_no
+"""
+
+_EXPORT_QUERY = """
+    SELECT o.order_number, o.created_at, o.status, o.customer_name, o.customer_phone,
+           (SELECT COALESCE(SUM(quantity), 0) FROM {schema}.order_items WHERE order_id = o.id),
+           o.subtotal, o.gst, o.total, o.ready_at
+    FROM {schema}.orders o
+    WHERE o.status != 'cancelled' AND o.created_at >= ? AND o.created_at < ?
+    ORDER BY o.id
+"""
+
+# Far enough out to mean "no bound" in created_at comparisons
+_MIN_UTC = "0000"
+_MAX_UTC = "9999"
+
+
+def _localize(day: date, tz: tzinfo) -> datetime:
+    start = datetime.combine(day, time.min)
+    localize = getattr(tz, "localize", None)  # pytz zones need localize()
+    return localize(start) if localize else start.replace(tzinfo=tz)
+
+
+def utc_bounds(start: Optional[date], end: Optional[date], tz: tzinfo) -> Tuple[str, str]:
+    """Local dates [start, end] (inclusive) -> created_at strings [lower, upper)"""
+    lower = _MIN_UTC
+    upper = _MAX_UTC
+    if start is not None:
+        lower = _localize(start, tz).astimezone(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+    if end is not None:
+        upper = _localize(end + timedelta(days=1), tz).astimezone(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+    return lower, upper
+
+
+class _LocalClock:
+    """created_at (UTC text) -> naive local datetime, reusing the UTC offset within an hour."""
+
+    def __init__(self, tz: tzinfo):
+        self.tz = tz
+        self._hour = None
+        self._offset = timedelta(0)
+
+    def __call__(self, created_at: Optional[str]) -> Optional[datetime]:
+        try:
+            utc = datetime.fromisoformat(created_at[:19])
+        except (TypeError, ValueError):
+            return None
+        # Rows come in id order, so consecutive orders mostly share an hour;
+        # offsets only change on the hour (DST), so one lookup per hour will do
+        hour = created_at[:13]
+        if hour != self._hour:
+            self._hour = hour
+            self._offset = utc.replace(tzinfo=timezone.utc).astimezone(self.tz).utcoffset()
+        return utc + self._offset
+
+
+def _to_local(created_at: Optional[str], tz: tzinfo) -> Optional[str]:
+    try:
+        return datetime.fromisoformat(created_at).replace(tzinfo=timezone.utc).astimezone(tz).isoformat()
+    except (TypeError, ValueError):
+        return created_at
+
+
+def _open_readonly(db_path: str) -> sqlite3.Connection:
+    # Streamed responses finish on whichever thread the server is writing from
+    conn = sqlite3.connect(db_path, timeout=10.0, check_same_thread=False)
+    conn.execute("PRAGMA query_only = 1")
+    return conn
+
+
+def _stream(
+    db_path: str,
+    archive_dir: Optional[str],
+    query: str,
+    lower: str,
+    upper: str,
+) -> Iterator[Tuple]:
+    """Rows of ``query`` from overlapping archives (oldest first), then the live database"""
+    conn = _open_readonly(db_path)
+    try:
+        months = [] if not archive_dir else sorted(list_archives(archive_dir))
+        for month, path in months:
+            if not (lower[:7] <= month <= upper[:7]):
+                continue
+            conn.execute("ATTACH DATABASE ? AS arc", (path,))
+            try:
+                has_orders = conn.execute(
+                    "SELECT 1 FROM arc.sqlite_master WHERE type = 'table' AND name = 'orders'"
+                ).fetchone()
+                if has_orders:
+                    yield from conn.execute(query.format(schema="arc"), (lower, upper))
+            finally:
+                conn.execute("DETACH DATABASE arc")
+        yield from conn.execute(query.format(schema="main"), (lower, upper))
+    finally:
+        conn.close()
+
+
+class SalesReport:
+    """Daily takings, GST, orders per hour and item sales, built in one pass."""
+
+    def __init__(self, tz: tzinfo):
+        self.clock = _LocalClock(tz)
+        self.days: Dict[str, Dict[str, float]] = defaultdict(
+            lambda: {"orders": 0, "items": 0, "subtotal": 0.0, "gst": 0.0, "total": 0.0}
+        )
+        self.hours: Dict[int, Dict[str, float]] = defaultdict(lambda: {"orders": 0, "total": 0.0})
+        self.items: Dict[Tuple, Dict[str, float]] = defaultdict(lambda: {"quantity": 0, "revenue": 0.0})
+        self._last_order = None
+        self._day = None
+
+    def add_row(self, row: Tuple) -> None:
+        order_id, created_at, subtotal, gst, total, category, name, size, protein, quantity, unit_price = row
+        if order_id != self._last_order:
+            self._last_order = order_id
+            local = self.clock(created_at)
+            self._day = local.date().isoformat() if local else "unknown"
+            day = self.days[self._day]
+            day["orders"] += 1
+            day["subtotal"] += subtotal or 0.0
+            day["gst"] += gst or 0.0
+            day["total"] += total or 0.0
+            if local is not None:
+                hour = self.hours[local.hour]
+                hour["orders"] += 1
+                hour["total"] += total or 0.0
+        if category is None:
+            return  # order without line items (not backfilled yet)
+        quantity = quantity or 0
+        self.days[self._day]["items"] += quantity
+        item = self.items[(category, name or "", size or "", protein or "")]
+        item["quantity"] += quantity
+        item["revenue"] += quantity * (unit_price or 0.0)
+
+    def rows(self, section: str, top: int = 10) -> List[Dict[str, Any]]:
+        if section == "daily":
+            return [
+                {"date": day, **{k: round(v, 2) if isinstance(v, float) else v for k, v in values.items()}}
+                for day, values in sorted(self.days.items())
+            ]
+        if section == "hourly":
+            return [
+                {"hour": hour, "orders": values["orders"], "total": round(values["total"], 2)}
+                for hour, values in sorted(self.hours.items())
+            ]
+        if section == "items":
+            ranked = sorted(self.items.items(), key=lambda kv: (-kv[1]["quantity"], -kv[1]["revenue"]))
+            return [
+                {
+                    "category": category, "name": name, "size": size, "protein": protein,
+                    "quantity": values["quantity"], "revenue": round(values["revenue"], 2),
+                }
+                for (category, name, size, protein), values in (ranked[:top] if top else ranked)
+            ]
+        raise ValueError(f"Unknown report section '{section}' (expected one of {', '.join(SECTIONS)})")
+
+    def summary(self) -> Dict[str, Any]:
+        totals = {"orders": 0, "items": 0, "subtotal": 0.0, "gst": 0.0, "total": 0.0}
+        for values in self.days.values():
+            for key in totals:
+                totals[key] += values[key]
+        return {k: round(v, 2) if isinstance(v, float) else v for k, v in totals.items()}
+
+    def to_dict(self, top: int = 10) -> Dict[str, Any]:
+        return {
+            "summary": self.summary(),
+            "daily": self.rows("daily"),
+            "hourly": self.rows("hourly"),
+            "topItems": self.rows("items", top),
+        }
+
+
+def sales_report(
+    db_path: str,
+    tz: tzinfo,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    archive_dir: Optional[str] = None,
+) -> SalesReport:
+    """Aggregate orders placed on local dates [start, end] (either may be open)"""
+    report = SalesReport(tz)
+    lower, upper = utc_bounds(start, end, tz)
+    for row in _stream(db_path, archive_dir, _SALES_QUERY, lower, upper):
+        report.add_row(row)
+    return report
+
+
+def iter_order_export(
+    db_path: str,
+    tz: tzinfo,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    archive_dir: Optional[str] = None,
+) -> Iterator[Dict[str, Any]]:
+    """One dict per order (EXPORT_COLUMNS), created_at in local time"""
+    lower, upper = utc_bounds(start, end, tz)
+    for row in _stream(db_path, archive_dir, _EXPORT_QUERY, lower, upper):
+        record = dict(zip(EXPORT_COLUMNS, row))
+        record["created_at"] = _to_local(record["created_at"], tz)
+        yield record
+
+
+def iter_csv(rows: Iterable[Dict[str, Any]], columns: Iterable[str], batch: int = 200) -> Iterator[str]:
+    """CSV text in chunks of ``batch`` rows, header first"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=list(columns), extrasaction="ignore")
+    writer.writeheader()
+    pending = 0
+    for row in rows:
+        writer.writerow(row)
+        pending += 1
+        if pending >= batch:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    yield buffer.getvalue()
+
+
+def iter_json_array(rows: Iterable[Dict[str, Any]], batch: int = 200) -> Iterator[str]:
+    """A JSON array written incrementally, ``batch`` rows per chunk"""
+    chunk: List[str] = ["["]
+    first = True
+    for row in rows:
+        chunk.append(("" if first else ",") + json.dumps(row))
+        first = False
+        if len(chunk) >= batch:
+            yield "".join(chunk)
+            chunk = []
+    chunk.append("]")
+    yield "".join(chunk)
+
+
+def parse_date(value: Optional[str]) -> Optional[date]:
+    """``YYYY-MM-DD`` -> date; empty -> None; raises ValueError otherwise"""
+    if not value:
+        return None
+    return date.fromisoformat(value)
@@ -0,0 +1,149 @@
+"""
+Trading hours index
+===================
+
+Compiles ``hours.json`` (per-day ``open``/``close`` windows, where a close
+at or before the open means "past midnight") into a sorted list of
+minute-of-week intervals. "Is it open?" and "when does that change?" are
+answered with a binary search, and the current status is cached for the
+rest of the minute.
+"""
+
+import json
+from bisect import bisect_right
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+DAYS = ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+
+
+class ScheduleStatus(NamedTuple):
+    is_open: bool
+    # Minutes until the next closing (when open) or opening (when closed);
+    # None when the shop never changes state (always open / never open)
+    minutes_to_change: Optional[int]
+    next_open: Optional[datetime]
+    next_close: Optional[datetime]
+
+
+def _parse_hhmm(value: str) -> int:
+    hours, minutes = str(value).strip().split(":")
+    hours, minutes = int(hours), int(minutes)
+    if not (0 <= hours <= 24 and 0 <= minutes < 60):
+        raise ValueError(f"Invalid time '{value}'")
+    return hours * 60 + minutes
+
+
+def minute_of_week(dt: datetime) -> int:
+    return dt.weekday() * MINUTES_PER_DAY + dt.hour * 60 + dt.minute
+
+
+class WeeklySchedule:
+    """Sorted, non-overlapping weekly open intervals in minutes since Monday 00:00."""
+
+    def __init__(self, windows: Dict[str, List[Tuple[str, str]]]):
+        self.windows = {day: list(windows.get(day, [])) for day in DAYS}
+        self._starts: List[int] = []
+        self._ends: List[int] = []
+        # (minute, status) swapped as one tuple so concurrent readers never see a torn pair
+        self._cache: Tuple[Optional[datetime], Optional[ScheduleStatus]] = (None, None)
+        self._compile()
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "WeeklySchedule":
+        windows = {}
+        for day in DAYS:
+            windows[day] = [
+                (entry["open"], entry["close"])
+                for entry in (data.get(day) or [])
+                if entry.get("open") and entry.get("close")
+            ]
+        return cls(windows)
+
+    @classmethod
+    def from_file(cls, path: str) -> "WeeklySchedule":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
+
+    def _compile(self) -> None:
+        intervals = []
+        for day_index, day in enumerate(DAYS):
+            day_start = day_index * MINUTES_PER_DAY
+            for open_text, close_text in self.windows[day]:
+                start = day_start + _parse_hhmm(open_text)
+                end = day_start + _parse_hhmm(close_text)
+                if end <= start:  # closes after midnight
+                    end += MINUTES_PER_DAY
+                if end > MINUTES_PER_WEEK:  # Sunday night into Monday morning
+                    intervals.append((start, MINUTES_PER_WEEK))
+                    intervals.append((0, end - MINUTES_PER_WEEK))
+                else:
+                    intervals.append((start, end))
+
+        merged: List[List[int]] = []
+        for start, end in sorted(intervals):
+            if merged and start <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+
+        self._starts = [start for start, _ in merged]
+        self._ends = [end for _, end in merged]
+
+    @property
+    def intervals(self) -> List[Tuple[int, int]]:
+        return list(zip(self._starts, self._ends))
+
+    def _locate(self, minute: int) -> Tuple[bool, int]:
+        """Return (is_open, index of the interval at or before ``minute``)."""
+        index = bisect_right(self._starts, minute) - 1
+        return index >= 0 and minute < self._ends[index], index
+
+    def _minutes_to_close(self, minute: int, index: int) -> Optional[int]:
+        end = self._ends[index]
+        # An interval ending at the week boundary continues if Monday opens at 00:00
+        if end == MINUTES_PER_WEEK and self._starts[0] == 0:
+            if self._ends[0] == MINUTES_PER_WEEK and len(self._starts) == 1:
+                return None
+            end = MINUTES_PER_WEEK + self._ends[0]
+        return end - minute
+
+    def _minutes_to_open(self, minute: int, index: int) -> Optional[int]:
+        if not self._starts:
+            return None
+        if index + 1 < len(self._starts):
+            return self._starts[index + 1] - minute
+        return MINUTES_PER_WEEK - minute + self._starts[0]
+
+    def is_open(self, dt: datetime) -> bool:
+        return self._locate(minute_of_week(dt))[0]
+
+    def status(self, dt: datetime) -> ScheduleStatus:
+        """Open/closed state and the next change for ``dt``, cached per minute."""
+        key = dt.replace(second=0, microsecond=0)
+        cached_key, cached_value = self._cache
+        if cached_key == key and cached_value is not None:
+            return cached_value
+
+        minute = minute_of_week(key)
+        is_open, index = self._locate(minute)
+        if is_open:
+            delta = self._minutes_to_close(minute, index)
+        else:
+            delta = self._minutes_to_open(minute, index)
+
+        change_at = key + timedelta(minutes=delta) if delta is not None else None
+        value = ScheduleStatus(
+            is_open=is_open,
+            minutes_to_change=delta,
+            next_open=None if is_open else change_at,
+            next_close=change_at if is_open else None,
+        )
+        self._cache = (key, value)
+        return value
+
+    def hours_for(self, dt: datetime) -> List[Tuple[str, str]]:
+        """The configured windows for the calendar day of ``dt``."""
+        return list(self.windows[DAYS[dt.weekday()]])
@@ -13,11 +13,22 @@ Design principles:
 
 """
 
+import contextvars
+import copy
+import functools
+import hmac
+import importlib.util
 import json
 import logging
+import math
 import os
+import queue
 import sqlite3
 import re
+import sys
+import tempfile
+import threading
+import time
 
 # Load .env file if present (python-dotenv)
 try:
@@ -25,18 +36,15 @@ try:
     load_dotenv(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.env'))
 except ImportError:
     pass
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 from typing import Any, Dict, Iterable, List, Optional, Tuple
 import pytz
 
-# Fuzzy string matching for typo tolerance
-try:
-    from rapidfuzz import fuzz, process
-    FUZZY_MATCHING_AVAILABLE = True
-except ImportError:
-    FUZZY_MATCHING_AVAILABLE = False
-    # Logger not yet initialized, will log this later after setup
-    print("WARNING: rapidfuzz not available, fuzzy matching disabled")
+# Fuzzy string matching for typo tolerance (rapidfuzz is imported on first use)
+FUZZY_MATCHING_AVAILABLE = importlib.util.find_spec('rapidfuzz') is not None
 try:
     from flask import Flask, request, jsonify
     from flask_cors import CORS
@@ -102,19 +110,36 @@ except ModuleNotFoundError:  # pragma: no cover - exercised only in CI without F
 
     request = _RequestProxy()
 
-# Optional Twilio client for SMS notifications
-try:  # pragma: no cover - optional dependency
-    from twilio.rest import Client  # type: ignore
-except ModuleNotFoundError:  # pragma: no cover - exercised only when Twilio isn't installed
-    Client = None  # type: ignore
-
-# Redis for session storage (with fallback to in-memory)
-try:
-    import redis
-    REDIS_AVAILABLE = True
-except ImportError:
-    REDIS_AVAILABLE = False
-    print("WARNING: redis-py not available, using in-memory session storage (not production-ready)")
+# Optional dependencies are only checked for here; they are imported on first use
+# so importing this module stays cheap for tests, CLI commands and worker forks
+TWILIO_AVAILABLE = importlib.util.find_spec('twilio') is not None
+REDIS_AVAILABLE = importlib.util.find_spec('redis') is not None
+redis = None  # the redis module, once get_redis_client() has imported it
+
+from .archive import iter_archived_rows, months_back, rollover_orders, upgrade_archives
+from .backup import BackupError, BackupScheduler, backup_database
+from .cart import copy_cart, decode_cart, dumps_cart, loads_cart
+from .compression import compress_value, decompress_value
+from .deadline import (
+    Deadline, DeadlineExceeded, check_deadline, current_deadline, deadline_scope, note_timeout, parse_budgets,
+    time_left, timed_out,
+)
+from .kitchen import DEFAULT_HOLD_SECONDS, KitchenQueue
+from .menu_index import ArtifactError, MenuIndex, artifact_path, compile_menu, load_menu_index, read_artifact
+from .metrics import METRICS
+from .notifications import LocalTransport, NotificationService, SmsOutbox, TwilioTransport
+from .phones import customer_key
+from .ratelimit import AdmissionControl, MemoryBucketStore, RateLimiter, RedisBucketStore, parse_limit, parse_tool_limits
+from .recorder import CallRecorder, load_recordings, replay
+from .render_cache import RenderCache
+from .reports import (
+    EXPORT_COLUMNS, SECTION_COLUMNS, iter_csv, iter_json_array, iter_order_export, parse_date, sales_report,
+)
+from .schedule import WeeklySchedule
+from .shaping import VERBOSITIES, parse_fields, parse_overrides, shape_response
+from .slots import MemorySlotStore, RedisSlotStore, SlotScheduler
+from .sms_format import SmsPlan, fit_message, segment_info, to_gsm7
+from .tenants import Tenant, TenantRegistry, TenantUnavailable
 
 # ==================== CONFIGURATION ====================
 
@@ -125,28 +150,51 @@ app = Flask(__name__)
 # For production, set ALLOWED_ORIGINS in .env and configure CORS more restrictively
 CORS(app)
 
-# Logging
-# Create logs directory if it doesn't exist
-os.makedirs('logs', exist_ok=True)
-
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('logs/kebabalab_simplified.log'),
-        logging.StreamHandler()
-    ]
-)
+# Logging (handlers are attached by configure_logging(), not at import)
+LOG_DIR = os.getenv('LOG_DIR', 'logs')
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
 logger = logging.getLogger(__name__)
+_LOGGING_CONFIGURED = False
+
+
+def configure_logging(log_dir: Optional[str] = None, level: Optional[str] = None) -> None:
+    """Log to stderr and ``<log_dir>/kebabalab_simplified.log`` (once per process)"""
+    global _LOGGING_CONFIGURED
+    if _LOGGING_CONFIGURED:
+        return
+    log_dir = log_dir or LOG_DIR
+    os.makedirs(log_dir, exist_ok=True)
+    logging.basicConfig(
+        level=getattr(logging, level or LOG_LEVEL, logging.INFO),
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler(os.path.join(log_dir, 'kebabalab_simplified.log')),
+            logging.StreamHandler()
+        ]
+    )
+    _LOGGING_CONFIGURED = True
 
 # Paths
 # Get parent directory of kebabalab package (go up one level to project root)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DATA_DIR = os.path.join(BASE_DIR, 'data')
 MENU_FILE = os.path.join(DATA_DIR, 'menu.json')
+HOURS_FILE = os.path.join(DATA_DIR, 'hours.json')
 DB_FILE = os.path.join(DATA_DIR, 'orders.db')
-
-# Business constants
+ARCHIVE_DIR = os.getenv('ARCHIVE_DIR', os.path.join(DATA_DIR, 'archive'))
+ARCHIVE_AFTER_DAYS = int(os.getenv('ARCHIVE_AFTER_DAYS', '90'))
+BACKUP_DIR = os.getenv('BACKUP_DIR', os.path.join(BASE_DIR, 'backups'))
+BACKUP_INTERVAL_MINUTES = float(os.getenv('BACKUP_INTERVAL_MINUTES', '60'))  # 0 disables scheduled backups
+BACKUP_KEEP = int(os.getenv('BACKUP_KEEP', '24'))
+BACKUP_PAGES_PER_STEP = int(os.getenv('BACKUP_PAGES_PER_STEP', '64'))
+BACKUP_STEP_PAUSE = float(os.getenv('BACKUP_STEP_PAUSE', '0.005'))  # seconds writers get between steps
+
+# Other shops served by this process (see kebabalab/tenants.py); a missing file means a single shop.
+# TENANT_CACHE_SIZE is how many shops keep their menu, hours and kitchen state loaded at once
+TENANTS_FILE = os.getenv('TENANTS_FILE', os.path.join(BASE_DIR, 'config', 'tenants.json'))
+TENANT_CACHE_SIZE = int(os.getenv('TENANT_CACHE_SIZE', '32'))
+
+# Business constants (the default shop's; tenants take theirs from their business.json)
 MENU_LINK_URL = os.getenv('MENU_LINK_URL', 'https://www.kebabalab.com.au/menu.html')
 SHOP_NUMBER_DEFAULT = os.getenv('SHOP_ORDER_TO', '0423680596')
 SHOP_NAME = os.getenv('SHOP_NAME', 'Kebabalab')
@@ -164,72 +212,234 @@ except pytz.exceptions.UnknownTimeZoneError:
     logger.warning(f"Unknown timezone '{SHOP_TIMEZONE_STR}', falling back to Australia/Melbourne")
     SHOP_TIMEZONE = pytz.timezone('Australia/Melbourne')
 
-# Global menu
+# Global menu (loaded from MENU_FILE on first use, see get_menu) and its pricing index
 MENU = {}
+MENU_INDEX = MenuIndex.from_menu({})
+_MENU_LOADED = False
+# Load menus from the compiled artifact next to menu.json (built by `compile-menu`, refreshed
+# when stale); MENU_ARTIFACT_MMAP memory-maps it so workers share the pages
+MENU_ARTIFACTS = os.getenv('MENU_ARTIFACTS', 'true').lower() not in {'false', '0', 'no'}
+MENU_ARTIFACT_MMAP = os.getenv('MENU_ARTIFACT_MMAP', 'true').lower() not in {'false', '0', 'no'}
+# Rendered speech/SMS cart lines, keyed by item content
+RENDER_CACHE = RenderCache()
+
+# Tool results sent back to the assistant: 'compact' trims structured echoes, 'full' sends everything.
+# RESPONSE_VERBOSITY_OVERRIDES sets it per tool, e.g. "getCartState=full"
+RESPONSE_VERBOSITY = os.getenv('RESPONSE_VERBOSITY', 'compact').strip().lower()
+RESPONSE_VERBOSITY_OVERRIDES = parse_overrides(os.getenv('RESPONSE_VERBOSITY_OVERRIDES', ''))
+
+# Trading hours index compiled from hours.json (None if the file is missing)
+SCHEDULE: Optional[WeeklySchedule] = None
+_HOURS_LOADED = False
+# Kitchen queue model (built from MENU['kitchen'] on first use)
+KITCHEN: Optional[KitchenQueue] = None
+KITCHEN_RESYNC_SECONDS = int(os.getenv('KITCHEN_RESYNC_SECONDS', '60'))
+ORDER_STATUSES = ('pending', 'ready', 'completed', 'cancelled')
+
+# Pickup slot capacity: orders per SLOT_MINUTES window (0 disables the limit)
+SLOTS: Optional[SlotScheduler] = None
+SLOT_CAPACITY = int(os.getenv('SLOT_CAPACITY', '4'))
+SLOT_MINUTES = int(os.getenv('SLOT_MINUTES', '5'))
+
+# Admin endpoints are disabled unless a token is configured
+ADMIN_API_TOKEN = os.getenv('ADMIN_API_TOKEN', '')
+
+# Reject pickup slots outside trading hours
+ENFORCE_TRADING_HOURS = os.getenv('ENFORCE_TRADING_HOURS', 'true').lower() not in {'false', '0', 'no'}
 
 # Session storage: Redis (production) or in-memory (fallback)
 SESSIONS = {}  # Fallback in-memory storage if Redis unavailable
-REDIS_CLIENT = None
+REDIS_CLIENT = None  # connected on first use, see get_redis_client
+_REDIS_CHECKED = False
+_REDIS_LOCK = threading.Lock()
+REDIS_CONNECT_TIMEOUT = float(os.getenv('REDIS_CONNECT_TIMEOUT', '5'))
+REDIS_SOCKET_TIMEOUT = float(os.getenv('REDIS_SOCKET_TIMEOUT', '5'))
+REDIS_MAX_CONNECTIONS = int(os.getenv('REDIS_MAX_CONNECTIONS', '0')) or None  # sized per worker by `serve`
+
+# Webhook protection: token buckets per caller session ("calls/seconds") and per session and tool,
+# shared through Redis when it is available. MAX_CONCURRENT_TOOLS caps tool calls running at once
+# per process (0 = 3/4 of the worker's threads); calls that wait ADMISSION_WAIT_MS for a slot are shed
+RATE_LIMITS_ENABLED = os.getenv('RATE_LIMITS_ENABLED', 'true').lower() not in {'false', '0', 'no'}
+RATE_LIMIT_SESSION = parse_limit(os.getenv('RATE_LIMIT_SESSION', '60/60'))
+RATE_LIMIT_TOOLS = parse_tool_limits(os.getenv('RATE_LIMIT_TOOLS', 'createOrder=3/300,sendMenuLink=3/600,sendReceipt=3/600'))
+RATE_LIMITER: Optional[RateLimiter] = None
+MAX_CONCURRENT_TOOLS = int(os.getenv('MAX_CONCURRENT_TOOLS', '0'))
+ADMISSION_WAIT_MS = int(os.getenv('ADMISSION_WAIT_MS', '250'))
+ADMISSION = AdmissionControl(MAX_CONCURRENT_TOOLS or 16, ADMISSION_WAIT_MS / 1000)
+
+# Deadlines: VAPI gives up on a tool call after its timeout (20s unless configured), so a webhook
+# request has WEBHOOK_DEADLINE_SECONDS and each tool call the tighter of that and its budget
+# (TOOL_BUDGETS, else TOOL_BUDGET_SECONDS). Database waits, session reads and inline SMS get what's
+# left; SQLITE_BUSY_TIMEOUT is the lock wait outside a call (backups, CLI, outbox workers)
+WEBHOOK_DEADLINE_SECONDS = float(os.getenv('WEBHOOK_DEADLINE_SECONDS', '18'))
+TOOL_BUDGET_SECONDS = float(os.getenv('TOOL_BUDGET_SECONDS', '5'))
+TOOL_BUDGETS = parse_budgets(os.getenv('TOOL_BUDGETS', 'createOrder=10,sendMenuLink=6,sendReceipt=6'))
+SQLITE_BUSY_TIMEOUT = float(os.getenv('SQLITE_BUSY_TIMEOUT', '10'))
+
+# Call recorder (see kebabalab/recorder.py): set CALL_RECORD_DIR to log every webhook's tool calls,
+# results, session changes and timings for debugging and `kebabalab replay`. Off when empty
+CALL_RECORD_DIR = os.getenv('CALL_RECORD_DIR', '')
+CALL_RECORD_FLUSH_SECONDS = float(os.getenv('CALL_RECORD_FLUSH_SECONDS', '1'))
 
 # Session configuration
 SESSION_TTL = int(os.getenv('SESSION_TTL', '1800'))  # 30 minutes default
 MAX_SESSIONS = int(os.getenv('MAX_SESSIONS', '1000'))  # Max concurrent sessions (in-memory only)
+# Session keys holding carts; stored in Redis in the compact kebabalab.cart form
+CART_SESSION_KEYS = frozenset(('cart', 'last_order_cart'))
+# Redis session values at least this many bytes are zlib-compressed (0 disables)
+SESSION_COMPRESS_THRESHOLD = int(os.getenv('SESSION_COMPRESS_THRESHOLD', '1024'))
+SESSION_COMPRESS_LEVEL = int(os.getenv('SESSION_COMPRESS_LEVEL', '6'))
+# Load a caller's recent orders into the session in the background when their call starts
+CALLER_PREFETCH = os.getenv('CALLER_PREFETCH', 'true').lower() not in {'false', '0', 'no'}
+CALLER_HISTORY_ORDERS = 5
+# Caller history reads monthly archives back this many months (0 reads them all)
+CALLER_HISTORY_MONTHS = int(os.getenv('CALLER_HISTORY_MONTHS', '12'))
 # Will be initialized after SHOP_TIMEZONE is set
 LAST_CLEANUP = None
 CLEANUP_INTERVAL = timedelta(minutes=5)  # Run cleanup every 5 minutes
 
-# Initialize Redis connection
-if REDIS_AVAILABLE:
-    try:
-        redis_host = os.getenv('REDIS_HOST', 'localhost')
-        redis_port = int(os.getenv('REDIS_PORT', '6379'))
-        redis_db = int(os.getenv('REDIS_DB', '0'))
-        redis_password = os.getenv('REDIS_PASSWORD', None)
 
-        REDIS_CLIENT = redis.Redis(
+def _connect_redis():
+    """Import redis-py and connect, returning None if either fails"""
+    global redis
+    if not REDIS_AVAILABLE:
+        logger.warning("redis-py not available, using in-memory session storage (not production-ready)")
+        return None
+    import redis as redis_module
+    redis = redis_module
+
+    redis_host = os.getenv('REDIS_HOST', 'localhost')
+    redis_port = int(os.getenv('REDIS_PORT', '6379'))
+    redis_db = int(os.getenv('REDIS_DB', '0'))
+    redis_password = os.getenv('REDIS_PASSWORD', None)
+    try:
+        client = redis.Redis(
             host=redis_host,
             port=redis_port,
             db=redis_db,
             password=redis_password if redis_password else None,
             decode_responses=True,  # Automatically decode responses to strings
-            socket_connect_timeout=5,
-            socket_timeout=5
+            socket_connect_timeout=REDIS_CONNECT_TIMEOUT,
+            socket_timeout=REDIS_SOCKET_TIMEOUT,
+            max_connections=REDIS_MAX_CONNECTIONS,
         )
 
         # Test connection
-        REDIS_CLIENT.ping()
-        print(f"✓ Redis connected: {redis_host}:{redis_port} (db={redis_db})")
+        client.ping()
+        logger.info(f"Redis connected: {redis_host}:{redis_port} (db={redis_db})")
+        return client
     except (redis.ConnectionError, redis.TimeoutError) as e:
-        print(f"WARNING: Redis connection failed ({e}), falling back to in-memory sessions")
-        REDIS_CLIENT = None
+        logger.warning(f"Redis connection failed ({e}), falling back to in-memory sessions")
     except Exception as e:
-        print(f"WARNING: Redis initialization error ({e}), falling back to in-memory sessions")
-        REDIS_CLIENT = None
+        logger.warning(f"Redis initialization error ({e}), falling back to in-memory sessions")
+    return None
+
+
+def get_redis_client():
+    """Return the shared Redis client, connecting on first call (None means in-memory)"""
+    global REDIS_CLIENT, _REDIS_CHECKED
+    if _REDIS_CHECKED:
+        return REDIS_CLIENT
+    with _REDIS_LOCK:
+        if not _REDIS_CHECKED:
+            REDIS_CLIENT = _connect_redis()
+            _REDIS_CHECKED = True
+    return REDIS_CLIENT
 
 # ==================== DATABASE ====================
 
+def _open_sqlite(db_path: str, check_same_thread: bool = True) -> sqlite3.Connection:
+    conn = sqlite3.connect(db_path, timeout=time_left(SQLITE_BUSY_TIMEOUT), check_same_thread=check_same_thread)
+    conn.row_factory = sqlite3.Row  # Enable column access by name
+    return conn
+
+
+class SqlitePool:
+    """Up to ``size`` reusable connections to one database, for one worker process"""
+
+    def __init__(self, db_path: str, size: int):
+        self.db_path = db_path
+        self.size = max(1, int(size))
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.size)
+
+    def acquire(self) -> sqlite3.Connection:
+        wait = time_left(SQLITE_BUSY_TIMEOUT)
+        if not self._slots.acquire(timeout=wait):
+            raise sqlite3.OperationalError(f"No free database connection after {wait:.2f}s (pool size {self.size})")
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = None
+        try:
+            if conn is None:
+                return _open_sqlite(self.db_path, check_same_thread=False)
+            # A pooled connection keeps the lock wait of whoever used it last
+            conn.execute(f"PRAGMA busy_timeout = {int(time_left(SQLITE_BUSY_TIMEOUT) * 1000)}")
+            return conn
+        except sqlite3.Error:
+            if conn is not None:
+                conn.close()
+            self._slots.release()
+            raise
+
+    def release(self, conn: sqlite3.Connection, discard: bool = False) -> None:
+        if discard:
+            conn.close()
+        else:
+            self._idle.put(conn)
+        self._slots.release()
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+# Per-worker connection pool for DB_FILE (set by configure_worker_pools; None = connect per use)
+DB_POOL: Optional[SqlitePool] = None
+
+
+def _is_timeout(error: BaseException) -> bool:
+    """A deadline, or SQLite giving up on a lock or a pooled connection"""
+    if isinstance(error, DeadlineExceeded):
+        return True
+    message = str(error)
+    return isinstance(error, sqlite3.OperationalError) and (
+        'locked' in message or message.startswith('No free database connection')
+    )
+
+
 class DatabaseConnection:
     """Context manager for database connections with automatic cleanup"""
 
-    def __init__(self, db_path: str = DB_FILE):
-        self.db_path = db_path
+    def __init__(self, db_path: Optional[str] = None):
+        # Resolve at call time so tests and tools can repoint DB_FILE, and per tenant
+        self.db_path = db_path or _db_file()
         self.conn = None
         self.cursor = None
+        self.pool = DB_POOL if DB_POOL is not None and DB_POOL.db_path == self.db_path else None
 
     def __enter__(self):
-        """Open database connection"""
+        """Open database connection (or borrow one from the worker's pool)"""
+        check_deadline("opening the database")
         try:
-            self.conn = sqlite3.connect(self.db_path, timeout=10.0)
-            self.conn.row_factory = sqlite3.Row  # Enable column access by name
+            self.conn = self.pool.acquire() if self.pool else _open_sqlite(self.db_path)
             self.cursor = self.conn.cursor()
             return self.cursor
         except sqlite3.Error as e:
             logger.error(f"Database connection error: {e}")
+            if _is_timeout(e):
+                note_timeout(e)
             raise
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         """Close connection and handle errors"""
         if exc_type is not None:
+            if _is_timeout(exc_val):
+                note_timeout(exc_val)
             # Exception occurred, rollback transaction
             if self.conn:
                 try:
@@ -244,29 +454,39 @@ class DatabaseConnection:
                     self.conn.commit()
                 except sqlite3.Error as e:
                     logger.error(f"Commit error: {e}")
+                    if _is_timeout(e):
+                        note_timeout(e)
+                    self._close(discard=True)
                     raise
 
-        # Always close the connection
+        self._close()
+
+        # Don't suppress the exception
+        return False
+
+    def _close(self, discard: bool = False):
+        """Close the cursor and close (or return to the pool) the connection"""
         if self.cursor:
             try:
                 self.cursor.close()
             except sqlite3.Error:
                 pass
         if self.conn:
-            try:
-                self.conn.close()
-            except sqlite3.Error:
-                pass
-
-        # Don't suppress the exception
-        return False
+            if self.pool:
+                self.pool.release(self.conn, discard=discard or self.conn.in_transaction)
+            else:
+                try:
+                    self.conn.close()
+                except sqlite3.Error:
+                    pass
+        self.cursor = self.conn = None
 
-def init_database():
+def init_database(db_path: Optional[str] = None, archive_dir: Optional[str] = None):
     """Initialize SQLite database for orders with indexes for performance"""
     # Create data directory if it doesn't exist
-    os.makedirs(DATA_DIR, exist_ok=True)
+    os.makedirs(os.path.dirname(os.path.abspath(db_path or _db_file())), exist_ok=True)
 
-    with DatabaseConnection() as cursor:
+    with DatabaseConnection(db_path) as cursor:
         # Create orders table
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS orders (
@@ -285,69 +505,666 @@ def init_database():
             )
         ''')
 
-        # Create indexes for frequently queried fields (improves order history lookup)
+        # Canonical E.164 customer key (see kebabalab/phones.py); older databases (and their
+        # archives, below) gain the column here and have it filled by `backfill-customer-keys`
+        columns = {row[1] for row in cursor.execute('PRAGMA table_info(orders)')}
+        if 'customer_key' not in columns:
+            cursor.execute('ALTER TABLE orders ADD COLUMN customer_key TEXT')
+
+        # Create indexes for frequently queried fields (history lookups are one range of idx_customer_key)
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_customer_phone ON orders(customer_phone)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_customer_key ON orders(customer_key, created_at DESC)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_created_at ON orders(created_at DESC)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_order_number ON orders(order_number)')
+        # Kitchen resyncs read only the pending orders still due (see load_pending_orders)
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_status_ready ON orders(status, ready_at)')
+
+        # cart_json holds plain item dicts; rewrite any rows stored in the (unversioned) compact session form
+        compact = cursor.execute("SELECT id, cart_json FROM orders WHERE cart_json LIKE '[[%'").fetchall()
+        for order_id, cart_json in compact:
+            cursor.execute('UPDATE orders SET cart_json = ? WHERE id = ?', (json.dumps(loads_cart(cart_json)), order_id))
+        if compact:
+            logger.info(f"Rewrote {len(compact)} compact cart_json rows as item dicts")
+
+        # Normalized line items so "what sold" queries stay inside SQLite
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS order_items (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                order_id INTEGER NOT NULL REFERENCES orders(id) ON DELETE CASCADE,
+                line_no INTEGER NOT NULL,
+                category TEXT NOT NULL,
+                name TEXT,
+                protein TEXT,
+                size TEXT,
+                quantity INTEGER NOT NULL DEFAULT 1,
+                unit_price REAL NOT NULL DEFAULT 0,
+                is_combo INTEGER NOT NULL DEFAULT 0,
+                extras TEXT NOT NULL DEFAULT '[]'
+            )
+        ''')
+
+        # Covering indexes: per-order lookups and item sales aggregation
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_order_items_order ON order_items(order_id, line_no)')
+        cursor.execute(
+            'CREATE INDEX IF NOT EXISTS idx_order_items_sales '
+            'ON order_items(category, protein, size, quantity, unit_price)'
+        )
+
+    # History lookups read archives by customer_key too, so bring their schemas up to date
+    try:
+        upgrade_archives(db_path or _db_file(), archive_dir or shop_setting('archive_dir', ARCHIVE_DIR))
+    except sqlite3.Error as e:
+        logger.error(f"Archive schema upgrade failed: {e}")
 
     logger.info("Database initialized with performance indexes")
 
-# ==================== MENU ====================
 
-def load_menu():
-    """Load and validate menu from JSON file"""
-    global MENU
+def _order_item_rows(order_id: int, cart: List[Dict]) -> List[Tuple]:
+    """Flatten a cart into order_items rows for the given order id."""
+    rows = []
+    for line_no, item in enumerate(cart):
+        if not isinstance(item, dict):
+            continue
+        try:
+            quantity = int(item.get('quantity', 1) or 1)
+        except (ValueError, TypeError):
+            quantity = 1
+        try:
+            unit_price = float(item.get('price', 0.0) or 0.0)
+        except (ValueError, TypeError):
+            unit_price = 0.0
+        extras = [str(e) for e in (item.get('extras') or []) if e]
+        rows.append((
+            order_id,
+            line_no,
+            item.get('category') or 'unknown',
+            item.get('name'),
+            item.get('protein'),
+            item.get('size'),
+            quantity,
+            round(unit_price, 2),
+            1 if item.get('is_combo') else 0,
+            json.dumps(extras),
+        ))
+    return rows
+
+
+def insert_order_items(cursor, order_id: int, cart: List[Dict]) -> int:
+    """Insert normalized line items for an order using the caller's transaction."""
+    rows = _order_item_rows(order_id, cart)
+    if rows:
+        cursor.executemany(
+            '''
+            INSERT INTO order_items (
+                order_id, line_no, category, name, protein, size,
+                quantity, unit_price, is_combo, extras
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''',
+            rows,
+        )
+    return len(rows)
+
+
+def _ready_at_epoch(ready_at: Optional[str]) -> Optional[float]:
+    if not ready_at:
+        return None
     try:
-        with open(MENU_FILE, 'r', encoding='utf-8') as f:
-            MENU = json.load(f)
+        dt = datetime.fromisoformat(ready_at)
+    except ValueError:
+        return None
+    if dt.tzinfo is None:
+        dt = _shop_timezone().localize(dt)
+    return dt.timestamp()
+
+
+def load_pending_orders(
+    db_path: Optional[str] = None, now: Optional[float] = None
+) -> List[Tuple[str, List[Dict], Optional[float]]]:
+    """
+    Return (order_number, cart, expires_at epoch) for the pending orders the
+    kitchen queue would still hold: ready after ``now``, or with no pickup time
+    and placed within DEFAULT_HOLD_SECONDS. Older pending rows (never marked
+    done) would expire as soon as they were queued, so they aren't read.
+    """
+    now = time.time() if now is None else now
+    # ready_at is the shop's local ISO time, created_at is SQLite's UTC CURRENT_TIMESTAMP
+    ready_after = datetime.fromtimestamp(now, _shop_timezone()).strftime('%Y-%m-%dT%H:%M:%S')
+    created_after = datetime.fromtimestamp(now - DEFAULT_HOLD_SECONDS, pytz.utc).strftime('%Y-%m-%d %H:%M:%S')
+    with DatabaseConnection(db_path) as cursor:
+        cursor.execute(
+            """
+            SELECT order_number, cart_json, ready_at, created_at FROM orders
+            WHERE status = 'pending' AND ready_at >= ?
+            UNION ALL
+            SELECT order_number, cart_json, ready_at, created_at FROM orders
+            WHERE status = 'pending' AND (ready_at IS NULL OR ready_at = '') AND created_at >= ?
+            """,
+            (ready_after, created_after),
+        )
+        rows = cursor.fetchall()
+    pending = []
+    for order_number, cart_json, ready_at, created_at in rows:
+        expires_at = _ready_at_epoch(ready_at)
+        if expires_at is None:
+            try:
+                created = datetime.strptime(created_at, '%Y-%m-%d %H:%M:%S').replace(tzinfo=pytz.utc)
+                expires_at = created.timestamp() + DEFAULT_HOLD_SECONDS
+            except (TypeError, ValueError):
+                expires_at = None
+        elif expires_at <= now:
+            continue
+        try:
+            cart = loads_cart(cart_json)
+        except json.JSONDecodeError:
+            cart = []
+        pending.append((order_number, cart if isinstance(cart, list) else [], expires_at))
+    return pending
+
+
+def get_kitchen() -> KitchenQueue:
+    """Return the kitchen queue, priming it from pending orders when stale"""
+    global KITCHEN
+    tenant = _TENANT.get()
+    if tenant is not None:
+        kitchen = tenant.lazy('kitchen', lambda: KitchenQueue.from_menu(get_menu()))
+    else:
+        kitchen = KITCHEN
+    if kitchen is None:
+        kitchen = KITCHEN = KitchenQueue.from_menu(get_menu())
+    synced_at = kitchen.synced_at
+    if synced_at is None or time.time() - synced_at >= KITCHEN_RESYNC_SECONDS:
+        # Other workers create orders too, so resync occasionally rather than per call
+        kitchen.synced_at = time.time()
+        try:
+            kitchen.replace_all(load_pending_orders())
+        except (sqlite3.Error, DeadlineExceeded) as e:
+            logger.warning(f"Kitchen queue resync failed: {e}")
+    return kitchen
+
+
+def get_slot_scheduler() -> SlotScheduler:
+    """Return the pickup slot scheduler, shared through Redis when it is available"""
+    global SLOTS
+    tenant = _TENANT.get()
+    if tenant is not None:
+        return tenant.lazy('slots', lambda: _build_slot_scheduler(f"slots:{tenant.id}"))
+    if SLOTS is None:
+        SLOTS = _build_slot_scheduler("slots")
+    return SLOTS
+
+
+def _build_slot_scheduler(prefix: str) -> SlotScheduler:
+    client = get_redis_client()
+    if client:
+        return SlotScheduler(RedisSlotStore(client, prefix=prefix), SLOT_CAPACITY, SLOT_MINUTES)
+    slots = SlotScheduler(MemorySlotStore(), SLOT_CAPACITY, SLOT_MINUTES)
+    if slots.enabled:
+        logger.warning("Redis unavailable: pickup slot capacity is counted per worker process")
+        try:
+            slots.restore(_booked_slots(slots))
+        except (sqlite3.Error, DeadlineExceeded) as e:
+            logger.warning(f"Pickup slot counts not restored: {e}")
+    return slots
+
+
+def _booked_slots(slots: SlotScheduler) -> List[int]:
+    """Pickup slots from now on taken by orders that weren't cancelled"""
+    now = get_current_time()
+    since = slots.slot_start(slots.slot_of(now), _shop_timezone()).strftime('%Y-%m-%dT%H:%M:%S')
+    with DatabaseConnection() as cursor:
+        cursor.execute(
+            "SELECT ready_at FROM orders WHERE status IN ('pending', 'ready', 'completed') AND ready_at >= ?",
+            (since,),
+        )
+        rows = cursor.fetchall()
+    booked = []
+    for (ready_at,) in rows:
+        ready_at = _ready_at_epoch(ready_at)
+        if ready_at is not None:
+            booked.append(slots.slot_of(datetime.fromtimestamp(ready_at, _shop_timezone())))
+    return booked
+
+
+def _offer_pickup_slot(pickup_time: datetime, earliest: datetime) -> Optional[datetime]:
+    """
+    Return ``pickup_time`` if its slot has room, otherwise the start of the
+    nearest slot that does (never before ``earliest``), or None if there is none.
+    """
+    slots = get_slot_scheduler()
+    requested = slots.slot_of(pickup_time)
+    offered = slots.find_nearest(requested, earliest=slots.first_slot_at_or_after(earliest))
+    if offered is None:
+        return None
+    if offered == requested:
+        return pickup_time
+    return slots.slot_start(offered, _shop_timezone())
 
-        # Validate menu structure
-        if not isinstance(MENU, dict):
-            raise ValueError("Menu must be a dictionary")
+
+def set_order_status(order_number: str, status: str) -> bool:
+    """Update an order's status and keep the kitchen queue and pickup slots in step"""
+    if status not in ORDER_STATUSES:
+        raise ValueError(f"status must be one of {', '.join(ORDER_STATUSES)}")
+    with DatabaseConnection() as cursor:
+        cursor.execute('SELECT status, ready_at FROM orders WHERE order_number = ?', (order_number,))
+        previous = cursor.fetchone()
+        cursor.execute('UPDATE orders SET status = ? WHERE order_number = ?', (status, order_number))
+        updated = cursor.rowcount > 0
+    tenant = _TENANT.get()
+    kitchen = tenant.peek('kitchen') if tenant is not None else KITCHEN
+    if updated and kitchen is not None and status != 'pending':
+        kitchen.complete_order(order_number)
+    if updated and previous and status == 'cancelled' and previous[0] != 'cancelled':
+        ready_at = _ready_at_epoch(previous[1])
+        if ready_at is not None:
+            slots = get_slot_scheduler()
+            slots.release(slots.slot_of(datetime.fromtimestamp(ready_at, _shop_timezone())))
+    return updated
+
+
+def backfill_order_items(batch_size: int = 500, db_path: Optional[str] = None) -> Dict[str, int]:
+    """
+    Populate order_items for orders created before the table existed.
+
+    Walks orders by primary key in batches of ``batch_size`` and commits
+    each batch separately, so memory stays bounded and writers are only
+    held up for one batch at a time. Orders that already have line items
+    are skipped, which makes the backfill safe to re-run.
+    """
+    batch_size = max(1, int(batch_size))
+    stats = {"orders": 0, "items": 0, "skipped": 0, "batches": 0}
+    last_id = 0
+
+    while True:
+        with DatabaseConnection(db_path) as cursor:
+            cursor.execute(
+                '''
+                SELECT o.id, o.cart_json
+                FROM orders o
+                WHERE o.id > ?
+                  AND NOT EXISTS (SELECT 1 FROM order_items i WHERE i.order_id = o.id)
+                ORDER BY o.id
+                LIMIT ?
+                ''',
+                (last_id, batch_size),
+            )
+            batch = cursor.fetchall()
+            if not batch:
+                break
+
+            for order_id, cart_json in batch:
+                last_id = order_id
+                try:
+                    cart = loads_cart(cart_json)
+                except (json.JSONDecodeError, TypeError):
+                    logger.warning(f"Backfill: order {order_id} has unreadable cart_json, skipping")
+                    stats["skipped"] += 1
+                    continue
+                if not isinstance(cart, list):
+                    stats["skipped"] += 1
+                    continue
+                stats["items"] += insert_order_items(cursor, order_id, cart)
+                stats["orders"] += 1
+
+        stats["batches"] += 1
+        logger.info(f"Backfill batch {stats['batches']}: up to order id {last_id}, {stats['items']} items so far")
+
+    return stats
+
+
+def _backfill_customer_keys_in(db_path: str, batch_size: int, stats: Dict[str, int]) -> None:
+    last_id = 0
+    while True:
+        with DatabaseConnection(db_path) as cursor:
+            cursor.execute(
+                '''
+                SELECT id, customer_phone FROM orders
+                WHERE customer_key IS NULL AND id > ?
+                ORDER BY id
+                LIMIT ?
+                ''',
+                (last_id, batch_size),
+            )
+            batch = cursor.fetchall()
+            if not batch:
+                return
+            last_id = batch[-1][0]
+            keyed = [(customer_key(phone), order_id) for order_id, phone in batch]
+            cursor.executemany('UPDATE orders SET customer_key = ? WHERE id = ?', [row for row in keyed if row[0]])
+        stats["batches"] += 1
+        stats["orders"] += sum(1 for key, _ in keyed if key)
+        stats["unkeyed"] += sum(1 for key, _ in keyed if not key)
+
+
+def backfill_customer_keys(batch_size: int = 500, db_path: Optional[str] = None,
+                           archive_dir: Optional[str] = None) -> Dict[str, int]:
+    """
+    Fill orders.customer_key for orders written before the column existed,
+    in the hot database and in every monthly archive (whose schema is
+    brought up to date first). Batched by primary key like
+    backfill_order_items and safe to re-run: only rows without a key are
+    read. Numbers that aren't phone numbers stay NULL and are counted as
+    ``unkeyed``.
+    """
+    batch_size = max(1, int(batch_size))
+    db_path = db_path or _db_file()
+    archive_dir = archive_dir or shop_setting('archive_dir', ARCHIVE_DIR)
+    stats = {"orders": 0, "unkeyed": 0, "batches": 0, "archives": 0}
+    init_database(db_path, archive_dir)
+    _backfill_customer_keys_in(db_path, batch_size, stats)
+    for path in upgrade_archives(db_path, archive_dir):
+        _backfill_customer_keys_in(path, batch_size, stats)
+        stats["archives"] += 1
+    logger.info(f"Customer keys: {stats['orders']} orders keyed, {stats['unkeyed']} without a usable number")
+    return stats
+
+
+BACKUPS: Optional[BackupScheduler] = None
+
+
+def run_backup(db_path: Optional[str] = None, backup_dir: Optional[str] = None, verify: bool = True) -> Dict[str, Any]:
+    """Snapshot the orders database now (online, a few pages at a time) and record metrics"""
+    try:
+        stats = backup_database(
+            db_path or DB_FILE,
+            backup_dir or BACKUP_DIR,
+            pages_per_step=BACKUP_PAGES_PER_STEP,
+            step_pause=BACKUP_STEP_PAUSE,
+            keep=BACKUP_KEEP,
+            verify=verify,
+        )
+    except BackupError:
+        METRICS.incr('backup_failures_total')
+        raise
+    METRICS.incr('backups_total')
+    METRICS.observe('backup_duration_seconds', stats['seconds'])
+    METRICS.gauge('backup_pages', stats['pages'])
+    METRICS.gauge('backup_pages_per_second', stats['pages_per_second'])
+    METRICS.gauge('backup_last_completed', time.time())
+    return stats
+
+
+def start_backups() -> Optional[BackupScheduler]:
+    """Start scheduled backups (every BACKUP_INTERVAL_MINUTES; 0 disables)"""
+    global BACKUPS
+    if BACKUP_INTERVAL_MINUTES <= 0:
+        return None
+    if BACKUPS is None or not BACKUPS.running:
+        BACKUPS = BackupScheduler(BACKUP_DIR, BACKUP_INTERVAL_MINUTES * 60, run_backup).start()
+    return BACKUPS
+
+
+def stop_backups(timeout: float = 5.0) -> None:
+    global BACKUPS
+    if BACKUPS is not None:
+        BACKUPS.stop(timeout)
+        BACKUPS = None
+
+
+# ==================== MENU ====================
+
+def _read_menu(menu_file: str) -> Optional[MenuIndex]:
+    """Load and validate a menu (compiled artifact or JSON), or None (logged) if it can't be used"""
+    try:
+        if MENU_ARTIFACTS:
+            compiled, source = load_menu_index(menu_file, use_mmap=MENU_ARTIFACT_MMAP)
+        else:
+            with open(menu_file, 'r', encoding='utf-8') as f:
+                menu = json.load(f)
+            # Validate menu structure
+            if not isinstance(menu, dict):
+                raise ValueError("Menu must be a dictionary")
+            compiled, source = MenuIndex.from_menu(menu), 'json'
+        menu = compiled.menu
 
         # Validate categories exist
         required_categories = ['kebabs', 'hsp', 'chips', 'drinks']
-        categories = MENU.get('categories', {})
+        categories = menu.get('categories', {})
         for category in required_categories:
             if category not in categories:
                 logger.warning(f"Menu missing category: {category}")
 
         # Log menu stats
         total_items = sum(len(items) for items in categories.values() if isinstance(items, list))
-        logger.info(f"Menu loaded: {len(categories)} categories, {total_items} items from {MENU_FILE}")
-        return True
+        logger.info(f"Menu loaded: {len(categories)} categories, {total_items} items from {menu_file} ({source})")
+        return compiled
 
     except FileNotFoundError:
-        logger.error(f"Menu file not found: {MENU_FILE}")
+        logger.error(f"Menu file not found: {menu_file}")
         logger.error("Server cannot operate without menu! Please ensure menu.json exists.")
-        return False
     except json.JSONDecodeError as e:
         logger.error(f"Invalid JSON in menu file: {e}")
-        return False
     except Exception as e:
         logger.error(f"Failed to load menu: {e}")
-        return False
+    return None
+
+def load_menu():
+    """Load and validate menu from JSON file"""
+    global MENU, MENU_INDEX, KITCHEN, _MENU_LOADED
+    KITCHEN = None  # rebuilt from the new menu's kitchen config on next use
+    RENDER_CACHE.clear()  # cached lines include menu prices
+    try:
+        compiled = _read_menu(MENU_FILE)
+        if compiled is None:
+            return False
+        MENU, MENU_INDEX = compiled.menu, compiled
+        return True
+    finally:
+        # Only after MENU is assigned, so concurrent first callers never see an empty menu
+        _MENU_LOADED = True
+
+def get_menu() -> Dict[str, Any]:
+    """Return the menu (the current tenant's, if any), loading it on first use"""
+    return get_menu_index().menu
+
+def get_menu_index() -> MenuIndex:
+    """Return the menu with its pricing index (the current tenant's, if any)"""
+    tenant = _TENANT.get()
+    if tenant is not None:
+        return tenant.lazy('menu', lambda: _tenant_menu(tenant))
+    if not _MENU_LOADED:
+        load_menu()
+    return MENU_INDEX
+
+def _read_hours(hours_file: str) -> Optional[WeeklySchedule]:
+    """Compile an hours.json file, or None (logged) if it is missing or invalid"""
+    try:
+        schedule = WeeklySchedule.from_file(hours_file)
+        logger.info(f"Hours loaded: {len(schedule.intervals)} weekly intervals from {hours_file}")
+        return schedule
+    except FileNotFoundError:
+        logger.warning(f"Hours file not found: {hours_file} - trading hours not enforced")
+    except (ValueError, KeyError, json.JSONDecodeError) as e:
+        logger.error(f"Invalid hours file {hours_file}: {e}")
+    return None
+
+def load_hours():
+    """Compile trading hours from hours.json into the schedule index"""
+    global SCHEDULE, _HOURS_LOADED
+    try:
+        SCHEDULE = _read_hours(HOURS_FILE)
+        return SCHEDULE is not None
+    finally:
+        _HOURS_LOADED = True
+
+
+def get_schedule() -> Optional[WeeklySchedule]:
+    """Return the trading hours index (the current tenant's, if any), compiling it on first use"""
+    tenant = _TENANT.get()
+    if tenant is not None:
+        return tenant.lazy('schedule', lambda: _read_hours(tenant.hours_file))
+    if not _HOURS_LOADED:
+        load_hours()
+    return SCHEDULE
+
+
+def check_trading_hours(when: datetime) -> Optional[str]:
+    """Return a speakable reason if ``when`` is outside trading hours, else None"""
+    schedule = get_schedule() if ENFORCE_TRADING_HOURS else None
+    if schedule is None:
+        return None
+    status = schedule.status(when)
+    if status.is_open:
+        return None
+    if status.next_open is None:
+        return "Sorry, we're not taking orders at the moment."
+    next_open = _shop_timezone().normalize(status.next_open) if status.next_open.tzinfo else status.next_open
+    day = "" if next_open.date() == when.date() else f" {next_open.strftime('%A')}"
+    return f"We're closed at {_format_time_for_display(when)}. We open again at {_format_time_for_display(next_open)}{day}."
+
+# ==================== TENANTS ====================
+
+# Loaded from TENANTS_FILE on first use (None = this process serves only the default shop)
+TENANTS: Optional[TenantRegistry] = None
+_TENANTS_LOADED = False
+_TENANTS_LOCK = threading.Lock()
+# The shop the current request is for; None is the default shop (module settings)
+_TENANT: contextvars.ContextVar = contextvars.ContextVar('tenant', default=None)
+
+
+def _tenant_menu(tenant: Tenant) -> MenuIndex:
+    menu = _read_menu(tenant.menu_file)
+    if menu is None:
+        # An empty menu would price every order at $0: don't take the shop's calls at all
+        raise TenantUnavailable(tenant.id, f"menu {tenant.menu_file} is missing or invalid")
+    return menu
+
+
+def _prepare_tenant(tenant: Tenant) -> None:
+    """Called as a tenant is loaded into the active set (raises TenantUnavailable if it can't serve)"""
+    tenant.lazy('menu', lambda: _tenant_menu(tenant))
+    init_database(tenant.db_file, tenant.settings['archive_dir'])
+    METRICS.incr('tenant_loads_total', tenant=tenant.id)
+    logger.info(f"Tenant '{tenant.id}' loaded: {tenant.settings['name']} ({tenant.data_dir})")
+
+
+def get_tenants() -> Optional[TenantRegistry]:
+    """Return the tenant registry, reading TENANTS_FILE on first use"""
+    global TENANTS, _TENANTS_LOADED
+    if _TENANTS_LOADED:
+        return TENANTS
+    with _TENANTS_LOCK:
+        if not _TENANTS_LOADED:
+            registry = None
+            if os.path.exists(TENANTS_FILE):
+                try:
+                    registry = TenantRegistry.from_file(
+                        TENANTS_FILE, BASE_DIR, maxsize=TENANT_CACHE_SIZE, on_load=_prepare_tenant
+                    )
+                    logger.info(f"Tenants loaded: {len(registry)} shops from {TENANTS_FILE}")
+                except (OSError, ValueError) as e:
+                    logger.error(f"Invalid tenants file {TENANTS_FILE}: {e} - serving the default shop only")
+            TENANTS = registry
+            _TENANTS_LOADED = True
+    return TENANTS
+
+
+def current_tenant() -> Optional[Tenant]:
+    return _TENANT.get()
+
+
+@contextmanager
+def tenant_scope(tenant: Optional[Tenant]):
+    """Run the block for ``tenant`` (None = the default shop)"""
+    token = _TENANT.set(tenant)
+    try:
+        yield tenant
+    finally:
+        _TENANT.reset(token)
+
+
+def shop_setting(name: str, default: Any) -> Any:
+    """A shop setting (name, address, timezone, order_to, menu_url, archive_dir) for the current tenant"""
+    tenant = _TENANT.get()
+    return default if tenant is None else tenant.settings[name]
+
+
+def _shop_timezone():
+    return shop_setting('timezone', SHOP_TIMEZONE)
+
+
+def _db_file() -> str:
+    tenant = _TENANT.get()
+    return DB_FILE if tenant is None else tenant.db_file
+
+
+def _render_cache() -> RenderCache:
+    tenant = _TENANT.get()
+    return RENDER_CACHE if tenant is None else tenant.render_cache
+
+
+TENANT_UNAVAILABLE_MESSAGE = (
+    "Sorry, we can't take orders over the phone right now. Please try again a bit later."
+)
+
+
+def _tenant_unavailable_response(message: Any):
+    """Every tool call answered with something the assistant can say (503 for anything else)"""
+    tool_calls = message.get('toolCalls') if isinstance(message, dict) else None
+    if not tool_calls:
+        return jsonify({"ok": False, "error": "Shop unavailable"}), 503
+    result = {"ok": False, "error": TENANT_UNAVAILABLE_MESSAGE, "unavailable": True}
+    return jsonify({"results": [
+        {"toolCallId": call.get('id') or call.get('toolCallId'), "result": result} for call in tool_calls
+    ]})
+
+
+def _tenant_scoped(view):
+    """
+    Run an endpoint for one shop: the one named by ``?tenant=<id>`` (404 if
+    unknown), else the one a VAPI payload was dialled to, else the default.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        registry = get_tenants()
+        tenant = None
+        if registry is not None:
+            data = request.get_json(silent=True) or {}
+            message = data.get('message') if isinstance(data, dict) else None
+            try:
+                tenant_id = request.args.get('tenant')
+                if tenant_id:
+                    if tenant_id not in registry.specs:
+                        return jsonify({"ok": False, "error": f"Unknown tenant: {tenant_id}"}), 404
+                    tenant = registry.get(tenant_id)
+                elif isinstance(message, dict):
+                    tenant = registry.resolve(message)
+            except TenantUnavailable as e:
+                logger.error(str(e))
+                METRICS.incr('tenant_unavailable_total', tenant=e.tenant_id)
+                return _tenant_unavailable_response(message)
+        with tenant_scope(tenant):
+            return view(*args, **kwargs)
+    return wrapper
 
 # ==================== SESSION MANAGEMENT ====================
 
 def get_session_id() -> str:
-    """Get session ID from request (phone number or call ID)"""
+    """Get session ID from request (phone number or call ID), namespaced by tenant"""
     data = request.get_json() or {}
     message = data.get('message', {})
 
-    # Try to get phone number from call
-    phone = message.get('call', {}).get('customer', {}).get('number', '')
-    if phone:
-        return phone
+    # Try to get phone number from call, falling back to call ID
+    session_id = message.get('call', {}).get('customer', {}).get('number', '')
+    if not session_id:
+        session_id = message.get('call', {}).get('id', 'default')
 
-    # Fallback to call ID
-    call_id = message.get('call', {}).get('id', 'default')
-    return call_id
+    tenant = _TENANT.get()
+    return session_id if tenant is None else f"{tenant.id}:{session_id}"
+
+def _call_id() -> Optional[str]:
+    """VAPI call id of the current request, if any"""
+    data = request.get_json(silent=True) or {}
+    return (data.get('message') or {}).get('call', {}).get('id')
+
+def _caller_phone() -> Optional[str]:
+    """The calling number of the current request, if VAPI sent one"""
+    data = request.get_json(silent=True) or {}
+    return (data.get('message') or {}).get('call', {}).get('customer', {}).get('number')
 
 def cleanup_expired_sessions():
     """Remove expired sessions to prevent memory leaks (in-memory only, Redis uses TTL)"""
     # Redis handles expiration automatically via TTL
-    if REDIS_CLIENT:
+    if get_redis_client():
         return
 
     global LAST_CLEANUP
@@ -380,7 +1197,7 @@ def cleanup_expired_sessions():
 def enforce_session_limits():
     """Enforce maximum session count by removing oldest sessions (in-memory only)"""
     # Redis doesn't need manual limit enforcement, uses TTL and memory policies
-    if REDIS_CLIENT:
+    if get_redis_client():
         return
 
     if len(SESSIONS) <= MAX_SESSIONS:
@@ -401,24 +1218,74 @@ def enforce_session_limits():
 
     logger.warning(f"Session limit reached. Removed {to_remove} oldest sessions")
 
+def _compress_session_value(serialized: str) -> str:
+    """Compress a large Redis session value and record how much it saved"""
+    packed = compress_value(serialized, SESSION_COMPRESS_THRESHOLD, SESSION_COMPRESS_LEVEL)
+    if packed.compressed:
+        METRICS.incr('session_values_compressed_total')
+        METRICS.incr('session_compression_bytes_in', packed.raw_bytes)
+        METRICS.incr('session_compression_bytes_out', packed.stored_bytes)
+        METRICS.incr('session_compression_bytes_saved', packed.bytes_saved)
+        METRICS.observe('session_compression_ratio', packed.ratio)
+    return packed.value
+
+def _decode_session_value(redis_key: str, key: str, stored: Optional[str], default=None):
+    """Stored Redis string -> session value"""
+    try:
+        value = decompress_value(stored)
+    except ValueError as e:
+        logger.error(f"Unreadable session value {redis_key}: {e}")
+        return default
+
+    if value is None:
+        return default
+
+    # Try to deserialize JSON if it's a complex type
+    try:
+        value = json.loads(value)
+    except (json.JSONDecodeError, TypeError):
+        return value
+    return decode_cart(value) if key in CART_SESSION_KEYS else value
+
+def _encode_session_value(key: str, value: Any) -> str:
+    """Session value -> string stored in Redis"""
+    # Serialize complex types to JSON (carts in their compact positional form)
+    if key in CART_SESSION_KEYS and isinstance(value, list):
+        serialized_value = dumps_cart(value)
+    elif isinstance(value, (dict, list, tuple)):
+        serialized_value = json.dumps(value)
+    else:
+        serialized_value = str(value)
+    return _compress_session_value(serialized_value)
+
 def session_get(key: str, default=None):
     """Get value from session with TTL tracking (Redis or in-memory)"""
-    session_id = get_session_id()
+    batch = _SESSION_BATCH.get()
+    if batch is not None:
+        return batch.get(key, default)
+    return _session_read(get_session_id(), key, default)
+
+def session_set(key: str, value: Any):
+    """Set value in session with TTL tracking (Redis or in-memory)"""
+    delta = _SESSION_DELTA.get()
+    if delta is not None:
+        delta[key] = value
+    batch = _SESSION_BATCH.get()
+    if batch is not None:
+        batch.set(key, value)
+        return
+    _session_write(get_session_id(), key, value)
+
+def _session_read(session_id: str, key: str, default=None):
+    # A tool past its deadline stops at its next read rather than carrying on unheard
+    check_deadline("reading the session")
 
     # Redis implementation
-    if REDIS_CLIENT:
+    client = get_redis_client()
+    if client:
         try:
             redis_key = f"session:{session_id}:{key}"
-            value = REDIS_CLIENT.get(redis_key)
-
-            if value is None:
-                return default
-
-            # Try to deserialize JSON if it's a complex type
-            try:
-                return json.loads(value)
-            except (json.JSONDecodeError, TypeError):
-                return value
+            return _decode_session_value(redis_key, key, client.get(redis_key), default)
 
         except redis.RedisError as e:
             logger.error(f"Redis get error: {e}, falling back to in-memory")
@@ -444,23 +1311,15 @@ def session_get(key: str, default=None):
 
     return SESSIONS[session_id].get(key, default)
 
-def session_set(key: str, value: Any):
-    """Set value in session with TTL tracking (Redis or in-memory)"""
-    session_id = get_session_id()
-
+def _session_write(session_id: str, key: str, value: Any):
     # Redis implementation
-    if REDIS_CLIENT:
+    client = get_redis_client()
+    if client:
         try:
             redis_key = f"session:{session_id}:{key}"
 
-            # Serialize complex types to JSON
-            if isinstance(value, (dict, list, tuple)):
-                serialized_value = json.dumps(value)
-            else:
-                serialized_value = str(value)
-
             # Store with TTL
-            REDIS_CLIENT.setex(redis_key, SESSION_TTL, serialized_value)
+            client.setex(redis_key, SESSION_TTL, _encode_session_value(key, value))
             return
 
         except redis.RedisError as e:
@@ -492,15 +1351,20 @@ def session_clear(session_id: Optional[str] = None):
     """Clear a specific session or current session (Redis or in-memory)"""
     if session_id is None:
         session_id = get_session_id()
+    delta = _SESSION_DELTA.get()
+    if delta is not None:
+        delta.clear()
+        delta['*'] = None  # the whole session was cleared
 
     # Redis implementation
-    if REDIS_CLIENT:
+    client = get_redis_client()
+    if client:
         try:
             # Delete all keys for this session
             pattern = f"session:{session_id}:*"
-            keys = REDIS_CLIENT.keys(pattern)
+            keys = client.keys(pattern)
             if keys:
-                REDIS_CLIENT.delete(*keys)
+                client.delete(*keys)
                 logger.info(f"Session cleared from Redis: {session_id} ({len(keys)} keys)")
             return
 
@@ -513,6 +1377,91 @@ def session_clear(session_id: Optional[str] = None):
         del SESSIONS[session_id]
         logger.info(f"Session cleared from memory: {session_id}")
 
+_MISSING = object()
+
+class SessionBatch:
+    """Session values staged for one tool call: loaded once, written back together or not at all"""
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.values: Dict[str, Any] = {}
+        self.dirty: set = set()
+        self.discarded = False
+
+    def load(self, keys: Iterable[str]):
+        keys = [key for key in keys if key not in self.values]
+        if not keys:
+            return
+        check_deadline("reading the session")
+        client = get_redis_client()
+        if client:
+            try:
+                redis_keys = [f"session:{self.session_id}:{key}" for key in keys]
+                for key, redis_key, stored in zip(keys, redis_keys, client.mget(redis_keys)):
+                    self.values[key] = _decode_session_value(redis_key, key, stored, _MISSING)
+                return
+            except redis.RedisError as e:
+                logger.error(f"Redis mget error: {e}, loading keys one at a time")
+        for key in keys:
+            # Copied so a discarded batch leaves in-memory sessions untouched
+            self.values[key] = copy.deepcopy(_session_read(self.session_id, key, _MISSING))
+
+    def get(self, key: str, default=None):
+        self.load((key,))
+        value = self.values[key]
+        return default if value is _MISSING else value
+
+    def set(self, key: str, value: Any):
+        self.values[key] = value
+        self.dirty.add(key)
+
+    def discard(self):
+        self.discarded = True
+
+    def commit(self):
+        if self.discarded or not self.dirty:
+            return
+        client = get_redis_client()
+        if client:
+            try:
+                pipe = client.pipeline(transaction=True)
+                for key in self.dirty:
+                    pipe.setex(f"session:{self.session_id}:{key}", SESSION_TTL,
+                               _encode_session_value(key, self.values[key]))
+                pipe.execute()
+                return
+            except redis.RedisError as e:
+                logger.error(f"Redis pipeline error: {e}, writing keys one at a time")
+        for key in self.dirty:
+            _session_write(self.session_id, key, self.values[key])
+
+_SESSION_BATCH: contextvars.ContextVar = contextvars.ContextVar('session_batch', default=None)
+# Session keys set by the current tool call, while the call recorder is on
+_SESSION_DELTA: contextvars.ContextVar = contextvars.ContextVar('session_delta', default=None)
+
+@contextmanager
+def session_batch(preload: Iterable[str] = ()):
+    """
+    Route session_get/session_set through one SessionBatch for the block.
+
+    Keys in ``preload`` are fetched in a single round trip. Writes are saved
+    when the block exits normally, unless ``discard()`` was called; an
+    exception discards them too. Nested batches join the outer one.
+    """
+    outer = _SESSION_BATCH.get()
+    if outer is not None:
+        outer.load(preload)
+        yield outer
+        return
+    batch = SessionBatch(get_session_id())
+    batch.load(preload)
+    token = _SESSION_BATCH.set(batch)
+    try:
+        yield batch
+    finally:
+        _SESSION_BATCH.reset(token)
+    batch.commit()
+
 # ==================== INPUT VALIDATION ====================
 
 def sanitize_for_sms(text: str) -> str:
@@ -578,13 +1527,14 @@ def validate_quantity(quantity: Any) -> Tuple[bool, int]:
 
 def validate_menu_item(category: str, item_name: str, size: Optional[str] = None) -> Tuple[bool, str]:
     """Validate that menu item exists"""
-    if not MENU:
+    menu = get_menu()
+    if not menu:
         return False, "Menu not loaded"
 
-    if category not in MENU:
+    if category not in menu:
         return False, f"Category '{category}' not found in menu"
 
-    category_items = MENU[category].get('items', {})
+    category_items = menu[category].get('items', {})
     if item_name not in category_items:
         return False, f"Item '{item_name}' not found in category '{category}'"
 
@@ -641,6 +1591,7 @@ def fuzzy_match(text: str, choices: List[str], threshold: int = 80) -> Optional[
     """
     if not FUZZY_MATCHING_AVAILABLE or not text or not choices:
         return None
+    from rapidfuzz import fuzz, process
 
     text = normalize_text(text)
     # Extract word tokens from text for better matching
@@ -662,7 +1613,7 @@ def fuzzy_match(text: str, choices: List[str], threshold: int = 80) -> Optional[
 
 def get_current_time() -> datetime:
     """Get current time in shop's timezone (timezone-aware)"""
-    return datetime.now(SHOP_TIMEZONE)
+    return datetime.now(_shop_timezone())
 
 def get_local_time(dt: Optional[datetime] = None) -> datetime:
     """Convert datetime to shop's timezone. If None, returns current time."""
@@ -671,7 +1622,7 @@ def get_local_time(dt: Optional[datetime] = None) -> datetime:
     if dt.tzinfo is None:
         # Naive datetime, assume UTC
         dt = pytz.utc.localize(dt)
-    return dt.astimezone(SHOP_TIMEZONE)
+    return dt.astimezone(_shop_timezone())
 
 def calculate_gst_from_inclusive(total: float) -> Tuple[float, float]:
     """
@@ -734,32 +1685,42 @@ def _normalize_au_local(phone: str) -> str:
 
 
 def _au_to_e164(phone: str) -> str:
-    digits = re.sub(r"\D+", "", str(phone or ""))
-    if not digits:
-        return str(phone or "")
-    if digits.startswith("0") and len(digits) == 10:
-        return "+61" + digits[1:]
-    if digits.startswith("61") and len(digits) == 11:
-        return "+" + digits
-    if str(phone).startswith("+"):
-        return str(phone)
-    return str(phone)
+    return customer_key(phone) or str(phone or "")
 
 
-def _get_twilio_client():  # pragma: no cover - optional runtime dependency
-    if Client is None:
-        return None, None
+_TWILIO_TRANSPORT: Optional[TwilioTransport] = None
+_TWILIO_LOCK = threading.Lock()
+
+
+def _get_twilio_transport() -> Optional[TwilioTransport]:
+    """Return the process-wide Twilio transport, creating it once per credential set."""
+    global _TWILIO_TRANSPORT
+    if not TWILIO_AVAILABLE:
+        return None
     account_sid = os.getenv('TWILIO_ACCOUNT_SID')
     auth_token = os.getenv('TWILIO_AUTH_TOKEN')
     from_number = os.getenv('TWILIO_FROM') or os.getenv('TWILIO_PHONE_NUMBER')
     if not all([account_sid, auth_token, from_number]):
+        return None
+    with _TWILIO_LOCK:
+        current = _TWILIO_TRANSPORT
+        if current is None or (current.account_sid, current.auth_token, current.from_number) != (
+            account_sid, auth_token, from_number
+        ):
+            _TWILIO_TRANSPORT = TwilioTransport(account_sid, auth_token, from_number, timeout=SMS_SEND_TIMEOUT)
+        return _TWILIO_TRANSPORT
+
+
+def _get_twilio_client():  # pragma: no cover - optional runtime dependency
+    transport = _get_twilio_transport()
+    if transport is None:
         return None, None
     try:
-        client = Client(account_sid, auth_token)
+        client = transport.client
     except Exception as exc:  # pragma: no cover - defensive
         logger.error(f"Failed to initialise Twilio client: {exc}")
         return None, None
-    return client, from_number
+    return client, transport.from_number
 
 
 def _send_sms(phone: str, body: str) -> Tuple[bool, Optional[str]]:
@@ -774,7 +1735,127 @@ def _send_sms(phone: str, body: str) -> Tuple[bool, Optional[str]]:
         return False, str(exc)
 
 
-def _format_item_for_sms(item: Dict) -> str:
+# ==================== SMS OUTBOX ====================
+
+SMS_TRANSPORT = os.getenv('SMS_TRANSPORT', 'twilio').lower()  # twilio | local | off
+SMS_WORKERS = int(os.getenv('SMS_WORKERS', '2'))
+SMS_MAX_ATTEMPTS = int(os.getenv('SMS_MAX_ATTEMPTS', '5'))
+SMS_SEGMENT_BUDGET_CUSTOMER = int(os.getenv('SMS_SEGMENT_BUDGET_CUSTOMER', '2'))
+SMS_SEGMENT_BUDGET_SHOP = int(os.getenv('SMS_SEGMENT_BUDGET_SHOP', '4'))
+SMS_SEND_TIMEOUT = float(os.getenv('SMS_SEND_TIMEOUT', '10'))  # seconds to wait on Twilio per message
+DEFER_WORKERS = int(os.getenv('DEFER_WORKERS', '2'))
+
+NOTIFIER: Optional[NotificationService] = None
+# Side effects a tool call handed off so it could answer in time (see defer())
+DEFERRED: Optional[ThreadPoolExecutor] = None
+_DEFERRED_LOCK = threading.Lock()
+
+
+def _build_sms_transport():
+    if SMS_TRANSPORT == 'local':
+        return LocalTransport()
+    if SMS_TRANSPORT == 'twilio':
+        return _get_twilio_transport()
+    return None
+
+
+def start_notifications(db_path: Optional[str] = None, transport=None, workers: Optional[int] = None):
+    """Start the background SMS outbox workers. Returns None if SMS isn't configured."""
+    global NOTIFIER
+    if NOTIFIER is not None and NOTIFIER.running:
+        return NOTIFIER
+    transport = transport or _build_sms_transport()
+    if transport is None:
+        logger.warning("SMS outbox not started - no SMS transport configured")
+        return None
+    outbox = SmsOutbox(db_path or DB_FILE, max_attempts=SMS_MAX_ATTEMPTS)
+    NOTIFIER = NotificationService(outbox, transport, workers=workers or SMS_WORKERS).start()
+    return NOTIFIER
+
+
+def stop_notifications(timeout: float = 5.0) -> None:
+    global NOTIFIER
+    if NOTIFIER is not None:
+        NOTIFIER.stop(timeout)
+        NOTIFIER = None
+
+
+def _notifications_running() -> bool:
+    return NOTIFIER is not None and NOTIFIER.running
+
+
+def defer(func, *args) -> None:
+    """Run ``func(*args)`` on a background thread, in this shop but outside any deadline"""
+    global DEFERRED
+    with _DEFERRED_LOCK:
+        if DEFERRED is None:
+            DEFERRED = ThreadPoolExecutor(max_workers=DEFER_WORKERS, thread_name_prefix='kebabalab-deferred')
+        executor = DEFERRED
+
+    def run():
+        with deadline_scope(None):
+            try:
+                func(*args)
+            except Exception as e:
+                logger.error(f"Deferred {getattr(func, '__name__', func)} failed: {e}", exc_info=True)
+
+    METRICS.incr('deferred_tasks_total', task=getattr(func, '__name__', 'task'))
+    executor.submit(contextvars.copy_context().run, run)
+
+
+def stop_deferred() -> None:
+    """Finish deferred work (each piece bounded by its own timeout) and stop its threads"""
+    global DEFERRED
+    with _DEFERRED_LOCK:
+        executor, DEFERRED = DEFERRED, None
+    if executor is not None:
+        executor.shutdown(wait=True)
+
+
+def _cheapest_sms(text: str) -> str:
+    """Use the GSM-7 variant of a message when it needs fewer segments."""
+    gsm_text = to_gsm7(text)
+    if segment_info(gsm_text).segments < segment_info(text).segments:
+        return gsm_text
+    return text
+
+
+def _record_sms_metrics(body: str, kind: Optional[str]) -> None:
+    info = segment_info(body)
+    METRICS.incr('sms_messages_total', kind=kind, encoding=info.encoding)
+    METRICS.incr('sms_segments_total', info.segments, kind=kind)
+    METRICS.observe('sms_segments_per_message', info.segments, kind=kind)
+
+
+def _queue_sms(phone: str, body: str, kind: Optional[str] = None) -> Tuple[bool, Optional[str]]:
+    """Hand an SMS to the outbox workers, or send it inline when they aren't running."""
+    _record_sms_metrics(body, kind)
+    notifier = NOTIFIER
+    if notifier is not None and notifier.running:
+        try:
+            notifier.enqueue(_au_to_e164(phone), body, kind)
+            return True, None
+        except sqlite3.Error as exc:
+            logger.error(f"SMS outbox enqueue failed, sending inline: {exc}")
+    deadline = current_deadline()
+    if deadline is not None and deadline.remaining() < SMS_SEND_TIMEOUT and _get_twilio_transport() is not None:
+        # Twilio might not answer before the caller's deadline: send it after the reply instead
+        defer(_send_sms, phone, body)
+        return True, None
+    return _send_sms(phone, body)
+
+
+def _format_item_for_sms(item: Dict, compact: bool = False) -> str:
+    if compact:
+        return _render_cache().get('sms_compact', item, _render_item_for_sms_compact)
+    return _render_cache().get('sms', item, _render_item_for_sms)
+
+
+def _render_item_for_sms_compact(item: Dict) -> str:
+    return _render_item_for_sms(item, compact=True)
+
+
+def _render_item_for_sms(item: Dict, compact: bool = False) -> str:
     qty = item.get('quantity', 1)
     prefix = f"{qty}x " if qty and qty > 1 else ""
     size = _title_case_phrase(item.get('size'))
@@ -797,6 +1878,18 @@ def _format_item_for_sms(item: Dict) -> str:
     sauces = item.get('sauces') or []
     extras = [e for e in (item.get('extras') or []) if e]
 
+    if compact:
+        # One line per item: "2x Large Lamb Kebab (Lettuce, Tomato; Garlic; +Cheese)"
+        details = []
+        if salads:
+            details.append(_human_join(_title_case_phrase(s) for s in salads))
+        if sauces:
+            details.append(_human_join(_title_case_phrase(s) for s in sauces))
+        if extras:
+            details.append(_human_join(f"+{_title_case_phrase(e)}" for e in extras))
+        line = f"{prefix}{base}".strip()
+        return f"{line} ({'; '.join(details)})" if details else line
+
     lines = [f"{prefix}{base}".strip()]
     if salads:
         lines.append(f"  • Salads: {_human_join(_title_case_phrase(s) for s in salads)}")
@@ -808,6 +1901,26 @@ def _format_item_for_sms(item: Dict) -> str:
     return "\n".join(lines)
 
 
+def _build_cart_sms(
+    header: str,
+    cart: List[Dict],
+    footer: str,
+    budget: Optional[int] = None,
+    allow_truncate: bool = False,
+) -> SmsPlan:
+    """Render a cart message in the cheapest encoding/layout within ``budget`` segments."""
+    def render(item_lines: List[str], separator: str) -> str:
+        return f"{header}\n\n{separator.join(item_lines)}\n\n{footer}"
+
+    return fit_message(
+        render,
+        [_format_item_for_sms(item) for item in cart],
+        [_format_item_for_sms(item, compact=True) for item in cart],
+        budget=budget,
+        allow_truncate=allow_truncate,
+    )
+
+
 def _send_order_notifications(
     order_display_number: str,
     customer_name: str,
@@ -817,36 +1930,40 @@ def _send_order_notifications(
     ready_phrase: str,
     send_customer_sms: bool = True,
 ):
-    client, from_number = _get_twilio_client()
-    if not client or not from_number:  # pragma: no cover - optional runtime dependency
-        logger.warning("SMS notifications skipped - Twilio not configured")
-        return
-
-    cart_summary = "\n\n".join(_format_item_for_sms(item) for item in cart)
+    if not _notifications_running():
+        client, from_number = _get_twilio_client()
+        if not client or not from_number:  # pragma: no cover - optional runtime dependency
+            logger.warning("SMS notifications skipped - Twilio not configured")
+            return
 
     if send_customer_sms:
-        customer_message = (
-            f"🥙 {SHOP_NAME.upper()} ORDER {order_display_number}\n\n"
-            f"{cart_summary}\n\n"
+        customer_plan = _build_cart_sms(
+            f"🥙 {shop_setting('name', SHOP_NAME).upper()} ORDER {order_display_number}",
+            cart,
             f"TOTAL: ${total:.2f}\n"
             f"Ready {ready_phrase}\n\n"
-            f"Thank you, {customer_name}!"
+            f"Thank you, {customer_name}!",
+            budget=SMS_SEGMENT_BUDGET_CUSTOMER,
+            allow_truncate=True,
         )
-        success, error = _send_sms(customer_phone, customer_message)
+        success, error = _queue_sms(customer_phone, customer_plan.text, 'order_customer')
         if not success:
             logger.error(f"Customer SMS failed: {error}")
 
-    shop_number = SHOP_NUMBER_DEFAULT
-    shop_message = (
+    # The kitchen needs every item, so the shop copy is compacted but never truncated
+    shop_number = shop_setting('order_to', SHOP_NUMBER_DEFAULT)
+    shop_plan = _build_cart_sms(
         f"🔔 NEW ORDER {order_display_number}\n\n"
         f"Customer: {customer_name}\n"
         f"Phone: {customer_phone}\n"
         f"Pickup: {ready_phrase}\n\n"
-        f"ORDER DETAILS:\n{cart_summary}\n\n"
+        f"ORDER DETAILS:",
+        cart,
         f"TOTAL: ${total:.2f}\n"
-        f"Location: {SHOP_ADDRESS}"
+        f"Location: {shop_setting('address', SHOP_ADDRESS)}",
+        budget=SMS_SEGMENT_BUDGET_SHOP,
     )
-    success, error = _send_sms(shop_number, shop_message)
+    success, error = _queue_sms(shop_number, shop_plan.text, 'order_shop')
     if not success:
         logger.error(f"Shop SMS failed: {error}")
 
@@ -1069,137 +2186,16 @@ def parse_quantity(text: str) -> int:
 def calculate_price(item: Dict) -> float:
     """
     Calculate price for a single item by looking up prices in menu.json.
-    No hardcoded prices - all prices come from MENU data structure.
+    No hardcoded prices - all prices come from MENU data structure
+    (through its precomputed index, see kebabalab/menu_index.py).
     """
-    price = 0.0
-
-    # If it's a combo/meal, use existing combo price
-    if item.get('is_combo'):
-        return item.get('price', 0.0)
-
-    category = item.get('category', '')
-    size = item.get('size', 'small')
-    protein = item.get('protein', '')
-    item_name = item.get('name', '').lower()
-
-    # Get categories from loaded menu
-    categories = MENU.get('categories', {})
-    category_items = categories.get(category, [])
-
-    # Find base price from menu
-    if category_items:
-        # For items with protein (kebabs, hsp), match by protein
-        if protein:
-            for menu_item in category_items:
-                menu_name_lower = menu_item.get('name', '').lower()
-
-                # Smart protein matching - handle "mixed" vs "mix" equivalence
-                protein_matches = False
-                protein_lower = protein.lower()
-
-                if protein_lower in menu_name_lower:
-                    protein_matches = True
-                elif protein_lower == 'mixed' and 'mix' in menu_name_lower:
-                    protein_matches = True
-                elif protein_lower == 'mix' and 'mixed' in menu_name_lower:
-                    protein_matches = True
-
-                if protein_matches:
-                    # Check if item has size-based pricing
-                    sizes = menu_item.get('sizes', {})
-                    if sizes and size:
-                        price = sizes.get(size, sizes.get('small', 0.0))
-                    else:
-                        price = menu_item.get('price', 0.0)
-                    break
-        else:
-            # For items without protein (drinks, chips, etc), match first or by name
-            if category == 'drinks':
-                # Match drink by name (prioritize exact matches)
-                drink_name_lower = item_name
-                best_match = None
-                best_score = 0
-
-                for menu_item in category_items:
-                    menu_name_lower = menu_item.get('name', '').lower()
-                    menu_id = menu_item.get('id', '').lower()
-
-                    # Check if drink name matches
-                    if drink_name_lower in menu_name_lower or menu_name_lower in drink_name_lower:
-                        score = len(menu_name_lower)  # Prefer shorter (more specific) names
-                        if score > best_score or best_match is None:
-                            best_match = menu_item
-                            best_score = score
-
-                    # Also check brands for soft drinks
-                    brands = menu_item.get('brands', [])
-                    for brand in brands:
-                        if drink_name_lower in brand.lower() or brand.lower() in drink_name_lower:
-                            best_match = menu_item
-                            break
-
-                if best_match:
-                    price = best_match.get('price', 0.0)
-                else:
-                    # Default to first drink item (soft drink can)
-                    if category_items:
-                        price = category_items[0].get('price', 0.0)
-            elif category == 'chips':
-                # Chips have separate menu entries for each size
-                for menu_item in category_items:
-                    if 'chip' in menu_item.get('name', '').lower():
-                        # Match by size field in menu item
-                        item_size = menu_item.get('size', '')
-                        if item_size == size:
-                            price = menu_item.get('price', 0.0)
-                            break
-            elif category == 'sweets':
-                # Match by name for sweets
-                for menu_item in category_items:
-                    menu_name_lower = menu_item.get('name', '').lower()
-                    if any(word in item_name for word in menu_name_lower.split()):
-                        price = menu_item.get('price', 0.0)
-                        break
-            else:
-                # Generic: try first item or match by name
-                for menu_item in category_items:
-                    sizes = menu_item.get('sizes', {})
-                    if sizes:
-                        price = sizes.get(size, sizes.get('small', 0.0))
-                    else:
-                        price = menu_item.get('price', 0.0)
-                    break
-
-    # Add extras pricing from menu modifiers
-    modifiers = MENU.get('modifiers', {})
-    extras_pricing = modifiers.get('extras', [])
-
-    extras = item.get('extras', [])
-    for extra in extras:
-        extra_lower = extra.lower()
-
-        # Look up extra price in modifiers
-        for modifier in extras_pricing:
-            modifier_name = modifier.get('name', '').lower()
-
-            if extra_lower == modifier_name or extra_lower in modifier_name:
-                # Check if this modifier applies to this category
-                applies_to = modifier.get('applies_to', [])
-                if not applies_to or category in applies_to:
-                    extra_price = modifier.get('price', 0.0)
-
-                    # Special case: cheese is included in HSPs
-                    if extra_lower == 'cheese' and category == 'hsp':
-                        # Don't charge for cheese on HSP (already included)
-                        continue
-
-                    price += extra_price
-                break
-
-    return price
+    return get_menu_index().price(item)
 
 def format_cart_item(item: Dict, index: int) -> str:
     """Format a cart item for natural order review."""
+    return f"{index}. {_render_cache().get('speech', item, _render_cart_item)}"
+
+def _render_cart_item(item: Dict) -> str:
     qty = max(1, int(item.get('quantity', 1) or 1))
     qty_prefix = f"{qty}x " if qty > 1 else ""
 
@@ -1255,45 +2251,117 @@ def format_cart_item(item: Dict, index: int) -> str:
 
     price = calculate_price(item) * qty
     # Use comma separation for speech-friendly output (not " | " which gets read as "vertical bar")
-    line = f"{index}. {qty_prefix}{', '.join(segments)} - ${price:.2f}"
-    return line.strip()
+    return f"{qty_prefix}{', '.join(segments)} - ${price:.2f}".rstrip()
 
 # ==================== TOOL IMPLEMENTATIONS ====================
 
 # Tool 1: checkOpen
 def tool_check_open(params: Dict[str, Any]) -> Dict[str, Any]:
-    """Check if shop is currently open (timezone-aware)"""
+    """Check if shop is currently open (timezone-aware, from hours.json)"""
     try:
         now = get_current_time()
-        day_of_week = now.weekday()  # 0 = Monday, 6 = Sunday
         current_time = now.strftime("%H:%M")
 
-        # Shop hours (example)
-        # Monday-Thursday: 11:00-22:00
-        # Friday-Saturday: 11:00-23:00
-        # Sunday: 11:00-21:00
-
-        if day_of_week in [0, 1, 2, 3]:  # Mon-Thu
-            open_time, close_time = "11:00", "22:00"
-        elif day_of_week in [4, 5]:  # Fri-Sat
-            open_time, close_time = "11:00", "23:00"
-        else:  # Sunday
-            open_time, close_time = "11:00", "21:00"
+        schedule = get_schedule()
+        if schedule is None:
+            return {"ok": False, "error": "Trading hours are not configured"}
 
-        is_open = open_time <= current_time < close_time
+        status = schedule.status(now)
+        windows = schedule.hours_for(now)
+        open_time, close_time = windows[0][0] if windows else None, windows[-1][1] if windows else None
+        hours_text = ", ".join(f"{start}-{end}" for start, end in windows) or "closed"
 
-        return {
+        result = {
             "ok": True,
-            "isOpen": is_open,
+            "isOpen": status.is_open,
             "currentTime": current_time,
             "openTime": open_time,
             "closeTime": close_time,
-            "message": f"We're {'open' if is_open else 'closed'}. Hours today: {open_time}-{close_time}"
+            "message": f"We're {'open' if status.is_open else 'closed'}. Hours today: {hours_text}"
         }
+        if status.next_close is not None:
+            result["closesAt"] = _format_time_for_display(status.next_close)
+        if status.next_open is not None:
+            result["opensAt"] = _format_time_for_display(status.next_open)
+        return result
     except Exception as e:
         logger.error(f"Error checking open status: {e}")
         return {"ok": False, "error": str(e)}
 
+def _history_since() -> Optional[str]:
+    """Oldest archive month caller history reads (None: all of them)"""
+    if CALLER_HISTORY_MONTHS <= 0:
+        return None
+    return months_back(CALLER_HISTORY_MONTHS, datetime.now(_shop_timezone()))
+
+
+def _fetch_caller_orders(phone: str, limit: int = CALLER_HISTORY_ORDERS,
+                        db_path: Optional[str] = None) -> List[List[Any]]:
+    """A phone number's latest orders as [order_number, cart_json, total, created_at], recent archives included"""
+    key = customer_key(phone)
+    if key is None:
+        return []  # withheld or unusable number: no history to find
+
+    with DatabaseConnection(db_path) as cursor:
+        cursor.execute('''
+            SELECT order_number, cart_json, total, created_at
+            FROM orders
+            WHERE customer_key = ?
+            ORDER BY created_at DESC
+            LIMIT ?
+        ''', (key, limit))
+
+        orders = cursor.fetchall()
+
+        # Older history lives in the monthly archives
+        if len(orders) < limit:
+            orders.extend(iter_archived_rows(
+                cursor.connection,
+                shop_setting('archive_dir', ARCHIVE_DIR),
+                '''
+                SELECT order_number, cart_json, total, created_at
+                FROM arc.orders
+                WHERE customer_key = ?
+                ORDER BY created_at DESC
+                LIMIT ?
+                ''',
+                (key, limit - len(orders)),
+                limit=limit - len(orders),
+                since=_history_since(),
+            ))
+
+    return [list(order) for order in orders]
+
+
+def _caller_history(phone: str) -> List[List[Any]]:
+    """
+    The caller's latest orders: from the session when the call-start
+    prefetch (or an earlier lookup) has loaded them, else from the database.
+    """
+    key = customer_key(phone)
+    history = session_get('caller_history')
+    if isinstance(history, dict) and history.get('key') == key:
+        METRICS.incr('caller_history_lookups_total', source='session')
+        return history['orders']
+
+    METRICS.incr('caller_history_lookups_total', source='database')
+    orders = _fetch_caller_orders(phone)
+    if key == customer_key(_caller_phone()):
+        # Only the caller's own history is kept; a lookup for another number mustn't replace it
+        session_set('caller_history', {'key': key, 'callId': _call_id(), 'orders': orders})
+    return orders
+
+
+def _prefetch_caller_history(session_id: str, phone: str, call_id: str, db_path: str) -> None:
+    """Load a caller's orders into their session (runs deferred, at the start of a call)"""
+    history = _session_read(session_id, 'caller_history')
+    if isinstance(history, dict) and history.get('callId') == call_id:
+        return  # another worker saw this call first
+    started = time.perf_counter()
+    orders = _fetch_caller_orders(phone, db_path=db_path)
+    _session_write(session_id, 'caller_history', {'key': customer_key(phone), 'callId': call_id, 'orders': orders})
+    METRICS.observe('caller_prefetch_seconds', time.perf_counter() - started)
+
 # Tool 2: getCallerSmartContext
 def tool_get_caller_smart_context(params: Dict[str, Any]) -> Dict[str, Any]:
     """Get caller info with order history and smart suggestions"""
@@ -1305,24 +2373,15 @@ def tool_get_caller_smart_context(params: Dict[str, Any]) -> Dict[str, Any]:
 
         phone = customer.get('number', 'unknown')
 
-        # Get order history from database
-        with DatabaseConnection() as cursor:
-            cursor.execute('''
-                SELECT order_number, cart_json, total, created_at
-                FROM orders
-                WHERE customer_phone = ?
-                ORDER BY created_at DESC
-                LIMIT 5
-            ''', (phone,))
-
-            orders = cursor.fetchall()
+        # Order history: prefetched into the session when the call started, or from the database
+        orders = _caller_history(phone)
 
         order_history = []
         favorite_items = {}
 
         for order in orders:
             order_num, cart_json, total, created_at = order
-            cart = json.loads(cart_json)
+            cart = loads_cart(cart_json)
 
             order_history.append({
                 "orderNumber": order_num,
@@ -2153,7 +3212,7 @@ def tool_set_pickup_time(params: Dict[str, Any]) -> Dict[str, Any]:
             return {"ok": False, "error": "requestedTime is required"}
 
         requested_time_clean = requested_time.lower().strip()
-        now = datetime.now()
+        now = get_current_time()
         pickup_time = None
         minutes_offset: Optional[int] = None
 
@@ -2196,6 +3255,18 @@ def tool_set_pickup_time(params: Dict[str, Any]) -> Dict[str, Any]:
         if diff_minutes < 10:
             return {"ok": False, "error": "Pickup time must be at least 10 minutes from now"}
 
+        requested_at = pickup_time
+        pickup_time = _offer_pickup_slot(pickup_time, now + timedelta(minutes=10))
+        if pickup_time is None:
+            return {"ok": False, "error": "We're fully booked around then. Please ask for a later pickup time."}
+        slot_adjusted = pickup_time != requested_at
+        if slot_adjusted:
+            minutes_offset = None
+
+        closed_reason = check_trading_hours(pickup_time)
+        if closed_reason:
+            return {"ok": False, "error": closed_reason}
+
         ready_at_iso = pickup_time.isoformat()
         ready_at_formatted = _format_time_for_display(pickup_time)
         ready_phrase = _format_pickup_phrase(pickup_time, minutes_offset) if minutes_offset is not None else f"at {ready_at_formatted}"
@@ -2207,12 +3278,21 @@ def tool_set_pickup_time(params: Dict[str, Any]) -> Dict[str, Any]:
         session_set('pickup_method', 'customer')
         session_set('pickup_requested_text', requested_time)
 
-        return {
+        result = {
             "ok": True,
             "readyAt": ready_at_formatted,
             "readyAtIso": ready_at_iso,
+            "slotAdjusted": slot_adjusted,
             "message": f"Pickup time set for {ready_phrase}",
         }
+        if slot_adjusted:
+            requested_formatted = _format_time_for_display(requested_at)
+            result["requestedAt"] = requested_formatted
+            result["message"] = (
+                f"{requested_formatted} is fully booked, so pickup is set for the nearest free slot "
+                f"{ready_phrase}. Check that suits the customer."
+            )
+        return result
 
     except Exception as e:
         logger.error(f"Error setting pickup time: {e}")
@@ -2222,16 +3302,26 @@ def tool_set_pickup_time(params: Dict[str, Any]) -> Dict[str, Any]:
 def tool_estimate_ready_time(params: Dict[str, Any]) -> Dict[str, Any]:
     """Estimate when order will be ready for pickup"""
     try:
-        # Simple estimation: 15-20 minutes based on cart size
         cart = session_get('cart', [])
 
-        base_time = 15  # minutes
-        per_item_time = 2  # minutes per item
-
-        total_minutes = base_time + (len(cart) * per_item_time)
-        total_minutes = min(total_minutes, 30)  # Cap at 30 minutes
+        # Pending-order prep work plus this cart, spread across kitchen stations
+        estimate = get_kitchen().estimate(cart)
+        total_minutes = estimate.minutes
 
-        ready_time = get_current_time() + timedelta(minutes=total_minutes)
+        now = get_current_time()
+        ready_time = now + timedelta(minutes=total_minutes)
+
+        # Never earlier than the kitchen can manage; push back past full slots
+        offered = _offer_pickup_slot(ready_time, ready_time)
+        if offered is None:
+            return {"ok": False, "error": "We're fully booked for the next while. Please ask for a later pickup time."}
+        if offered != ready_time:
+            ready_time = offered
+            total_minutes = int(math.ceil((ready_time - now).total_seconds() / 60))
+
+        closed_reason = check_trading_hours(ready_time)
+        if closed_reason:
+            return {"ok": False, "error": closed_reason}
         ready_at_iso = ready_time.isoformat()
         ready_at_formatted = _format_time_for_display(ready_time)
         ready_phrase = f"in about {total_minutes} minutes ({ready_at_formatted})"
@@ -2246,6 +3336,7 @@ def tool_estimate_ready_time(params: Dict[str, Any]) -> Dict[str, Any]:
         return {
             "ok": True,
             "estimatedMinutes": total_minutes,
+            "ordersAhead": estimate.orders_ahead,
             "readyAt": ready_at_formatted,
             "readyAtIso": ready_at_iso,
             "message": f"Your order will be ready {ready_phrase}"
@@ -2315,55 +3406,102 @@ def tool_create_order(params: Dict[str, Any]) -> Dict[str, Any]:
         else:
             send_sms_flag = bool(send_sms_raw)
 
-        today = get_current_time().strftime("%Y%m%d")
-
-        with DatabaseConnection() as cursor:
-            cursor.execute(
-                '''
-                SELECT COUNT(*) FROM orders WHERE order_number LIKE ?
-                ''',
-                (f"{today}-%",),
-            )
-
-            count = cursor.fetchone()[0]
-            order_number = f"{today}-{count + 1:03d}"
-            display_order = f"#{count + 1:03d}"
+        now = get_current_time()
+        today = now.strftime("%Y%m%d")
+
+        # Claim the pickup slot first; another call may have taken the last place
+        slots = get_slot_scheduler()
+        ready_at_epoch = _ready_at_epoch(ready_at_iso)
+        pickup_slot = None
+        if ready_at_epoch is not None and slots.enabled:
+            pickup_slot = slots.slot_of(datetime.fromtimestamp(ready_at_epoch, _shop_timezone()))
+            if not slots.reserve(pickup_slot):
+                session_set('pickup_confirmed', False)
+                alternative = _offer_pickup_slot(
+                    datetime.fromtimestamp(ready_at_epoch, _shop_timezone()),
+                    now + timedelta(minutes=10),
+                )
+                result = {
+                    "ok": False,
+                    "error": f"The {ready_at_formatted} pickup slot has just filled up.",
+                    "slotFull": True,
+                }
+                if alternative is not None:
+                    result["nearestAvailable"] = _format_time_for_display(alternative)
+                    result["error"] += (
+                        f" The nearest free slot is {result['nearestAvailable']}. "
+                        "Confirm with the customer and call setPickupTime again."
+                    )
+                return result
 
-            cursor.execute(
-                '''
-                INSERT INTO orders (
-                    order_number, customer_name, customer_phone,
-                    cart_json, subtotal, gst, total,
-                    ready_at, notes, status
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''',
-                (
-                    order_number,
-                    customer_name,
-                    customer_phone,
-                    json.dumps(cart),
-                    float(subtotal),
-                    gst,
-                    float(total),
-                    ready_at_iso,
-                    notes,
-                    'pending',
-                ),
-            )
+        try:
+            with DatabaseConnection() as cursor:
+                # Take the write lock before counting so concurrent orders can't share a number
+                cursor.execute('BEGIN IMMEDIATE')
+                cursor.execute(
+                    '''
+                    SELECT COUNT(*) FROM orders WHERE order_number LIKE ?
+                    ''',
+                    (f"{today}-%",),
+                )
+
+                count = cursor.fetchone()[0]
+                order_number = f"{today}-{count + 1:03d}"
+                display_order = f"#{count + 1:03d}"
+
+                cursor.execute(
+                    '''
+                    INSERT INTO orders (
+                        order_number, customer_name, customer_phone, customer_key,
+                        cart_json, subtotal, gst, total,
+                        ready_at, notes, status
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ''',
+                    (
+                        order_number,
+                        customer_name,
+                        customer_phone,
+                        customer_key(customer_phone),
+                        json.dumps(cart),  # plain item dicts: the compact form is for sessions only
+                        float(subtotal),
+                        gst,
+                        float(total),
+                        ready_at_iso,
+                        notes,
+                        'pending',
+                    ),
+                )
+                insert_order_items(cursor, cursor.lastrowid, cart)
+        except Exception:
+            if pickup_slot is not None:
+                slots.release(pickup_slot)
+            raise
 
         logger.info(f"Order {order_number} created for {customer_name}")
-
         display_ready = ready_phrase or ready_at_formatted or 'soon'
-        cart_snapshot = json.loads(json.dumps(cart))
+        cart_snapshot = copy_cart(cart)
 
-        session_set('last_order_cart', cart_snapshot)
-        session_set('last_order_total', float(total))
-        session_set('last_order_display', display_order)
-        session_set('last_ready_phrase', display_ready)
-        session_set('last_customer_name', customer_name)
-        session_set('last_customer_phone', customer_phone)
+        # The order is committed: running out of time now must not report it as
+        # failed, or the retry would create it twice
+        with deadline_scope(None):
+            try:
+                get_kitchen().add_order(order_number, cart, _ready_at_epoch(ready_at_iso))
+            except Exception as kitchen_error:  # pragma: no cover - safety net
+                logger.error(f"Order {order_number} not added to the kitchen queue: {kitchen_error}")
+
+            session_set('last_order_cart', cart_snapshot)
+            session_set('last_order_total', float(total))
+            session_set('last_order_display', display_order)
+            session_set('last_ready_phrase', display_ready)
+            session_set('last_customer_name', customer_name)
+            session_set('last_customer_phone', customer_phone)
+            session_set('caller_history', None)  # this order is now the latest
+            session_set('cart', [])
+            session_set('cart_priced', False)
+            session_set('pickup_confirmed', False)
 
         try:
+            # Still under the deadline, so a slow SMS is sent after the reply
             _send_order_notifications(
                 display_order,
                 customer_name,
@@ -2376,10 +3514,6 @@ def tool_create_order(params: Dict[str, Any]) -> Dict[str, Any]:
         except Exception as notification_error:  # pragma: no cover - safety net
             logger.error(f"Failed to send SMS notifications: {notification_error}")
 
-        session_set('cart', [])
-        session_set('cart_priced', False)
-        session_set('pickup_confirmed', False)
-
         return {
             "ok": True,
             "orderNumber": order_number,
@@ -2402,17 +3536,19 @@ def tool_send_menu_link(params: Dict[str, Any]) -> Dict[str, Any]:
         if not phone_number:
             return {"ok": False, "error": "phoneNumber is required"}
 
+        menu_url = shop_setting('menu_url', MENU_LINK_URL)
         message = (
-            "🥙 KEBABALAB MENU\n\n"
-            f"Check out our full menu: {MENU_LINK_URL}\n\n"
-            f"Call or text us on {SHOP_NUMBER_DEFAULT} if you need a hand!"
+            f"🥙 {shop_setting('name', SHOP_NAME).upper()} MENU\n\n"
+            f"Check out our full menu: {menu_url}\n\n"
+            f"Call or text us on {shop_setting('order_to', SHOP_NUMBER_DEFAULT)} if you need a hand!"
         )
 
-        success, error = _send_sms(phone_number, message)
+        message = _cheapest_sms(message)
+        success, error = _queue_sms(phone_number, message, 'menu_link')
         if not success:
             return {"ok": False, "error": error or "SMS not configured"}
 
-        return {"ok": True, "message": "Menu link sent!", "menuUrl": MENU_LINK_URL}
+        return {"ok": True, "message": "Menu link sent!", "menuUrl": menu_url}
 
     except Exception as e:
         logger.error(f"Error sending menu link: {e}")
@@ -2439,17 +3575,17 @@ def tool_send_receipt(params: Dict[str, Any]) -> Dict[str, Any]:
         )
         customer_name = session_get('last_customer_name', '').strip() or 'Customer'
 
-        cart_summary = "\n\n".join(_format_item_for_sms(item) for item in cart_snapshot)
-
-        message = (
-            f"🥙 {SHOP_NAME.upper()} RECEIPT {display_order}\n\n"
-            f"{cart_summary}\n\n"
+        message = _build_cart_sms(
+            f"🥙 {shop_setting('name', SHOP_NAME).upper()} RECEIPT {display_order}",
+            cart_snapshot,
             f"TOTAL: ${float(total):.2f}\n"
             f"Ready {ready_phrase}\n\n"
-            f"Thanks, {customer_name}!"
-        )
+            f"Thanks, {customer_name}!",
+            budget=SMS_SEGMENT_BUDGET_CUSTOMER,
+            allow_truncate=True,
+        ).text
 
-        success, error = _send_sms(phone_number, message)
+        success, error = _queue_sms(phone_number, message, 'receipt')
         if not success:
             return {"ok": False, "error": error or "SMS not configured"}
 
@@ -2469,23 +3605,13 @@ def tool_repeat_last_order(params: Dict[str, Any]) -> Dict[str, Any]:
         if not phone_number:
             return {"ok": False, "error": "phoneNumber is required"}
 
-        # Get last order from database
-        with DatabaseConnection() as cursor:
-            cursor.execute('''
-                SELECT cart_json, total
-                FROM orders
-                WHERE customer_phone = ?
-                ORDER BY created_at DESC
-                LIMIT 1
-            ''', (phone_number,))
-
-            result = cursor.fetchone()
-
-        if not result:
+        # Same history getCallerSmartContext uses (usually prefetched at call start)
+        orders = _caller_history(phone_number)
+        if not orders:
             return {"ok": False, "error": "No previous orders found"}
 
-        cart_json, last_total = result
-        last_cart = json.loads(cart_json)
+        _, cart_json, last_total, _ = orders[0]
+        last_cart = loads_cart(cart_json)
 
         # Set as current cart
         session_set('cart', last_cart)
@@ -2521,6 +3647,98 @@ def tool_end_call(params: Dict[str, Any]) -> Dict[str, Any]:
         logger.error(f"Error ending call: {e}")
         return {"ok": False, "error": "Failed to end call"}
 
+# Tool 16: applyCartOperations
+# Cart tools that can run inside applyCartOperations, by their tool name
+CART_OPERATIONS = {
+    "quickAddItem": tool_quick_add_item,
+    "addMultipleItemsToCart": tool_add_multiple_items_to_cart,
+    "editCartItem": tool_edit_cart_item,
+    "removeCartItem": tool_remove_cart_item,
+    "clearCart": tool_clear_cart,
+    "convertItemsToMeals": tool_convert_items_to_meals,
+}
+# Session keys the cart tools and priceCart read or write
+CART_BATCH_KEYS = ('cart', 'cart_priced', 'last_subtotal', 'last_gst', 'last_total', 'last_totals')
+MAX_CART_OPERATIONS = 20
+
+def tool_apply_cart_operations(params: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Apply several cart changes in order, all or nothing, and return the priced cart.
+
+    Each operation is {"op": <cart tool name>, ...that tool's params}. Item
+    indexes refer to the cart as left by the previous operation. If any
+    operation fails, none of them are saved.
+    """
+    try:
+        operations = params.get('operations')
+
+        if not isinstance(operations, list) or not operations:
+            return {"ok": False, "error": "operations array is required"}
+        if len(operations) > MAX_CART_OPERATIONS:
+            return {"ok": False, "error": f"Too many operations (max {MAX_CART_OPERATIONS})"}
+
+        messages = []
+        with session_batch(CART_BATCH_KEYS) as batch:
+            for index, operation in enumerate(operations):
+                name = operation.get('op') if isinstance(operation, dict) else None
+                tool_func = CART_OPERATIONS.get(name)
+                if tool_func is None:
+                    batch.discard()
+                    return {
+                        "ok": False,
+                        "error": f"Operation {index}: unknown op '{name}'. Use one of: {', '.join(CART_OPERATIONS)}",
+                        "failedOperation": index,
+                        "cartUnchanged": True
+                    }
+
+                result = tool_func({k: v for k, v in operation.items() if k != 'op'})
+                if not result.get('ok'):
+                    batch.discard()
+                    return {
+                        "ok": False,
+                        "error": f"Operation {index} ({name}) failed: {result.get('error', 'unknown error')}",
+                        "failedOperation": index,
+                        "cartUnchanged": True
+                    }
+                messages.append(result.get('message', name))
+
+            totals = tool_price_cart({})
+            if not totals.get('ok'):
+                batch.discard()
+                return {"ok": False, "error": totals.get('error'), "cartUnchanged": True}
+            cart = session_get('cart', [])
+
+        return {
+            "ok": True,
+            "applied": len(operations),
+            "messages": messages,
+            "cart": cart,
+            "formattedItems": [format_cart_item(item, idx) for idx, item in enumerate(cart)],
+            "itemCount": len(cart),
+            "subtotal": totals['subtotal'],
+            "gst": totals['gst'],
+            "total": totals['total'],
+            "message": f"Applied {len(operations)} changes. {totals['message']}"
+        }
+
+    except Exception as e:
+        logger.error(f"Error applying cart operations: {e}")
+        return {"ok": False, "error": str(e)}
+
+def shape_tool_result(tool_name: str, result: Any, verbosity: Any = None, fields: Any = None) -> Any:
+    """Trim a tool result for the assistant: per-call verbosity/fields, else the configured default"""
+    if isinstance(verbosity, str):
+        verbosity = verbosity.strip().lower()
+    if verbosity not in VERBOSITIES:
+        verbosity = RESPONSE_VERBOSITY_OVERRIDES.get(tool_name, RESPONSE_VERBOSITY)
+    return shape_response(
+        tool_name,
+        result,
+        verbosity,
+        parse_fields(fields),
+        render_line=lambda item: _render_cache().get('speech', item, _render_cart_item),
+    )
+
 # ==================== TOOL REGISTRY ====================
 
 TOOLS = {
@@ -2542,10 +3760,177 @@ TOOLS = {
     "sendReceipt": tool_send_receipt,
     "repeatLastOrder": tool_repeat_last_order,
     "endCall": tool_end_call,
+    "applyCartOperations": tool_apply_cart_operations,
 }
 
 # ==================== WEBHOOK ====================
 
+RATE_LIMITED_MESSAGE = "Sorry, I can't do that again just yet. Let's carry on and try it again in a little while."
+SHED_MESSAGE = "One moment please, we're just a little busy. Let's try that again in a second."
+TIMED_OUT_MESSAGE = "Sorry, that's taking longer than it should. Give me a moment and let's try that again."
+
+
+def get_rate_limiter() -> RateLimiter:
+    """Return the webhook rate limiter, shared through Redis when it is available"""
+    global RATE_LIMITER
+    if RATE_LIMITER is None:
+        client = get_redis_client()
+        store = RedisBucketStore(client) if client else MemoryBucketStore()
+        RATE_LIMITER = RateLimiter(store, RATE_LIMIT_SESSION, RATE_LIMIT_TOOLS)
+    return RATE_LIMITER
+
+
+def _rate_limited(tool_name: str) -> Optional[Dict[str, Any]]:
+    """A speakable refusal if this session (or this tool for it) is over its limit, else None"""
+    if not RATE_LIMITS_ENABLED:
+        return None
+    try:
+        decision = get_rate_limiter().check(get_session_id(), tool_name)
+    except Exception as e:
+        logger.error(f"Rate limit check failed, allowing call: {e}")
+        return None
+    if decision.allowed:
+        return None
+    METRICS.incr('webhook_rate_limited_total', tool=tool_name, scope=decision.scope)
+    logger.warning(f"Rate limited {tool_name} for {get_session_id()} ({decision.scope}, retry in {decision.retry_after}s)")
+    return {
+        "ok": False,
+        "error": RATE_LIMITED_MESSAGE,
+        "rateLimited": True,
+        "retryAfterSeconds": max(1, math.ceil(decision.retry_after)),
+    }
+
+
+RECORDER: Optional[CallRecorder] = None
+
+
+def start_recorder() -> Optional[CallRecorder]:
+    """Start recording webhook traffic if CALL_RECORD_DIR is set"""
+    global RECORDER
+    if not CALL_RECORD_DIR:
+        return None
+    if RECORDER is None or not RECORDER.running:
+        RECORDER = CallRecorder(CALL_RECORD_DIR, CALL_RECORD_FLUSH_SECONDS).start()
+        logger.info(f"Recording calls to {CALL_RECORD_DIR}")
+    return RECORDER
+
+
+def stop_recorder(timeout: float = 5.0) -> None:
+    global RECORDER
+    if RECORDER is not None:
+        RECORDER.stop(timeout)
+        RECORDER = None
+
+
+def _recorded_message(message: Dict[str, Any]) -> Dict[str, Any]:
+    """What a replay needs from a VAPI message: the call, caller and routing (no assistant config or transcript)"""
+    call = message.get('call') or {}
+    recorded_call = {"id": call.get('id'), "customer": {"number": (call.get('customer') or {}).get('number')}}
+    for key in ('phoneNumberId', 'assistantId'):
+        if call.get(key):
+            recorded_call[key] = call[key]
+    recorded = {"call": recorded_call}
+    phone_number = message.get('phoneNumber')
+    if isinstance(phone_number, dict):
+        recorded["phoneNumber"] = {key: phone_number[key] for key in ('number', 'id') if phone_number.get(key)}
+    assistant = message.get('assistant')
+    if isinstance(assistant, dict) and assistant.get('id'):
+        recorded["assistant"] = {"id": assistant['id']}
+    return recorded
+
+
+def _run_recorded_tool(tool_name: str, tool_func, arguments: Dict[str, Any],
+                       webhook_deadline: Optional[Deadline]) -> Tuple[Dict[str, Any], Dict[str, Any], float]:
+    """_run_tool, also returning the session keys the call set and its duration in ms"""
+    token = _SESSION_DELTA.set({})
+    started = time.perf_counter()
+    try:
+        result = _run_tool(tool_name, tool_func, arguments, webhook_deadline)
+        return result, _SESSION_DELTA.get(), round((time.perf_counter() - started) * 1000, 2)
+    finally:
+        _SESSION_DELTA.reset(token)
+
+
+def _record_webhook(recorder: CallRecorder, message: Dict[str, Any], calls: List[Dict[str, Any]],
+                    started_at: float, elapsed: float) -> None:
+    tenant = _TENANT.get()
+    try:
+        recorded = recorder.record({
+            "t": round(started_at, 3),
+            "callId": (message.get('call') or {}).get('id'),
+            "session": get_session_id(),
+            "tenant": tenant.id if tenant is not None else None,
+            "message": _recorded_message(message),
+            "calls": calls,
+            "ms": round(elapsed * 1000, 2),
+        })
+    except Exception as e:
+        logger.error(f"Could not record webhook: {e}")
+        recorded = False
+    METRICS.incr('calls_recorded_total' if recorded else 'calls_record_dropped_total')
+
+
+_PREFETCHED_CALLS: "OrderedDict[str, None]" = OrderedDict()
+_PREFETCH_LOCK = threading.Lock()
+
+
+def _prefetch_on_new_call(message: Dict[str, Any]) -> None:
+    """The first time this worker hears of a call, load the caller's history in the background"""
+    if not CALLER_PREFETCH:
+        return
+    call = message.get('call') or {}
+    call_id = call.get('id')
+    phone = (call.get('customer') or {}).get('number')
+    if not call_id or not phone:
+        return
+    with _PREFETCH_LOCK:
+        if call_id in _PREFETCHED_CALLS:
+            return
+        _PREFETCHED_CALLS[call_id] = None
+        if len(_PREFETCHED_CALLS) > MAX_SESSIONS:
+            _PREFETCHED_CALLS.popitem(last=False)
+    defer(_prefetch_caller_history, get_session_id(), phone, call_id, _db_file())
+
+
+def _tool_deadline(tool_name: str, webhook_deadline: Optional[Deadline] = None) -> Deadline:
+    """The tool's budget from now, cut short by the webhook's deadline"""
+    budget = Deadline(TOOL_BUDGETS.get(tool_name, TOOL_BUDGET_SECONDS))
+    return budget if webhook_deadline is None else webhook_deadline.within(budget.budget)
+
+
+def _run_tool(tool_name: str, tool_func, arguments: Dict[str, Any],
+              webhook_deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+    """Run one tool call under rate limits, admission control and its deadline"""
+    limited = _rate_limited(tool_name)
+    if limited is not None:
+        return limited
+    admission = ADMISSION
+    with admission.admit() as admitted:
+        if not admitted:
+            METRICS.incr('webhook_shed_total', tool=tool_name)
+            logger.warning(f"Shed {tool_name}: {admission.max_concurrent} tool calls already running")
+            return {"ok": False, "error": SHED_MESSAGE, "busy": True, "retryAfterSeconds": 1}
+        METRICS.gauge('tool_calls_in_flight', admission.in_flight)
+        deadline = _tool_deadline(tool_name, webhook_deadline)
+        with deadline_scope(deadline):
+            try:
+                result = tool_func(arguments)
+            except Exception as tool_error:
+                logger.error(f"Error executing tool {tool_name}: {tool_error}", exc_info=True)
+                if _is_timeout(tool_error):
+                    note_timeout(tool_error)
+                result = {"ok": False, "error": str(tool_error)}
+            # Tools turn exceptions into error results, so ask whether anything gave up waiting
+            gave_up = timed_out()
+
+    if gave_up and deadline.expired and not result.get("ok", True):
+        # The caller has waited long enough: give them something to say instead of the lock error
+        METRICS.incr('tool_deadline_exceeded_total', tool=tool_name)
+        logger.warning(f"{tool_name} ran out of time ({deadline.budget:.1f}s): {result.get('error')}")
+        return {"ok": False, "error": TIMED_OUT_MESSAGE, "timedOut": True, "retryAfterSeconds": 1}
+    return result
+
+
 @app.get("/health")
 def health_check():
     """Health check endpoint - minimal information for security"""
@@ -2555,7 +3940,91 @@ def health_check():
         "version": "2.0"
     })
 
+def _admin_authorized() -> bool:
+    if not ADMIN_API_TOKEN:
+        return False
+    header = request.headers.get('Authorization', '')
+    supplied = header[7:] if header.startswith('Bearer ') else request.headers.get('X-Admin-Token', '')
+    return hmac.compare_digest(supplied.encode(), ADMIN_API_TOKEN.encode())
+
+@app.post("/orders/<order_number>/status")
+@_tenant_scoped
+def update_order_status(order_number: str):
+    """Mark an order ready/completed/cancelled (requires ADMIN_API_TOKEN)"""
+    if not _admin_authorized():
+        return jsonify({"ok": False, "error": "Unauthorized"}), 403
+    data = request.get_json(silent=True) or {}
+    try:
+        updated = set_order_status(order_number, str(data.get('status', '')).lower())
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
+    if not updated:
+        return jsonify({"ok": False, "error": "Order not found"}), 404
+    return jsonify({"ok": True, "orderNumber": order_number, "status": data.get('status')})
+
+@app.get("/metrics")
+def metrics():
+    """Counters and summaries collected in this process"""
+    return jsonify(METRICS.snapshot())
+
+def _report_range():
+    """?from=YYYY-MM-DD&to=YYYY-MM-DD (local dates, both optional); raises ValueError"""
+    return parse_date(request.args.get('from')), parse_date(request.args.get('to'))
+
+@app.get("/reports/sales")
+@_tenant_scoped
+def sales_report_endpoint():
+    """Takings, GST, orders per hour and top items (requires ADMIN_API_TOKEN)"""
+    if not _admin_authorized():
+        return jsonify({"ok": False, "error": "Unauthorized"}), 403
+    try:
+        start, end = _report_range()
+        top = int(request.args.get('top', '10'))
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
+    output = request.args.get('format', 'json').lower()
+    section = request.args.get('section', 'daily')
+    if output == 'csv' and section not in SECTION_COLUMNS:
+        return jsonify({"ok": False, "error": f"section must be one of {', '.join(SECTION_COLUMNS)}"}), 400
+
+    report = sales_report(_db_file(), _shop_timezone(), start, end, shop_setting('archive_dir', ARCHIVE_DIR))
+    if output == 'csv':
+        from flask import Response
+        return Response(
+            iter_csv(report.rows(section, top), SECTION_COLUMNS[section]),
+            mimetype='text/csv',
+            headers={'Content-Disposition': f'attachment; filename=sales-{section}.csv'},
+        )
+    return jsonify({
+        "ok": True,
+        "from": start.isoformat() if start else None,
+        "to": end.isoformat() if end else None,
+        **report.to_dict(top),
+    })
+
+@app.get("/reports/orders")
+@_tenant_scoped
+def orders_export_endpoint():
+    """Stream every order in the range as CSV or a JSON array (requires ADMIN_API_TOKEN)"""
+    if not _admin_authorized():
+        return jsonify({"ok": False, "error": "Unauthorized"}), 403
+    try:
+        start, end = _report_range()
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
+
+    from flask import Response
+    rows = iter_order_export(_db_file(), _shop_timezone(), start, end, shop_setting('archive_dir', ARCHIVE_DIR))
+    if request.args.get('format', 'csv').lower() == 'json':
+        return Response(iter_json_array(rows), mimetype='application/json')
+    return Response(
+        iter_csv(rows, EXPORT_COLUMNS),
+        mimetype='text/csv',
+        headers={'Content-Disposition': 'attachment; filename=orders.csv'},
+    )
+
 @app.post("/webhook")
+@_tenant_scoped
 def webhook():
     """Main webhook endpoint for VAPI"""
     try:
@@ -2564,6 +4033,9 @@ def webhook():
         message_type = message.get('type', 'unknown')
         tool_calls = message.get('toolCalls', []) or []
 
+        # Any message can be the first of a call (VAPI sends status updates before tool calls)
+        _prefetch_on_new_call(message)
+
         # Accept all webhook messages with 200 OK (reduces latency)
         # but only process tool-calls
         if not tool_calls:
@@ -2573,6 +4045,10 @@ def webhook():
             return jsonify({"status": "acknowledged", "message": "No tool calls to process"}), 200
 
         results = []
+        webhook_deadline = Deadline(WEBHOOK_DEADLINE_SECONDS)
+        recorder = RECORDER
+        recorded_calls: Optional[List[Dict[str, Any]]] = [] if recorder is not None else None
+        started_at, started = time.time(), time.perf_counter()
 
         for tool_call in tool_calls:
             function_data = tool_call.get('function', {})
@@ -2588,6 +4064,13 @@ def webhook():
                     arguments = {}
             else:
                 arguments = raw_arguments or {}
+            if not isinstance(arguments, dict):
+                arguments = {}
+            recorded_arguments = dict(arguments) if recorded_calls is not None else None
+
+            # Response shaping options are ours, not the tool's
+            verbosity = arguments.pop('verbosity', None)
+            fields = arguments.pop('fields', None)
 
             if not function_name:
                 logger.error("Tool call missing function name")
@@ -2609,11 +4092,22 @@ def webhook():
                 })
                 continue
 
-            try:
-                result = tool_func(arguments)
-            except Exception as tool_error:
-                logger.error(f"Error executing tool {function_name}: {tool_error}", exc_info=True)
-                result = {"ok": False, "error": str(tool_error)}
+            if recorded_calls is None:
+                result = _run_tool(function_name, tool_func, arguments, webhook_deadline)
+            else:
+                result, session_delta, elapsed_ms = _run_recorded_tool(
+                    function_name, tool_func, arguments, webhook_deadline,
+                )
+            result = shape_tool_result(function_name, result, verbosity, fields)
+            if recorded_calls is not None:
+                recorded_calls.append({
+                    "id": tool_call_id,
+                    "tool": function_name,
+                    "args": recorded_arguments,
+                    "result": result,
+                    "session": session_delta,
+                    "ms": elapsed_ms,
+                })
 
             logger.info(f"Tool result: {result}")
 
@@ -2622,6 +4116,8 @@ def webhook():
                 "result": result
             })
 
+        if recorded_calls:
+            _record_webhook(recorder, message, recorded_calls, started_at, time.perf_counter() - started)
         return jsonify({"results": results})
 
     except Exception as e:
@@ -2630,18 +4126,72 @@ def webhook():
 
 # ==================== STARTUP ====================
 
-# Load menu at import time so tools work correctly when module is imported by tests
-load_menu()
+# Nothing is loaded at import: the menu, hours and Redis connect on first use,
+# and create_app() does all of it up front for a server process.
+
+# Module settings create_app() accepts as overrides
+APP_CONFIG_KEYS = (
+    'DB_FILE', 'MENU_FILE', 'HOURS_FILE', 'ARCHIVE_DIR', 'BACKUP_DIR', 'LOG_DIR', 'LOG_LEVEL',
+    'SESSION_TTL', 'MAX_SESSIONS', 'ENFORCE_TRADING_HOURS', 'ADMIN_API_TOKEN',
+    'SLOT_CAPACITY', 'SLOT_MINUTES', 'SMS_TRANSPORT', 'SMS_WORKERS', 'RESPONSE_VERBOSITY',
+    'BACKUP_INTERVAL_MINUTES', 'TENANTS_FILE', 'TENANT_CACHE_SIZE', 'CALL_RECORD_DIR',
+)
+
 
+def create_app(config: Optional[Dict[str, Any]] = None, start_workers: bool = False):
+    """
+    Configure and return the Flask app.
+
+    ``config`` overrides module settings (see APP_CONFIG_KEYS). Logging,
+    the database schema, menu, trading hours, tenants and Redis are
+    initialised here rather than at import; ``start_workers`` also starts the SMS
+    outbox workers, scheduled backups and the call recorder (if enabled).
+    """
+    global SLOTS, _TENANTS_LOADED
+    config = dict(config or {})
+    unknown = sorted(set(config) - set(APP_CONFIG_KEYS))
+    if unknown:
+        raise ValueError(f"Unknown config keys: {', '.join(unknown)}")
+    globals().update(config)
+    app.config.update(config)
+
+    configure_logging()
+    init_database()
+    load_menu()
+    load_hours()
+    SLOTS = None
+    _TENANTS_LOADED = False
+    get_tenants()
+    get_redis_client()
+    if start_workers:
+        start_notifications()
+        start_backups()
+        start_recorder()
+    return app
+
+
+def configure_worker_pools(threads: int) -> None:
+    """
+    Size this process's SQLite and Redis pools for ``threads`` request
+    threads. Called in each worker right after fork, so no connection is
+    shared with the master or another worker.
+    """
+    global DB_POOL, REDIS_CLIENT, _REDIS_CHECKED, REDIS_MAX_CONNECTIONS, SLOTS, RATE_LIMITER, ADMISSION
+    DB_POOL = SqlitePool(DB_FILE, threads + SMS_WORKERS)
+    REDIS_MAX_CONNECTIONS = threads + 2
+    REDIS_CLIENT, _REDIS_CHECKED, SLOTS, RATE_LIMITER = None, False, None, None
+    # Keep some threads free to answer "one moment" while the rest run tools
+    ADMISSION = AdmissionControl(MAX_CONCURRENT_TOOLS or max(1, threads * 3 // 4), ADMISSION_WAIT_MS / 1000)
+    get_redis_client()
 
-def main() -> None:
+
+def run_dev_server() -> None:
+    configure_logging()
     logger.info("="*50)
     logger.info("Kebabalab VAPI Server - SIMPLIFIED")
     logger.info("="*50)
 
-    # Initialize
-    init_database()
-    load_menu()
+    create_app(start_workers=True)
 
     logger.info(f"Loaded {len(TOOLS)} tools:")
     for i, tool_name in enumerate(TOOLS.keys(), 1):
@@ -2653,5 +4203,331 @@ def main() -> None:
     app.run(host='0.0.0.0', port=port, debug=False)
 
 
+def _cmd_serve(args) -> int:
+    from .prefork import PreforkServer
+
+    # Load the menu, hours index and schema once; workers share them copy-on-write
+    create_app()
+    server = PreforkServer(
+        app,
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        threads=args.threads,
+        drain_timeout=args.drain_timeout,
+    )
+
+    def start_worker():
+        configure_worker_pools(server.threads)
+        start_notifications()
+        start_backups()
+        start_recorder()
+
+    def stop_worker():
+        stop_recorder()
+        stop_backups()
+        stop_deferred()
+        stop_notifications()
+
+    server.post_fork = start_worker
+    server.worker_exit = stop_worker
+    return server.run()
+
+
+def _cmd_backfill_customer_keys(args) -> int:
+    registry = None if args.db or args.archive_dir else get_tenants()
+    failed = 0
+    for tenant_id in [None] + (list(registry.specs) if registry else []):
+        try:
+            tenant = registry.get(tenant_id) if tenant_id is not None else None
+        except TenantUnavailable as e:
+            failed += 1
+            print(str(e), file=sys.stderr)
+            continue
+        with tenant_scope(tenant):
+            stats = backfill_customer_keys(batch_size=args.batch_size, db_path=args.db, archive_dir=args.archive_dir)
+        where = f"tenant '{tenant_id}'" if tenant_id is not None else "the default shop"
+        print(
+            f"Keyed {stats['orders']} orders in {stats['batches']} batches across {where}'s database and "
+            f"{stats['archives']} archives ({stats['unkeyed']} without a usable phone number)"
+        )
+    return 1 if failed else 0
+
+
+def _cmd_backfill_order_items(args) -> int:
+    init_database(args.db)
+    stats = backfill_order_items(batch_size=args.batch_size, db_path=args.db)
+    print(
+        f"Backfilled {stats['items']} items from {stats['orders']} orders "
+        f"in {stats['batches']} batches ({stats['skipped']} skipped)"
+    )
+    return 0
+
+
+def _cmd_archive_orders(args) -> int:
+    init_database(args.db)
+    stats = rollover_orders(
+        args.db or DB_FILE,
+        args.archive_dir or ARCHIVE_DIR,
+        older_than_days=args.older_than_days,
+        vacuum=args.vacuum,
+    )
+    print(f"Archived {stats['orders']} orders ({stats['items']} items) across {stats['months']} months")
+    return 0
+
+
+def _cmd_compile_menu(args) -> int:
+    if args.menu:
+        menu_files = args.menu
+    else:
+        registry = get_tenants()
+        menu_files = [MENU_FILE] + ([spec.menu_file for spec in registry.specs.values()] if registry else [])
+    failed = 0
+    for menu_file in menu_files:
+        target = artifact_path(menu_file)
+        try:
+            if args.check:
+                read_artifact(target, menu_file)
+                print(f"{target}: up to date")
+                continue
+            stats = compile_menu(menu_file)
+            print(f"{menu_file} -> {stats['path']} ({stats['sourceBytes']} -> {stats['artifactBytes']} bytes)")
+        except (ArtifactError, OSError, ValueError) as e:
+            failed += 1
+            print(f"{target}: {e}", file=sys.stderr)
+    return 1 if failed else 0
+
+
+def _cmd_backup(args) -> int:
+    try:
+        stats = run_backup(args.db, args.backup_dir, verify=not args.no_verify)
+    except BackupError as e:
+        print(f"Backup failed: {e}", file=sys.stderr)
+        return 1
+    print(
+        f"Backed up {stats['pages']} pages ({stats['bytes']} bytes) to {stats['path']} in {stats['seconds']:.2f}s "
+        f"({stats['pages_per_second']:.0f} pages/s, {stats['restarts']} restarts"
+        f"{', verified' if stats['verified'] else ''})"
+    )
+    return 0
+
+
+def _cmd_report(args) -> int:
+    start, end = args.start, args.end
+    db_path = args.db or DB_FILE
+    archive_dir = args.archive_dir or ARCHIVE_DIR
+    if args.kind == 'orders':
+        rows = iter_order_export(db_path, SHOP_TIMEZONE, start, end, archive_dir)
+        chunks = iter_json_array(rows) if args.format == 'json' else iter_csv(rows, EXPORT_COLUMNS)
+    else:
+        report = sales_report(db_path, SHOP_TIMEZONE, start, end, archive_dir)
+        if args.format == 'json':
+            chunks = [json.dumps(report.to_dict(args.top), indent=2), "\n"]
+        else:
+            chunks = iter_csv(report.rows(args.section, args.top), SECTION_COLUMNS[args.section])
+
+    out = open(args.output, 'w', newline='', encoding='utf-8') if args.output else sys.stdout
+    try:
+        for chunk in chunks:
+            out.write(chunk)
+    finally:
+        if args.output:
+            out.close()
+    return 0
+
+
+def _replay_sms(phone: str, body: str) -> Tuple[bool, Optional[str]]:
+    logger.debug(f"Replay: SMS to {phone} not sent")
+    return True, None
+
+
+def _replay_sandbox(db_path: Optional[str]) -> str:
+    """
+    Configure this process for an in-process replay: its own database
+    (a temporary one unless given, never DB_FILE), no Redis, no tenants,
+    no rate limits, and SMS that go to a local outbox instead of Twilio.
+    Recorded calls place real orders and texts, so none of it may reach
+    the live shop. Returns the database path.
+    """
+    global REDIS_CLIENT, _REDIS_CHECKED, RATE_LIMITS_ENABLED, RATE_LIMITER, _send_sms
+    sandbox = tempfile.mkdtemp(prefix="kebabalab-replay-")
+    if db_path is None:
+        db_path = os.path.join(sandbox, "orders.db")
+    elif os.path.abspath(db_path) == os.path.abspath(DB_FILE):
+        raise ValueError(f"{db_path} is the live database (DB_FILE); replay into a copy")
+    with _REDIS_LOCK:
+        REDIS_CLIENT, _REDIS_CHECKED = None, True
+    RATE_LIMITS_ENABLED, RATE_LIMITER = False, None
+    _send_sms = _replay_sms
+    create_app({
+        'DB_FILE': db_path,
+        'ARCHIVE_DIR': os.path.join(sandbox, "archive"),
+        'BACKUP_DIR': os.path.join(sandbox, "backups"),
+        'TENANTS_FILE': os.path.join(sandbox, "tenants.json"),  # doesn't exist: the default shop only
+        'SMS_TRANSPORT': 'local',
+        'CALL_RECORD_DIR': '',
+    })
+    stop_notifications()
+    start_notifications(transport=LocalTransport())
+    return db_path
+
+
+def _replay_sender(args):
+    """send(message) -> results, against a server URL or this process's app (sandboxed)"""
+    if args.in_process:
+        db_path = _replay_sandbox(args.db)
+        print(f"Replaying in-process into {db_path} (no Redis, tenants or SMS)", file=sys.stderr)
+
+        def send(message):
+            response = app.test_client().post("/webhook", json={"message": message})
+            return (response.get_json() or {}).get("results", [])
+        return send
+
+    import urllib.request
+
+    def send(message):
+        body = json.dumps({"message": message}).encode('utf-8')
+        req = urllib.request.Request(args.url, data=body, headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(req, timeout=args.timeout) as response:
+            return json.loads(response.read()).get("results", [])
+    return send
+
+
+def _cmd_replay(args) -> int:
+    records = load_recordings(args.files)
+    if not records:
+        print("No recorded webhooks found")
+        return 1
+    try:
+        send = _replay_sender(args)
+    except ValueError as e:
+        print(f"Replay refused: {e}", file=sys.stderr)
+        return 1
+    try:
+        stats = replay(records, send, speed=args.speed, concurrency=args.concurrency)
+    finally:
+        stop_notifications()
+    if args.json:
+        print(json.dumps(stats, indent=2))
+    else:
+        latency = stats['latencyMs']
+        print(
+            f"Replayed {stats['webhooks']} webhooks ({stats['toolCalls']} tool calls) in {stats['seconds']}s "
+            f"(recorded over {stats['recordedSeconds']}s); {stats['matched']} results matched, "
+            f"{len(stats['mismatched'])} differed, {stats['errors']} failed"
+        )
+        print(f"Latency ms: p50 {latency['p50']}, p95 {latency['p95']}, max {latency['max']}")
+        for mismatch in stats['mismatched'][:20]:
+            print(f"  differs: {mismatch['tool']} in call {mismatch['callId']}")
+    if stats['errors'] or (args.fail_on_mismatch and stats['mismatched']):
+        return 1
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="kebabalab", description="Kebabalab VAPI server")
+    subparsers = parser.add_subparsers(dest="command")
+
+    subparsers.add_parser("run", help="Run the development server (default)")
+
+    serve = subparsers.add_parser("serve", help="Run the production server (pre-forked workers)")
+    serve.add_argument("--host", default=os.getenv('HOST', '0.0.0.0'))
+    serve.add_argument("--port", type=int, default=int(os.getenv('PORT', '8000')))
+    serve.add_argument("--workers", type=int, default=int(os.getenv('WEB_WORKERS', '0')) or None,
+                       help="Worker processes (default: one per CPU core)")
+    serve.add_argument("--threads", type=int, default=int(os.getenv('WEB_THREADS', '0')) or None,
+                       help="Request threads per worker")
+    serve.add_argument("--drain-timeout", type=float, default=float(os.getenv('DRAIN_TIMEOUT', '30')),
+                       help="Seconds in-flight requests get to finish on shutdown")
+    serve.set_defaults(handler=_cmd_serve)
+
+    backfill = subparsers.add_parser(
+        "backfill-order-items",
+        help="Populate order_items from existing orders.cart_json",
+    )
+    backfill.add_argument("--batch-size", type=int, default=500)
+    backfill.add_argument("--db", default=None, help="Database path (defaults to DB_FILE)")
+    backfill.set_defaults(handler=_cmd_backfill_order_items)
+
+    keys = subparsers.add_parser(
+        "backfill-customer-keys",
+        help="Fill the canonical customer key for existing orders and archives, every tenant's too (safe to re-run)",
+    )
+    keys.add_argument("--batch-size", type=int, default=500)
+    keys.add_argument("--db", default=None, help="Database path (defaults to DB_FILE)")
+    keys.add_argument("--archive-dir", default=None, help="Archive directory (defaults to ARCHIVE_DIR)")
+    keys.set_defaults(handler=_cmd_backfill_customer_keys)
+
+    archive = subparsers.add_parser(
+        "archive-orders",
+        help="Move old orders into monthly archive databases",
+    )
+    archive.add_argument("--older-than-days", type=int, default=ARCHIVE_AFTER_DAYS)
+    archive.add_argument("--archive-dir", default=None, help="Archive directory (defaults to ARCHIVE_DIR)")
+    archive.add_argument("--db", default=None, help="Database path (defaults to DB_FILE)")
+    archive.add_argument("--vacuum", action="store_true", help="VACUUM the hot database afterwards")
+    archive.set_defaults(handler=_cmd_archive_orders)
+
+    compile_parser = subparsers.add_parser(
+        "compile-menu",
+        help="Compile menu.json (and every tenant's menu) into the artifact workers load at startup",
+    )
+    compile_parser.add_argument("menu", nargs="*", help="Menu files (defaults to MENU_FILE and tenant menus)")
+    compile_parser.add_argument("--check", action="store_true", help="Only report artifacts that are missing or stale")
+    compile_parser.set_defaults(handler=_cmd_compile_menu)
+
+    backup = subparsers.add_parser("backup", help="Snapshot the orders database (safe while the server runs)")
+    backup.add_argument("--db", default=None, help="Database path (defaults to DB_FILE)")
+    backup.add_argument("--backup-dir", default=None, help="Snapshot directory (defaults to BACKUP_DIR)")
+    backup.add_argument("--no-verify", action="store_true", help="Skip the integrity check of the snapshot")
+    backup.set_defaults(handler=_cmd_backup)
+
+    report = subparsers.add_parser("report", help="Sales report or order export, streamed from the database")
+    report.add_argument("kind", choices=["sales", "orders"])
+    report.add_argument("--from", dest="start", type=parse_date, default=None, help="First local date (YYYY-MM-DD)")
+    report.add_argument("--to", dest="end", type=parse_date, default=None, help="Last local date (YYYY-MM-DD, inclusive)")
+    report.add_argument("--format", choices=["csv", "json"], default="csv")
+    report.add_argument("--section", choices=list(SECTION_COLUMNS), default="daily",
+                        help="Sales CSV section (JSON includes all of them)")
+    report.add_argument("--top", type=int, default=10, help="Top items to list (0 for all)")
+    report.add_argument("--db", default=None, help="Database path (defaults to DB_FILE)")
+    report.add_argument("--archive-dir", default=None, help="Archive directory (defaults to ARCHIVE_DIR)")
+    report.add_argument("--output", "-o", default=None, help="Write to this file instead of stdout")
+    report.set_defaults(handler=_cmd_report)
+
+    replay_cmd = subparsers.add_parser(
+        "replay",
+        help="Re-send recorded calls (CALL_RECORD_DIR files) to a sandboxed server or an in-process sandbox",
+    )
+    replay_cmd.add_argument("files", nargs="+", help="Recording files (.kbrec); several are merged in time order")
+    replay_cmd.add_argument(
+        "--url", default="http://127.0.0.1:8000/webhook",
+        help="Webhook URL to replay against. Must be a sandboxed server (own database, SMS_TRANSPORT=local, "
+             "no shared Redis): replayed calls place orders and send texts to the recorded numbers",
+    )
+    replay_cmd.add_argument("--in-process", action="store_true",
+                            help="Replay against this process's app in a sandbox (no Redis, tenants or SMS)")
+    replay_cmd.add_argument("--db", default=None,
+                            help="Database for --in-process (defaults to a temporary one; never DB_FILE)")
+    replay_cmd.add_argument("--speed", type=float, default=1.0,
+                            help="Time compression: 1 = recorded pace, 10 = ten times faster, 0 = no gaps")
+    replay_cmd.add_argument("--concurrency", type=int, default=8, help="Calls replayed at once")
+    replay_cmd.add_argument("--timeout", type=float, default=30.0, help="Seconds to wait for each webhook")
+    replay_cmd.add_argument("--json", action="store_true", help="Print the full result as JSON")
+    replay_cmd.add_argument("--fail-on-mismatch", action="store_true",
+                            help="Exit 1 if any result differs from the recording")
+    replay_cmd.set_defaults(handler=_cmd_replay)
+
+    args = parser.parse_args(argv)
+    configure_logging()
+    handler = getattr(args, "handler", None)
+    if handler is None:
+        run_dev_server()
+        return 0
+    return handler(args)
+
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    raise SystemExit(main())
@@ -0,0 +1,98 @@
+"""
+Tool response shaping
+=====================
+
+Every tool result is read back into the voice assistant's context, so
+structured echoes (the whole cart, the item just added or edited) cost
+tokens and time to first speech on every turn. Results are shaped on the
+way out of the webhook:
+
+- compact (default): per-tool profiles drop structured fields the
+  assistant already has in readable form, or replace an item dict with
+  its one-line rendering
+- full: the result exactly as the tool built it
+- fields: a per-call list of keys to return (``ok``/``error`` always stay)
+
+Failed results are never shaped, so the assistant always sees the whole
+error.
+"""
+
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+COMPACT = "compact"
+FULL = "full"
+VERBOSITIES = (COMPACT, FULL)
+
+# Per tool, fields removed in compact mode: None drops the field, a string
+# replaces an item dict with its rendered line under that key
+COMPACT_PROFILES: Dict[str, Dict[str, Optional[str]]] = {
+    "getCartState": {"cart": None},
+    "applyCartOperations": {"cart": None},
+    "quickAddItem": {"item": "itemLine"},
+    "editCartItem": {"updatedItem": "updatedLine"},
+    "removeCartItem": {"removedItem": "removedLine"},
+}
+
+ALWAYS_KEPT = ("ok", "error")
+
+
+def parse_fields(value: Any) -> Optional[List[str]]:
+    """``["a", "b"]`` or ``"a, b"`` -> ["a", "b"]; anything else -> None"""
+    if isinstance(value, str):
+        value = value.split(",")
+    if not isinstance(value, (list, tuple)):
+        return None
+    fields = [str(field).strip() for field in value if str(field).strip()]
+    return fields or None
+
+
+def parse_overrides(text: str) -> Dict[str, str]:
+    """``"getCartState=full, editCartItem=compact"`` -> {tool: verbosity}"""
+    overrides = {}
+    for part in (text or "").split(","):
+        tool, sep, verbosity = part.partition("=")
+        verbosity = verbosity.strip().lower()
+        if sep and tool.strip() and verbosity in VERBOSITIES:
+            overrides[tool.strip()] = verbosity
+    return overrides
+
+
+def _compact(tool: str, result: Dict[str, Any], render_line: Optional[Callable[[Dict], str]]) -> Dict[str, Any]:
+    profile = COMPACT_PROFILES.get(tool)
+    if not profile:
+        return result
+    shaped = {}
+    for key, value in result.items():
+        if key not in profile:
+            shaped[key] = value
+            continue
+        target = profile[key]
+        if target and render_line is not None and isinstance(value, dict):
+            shaped[target] = render_line(value)
+    return shaped
+
+
+def _select(pool: Dict[str, Any], fields: Iterable[str]) -> Dict[str, Any]:
+    selected = {key: pool[key] for key in ALWAYS_KEPT if key in pool}
+    for key in fields:
+        if key in pool:
+            selected[key] = pool[key]
+    return selected
+
+
+def shape_response(
+    tool: str,
+    result: Any,
+    verbosity: str = COMPACT,
+    fields: Optional[Iterable[str]] = None,
+    render_line: Optional[Callable[[Dict], str]] = None,
+) -> Any:
+    """Shape one tool result for the assistant (see module docstring)"""
+    if not isinstance(result, dict) or result.get("ok") is False:
+        return result
+    if fields:
+        compact = _compact(tool, result, render_line)
+        return _select({**result, **compact}, fields)
+    if verbosity == FULL:
+        return result
+    return _compact(tool, result, render_line)
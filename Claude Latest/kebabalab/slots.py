@@ -0,0 +1,216 @@
+"""
+Pickup slot capacity
+====================
+
+Pickup times are grouped into fixed slots (5 minutes by default), each with
+a kitchen capacity in orders. Every day keeps a bitmap of full slots, so the
+nearest slot with room is found with a couple of integer bit operations,
+whatever the time of day.
+
+Stores:
+- MemorySlotStore: per-process counts (single worker / tests), restored
+  from the orders table when the scheduler is built
+- RedisSlotStore: counts shared by every worker, reserved atomically in Lua
+"""
+
+import threading
+from collections import Counter, defaultdict
+from datetime import datetime, tzinfo
+from typing import Dict, Iterable, Optional
+
+_RESERVE_LUA = """
+local count = redis.call('HINCRBY', KEYS[1], ARGV[1], 1)
+local capacity = tonumber(ARGV[2])
+if count > capacity then
+    redis.call('HINCRBY', KEYS[1], ARGV[1], -1)
+    return 0
+end
+if count == capacity then
+    redis.call('SADD', KEYS[2], ARGV[1])
+end
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+redis.call('EXPIRE', KEYS[2], ARGV[3])
+return 1
+"""
+
+_RELEASE_LUA = """
+local count = tonumber(redis.call('HGET', KEYS[1], ARGV[1]) or '0')
+if count <= 0 then
+    return 0
+end
+count = redis.call('HINCRBY', KEYS[1], ARGV[1], -1)
+if count < tonumber(ARGV[2]) then
+    redis.call('SREM', KEYS[2], ARGV[1])
+end
+return 1
+"""
+
+
+class MemorySlotStore:
+    """Slot counts and per-day full bitmaps held in this process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts: Dict[int, int] = {}
+        self._full: Dict[int, int] = defaultdict(int)
+
+    def full_mask(self, day: int, slots_per_day: int) -> int:
+        return self._full.get(day, 0)
+
+    def count(self, slot: int, slots_per_day: int = 288) -> int:
+        return self._counts.get(slot, 0)
+
+    def reserve(self, slot: int, capacity: int, slots_per_day: int) -> bool:
+        day, index = divmod(slot, slots_per_day)
+        with self._lock:
+            count = self._counts.get(slot, 0)
+            if count >= capacity:
+                return False
+            self._counts[slot] = count + 1
+            if count + 1 >= capacity:
+                self._full[day] |= 1 << index
+            return True
+
+    def release(self, slot: int, capacity: int, slots_per_day: int) -> bool:
+        day, index = divmod(slot, slots_per_day)
+        with self._lock:
+            count = self._counts.get(slot, 0)
+            if count <= 0:
+                return False
+            self._counts[slot] = count - 1
+            if count - 1 < capacity:
+                self._full[day] &= ~(1 << index)
+            return True
+
+    def restore(self, counts: Dict[int, int], capacity: int, slots_per_day: int) -> None:
+        """Replace every count (e.g. with the bookings already in the database)."""
+        full: Dict[int, int] = defaultdict(int)
+        for slot, count in counts.items():
+            if count >= capacity:
+                day, index = divmod(slot, slots_per_day)
+                full[day] |= 1 << index
+        with self._lock:
+            self._counts = dict(counts)
+            self._full = full
+
+
+class RedisSlotStore:
+    """Slot counts shared through Redis: one hash of counts and one set of full slots per day."""
+
+    def __init__(self, client, prefix: str = "slots", ttl_seconds: int = 3 * 86400):
+        self.client = client
+        self.prefix = prefix
+        self.ttl_seconds = ttl_seconds
+        self._reserve = client.register_script(_RESERVE_LUA)
+        self._release = client.register_script(_RELEASE_LUA)
+
+    def _keys(self, day: int):
+        return [f"{self.prefix}:{day}:counts", f"{self.prefix}:{day}:full"]
+
+    def full_mask(self, day: int, slots_per_day: int) -> int:
+        mask = 0
+        for member in self.client.smembers(self._keys(day)[1]):
+            mask |= 1 << int(member)
+        return mask
+
+    def count(self, slot: int, slots_per_day: int = 288) -> int:
+        day, index = divmod(slot, slots_per_day)
+        return int(self.client.hget(self._keys(day)[0], index) or 0)
+
+    def reserve(self, slot: int, capacity: int, slots_per_day: int) -> bool:
+        day, index = divmod(slot, slots_per_day)
+        return bool(self._reserve(keys=self._keys(day), args=[index, capacity, self.ttl_seconds]))
+
+    def release(self, slot: int, capacity: int, slots_per_day: int) -> bool:
+        day, index = divmod(slot, slots_per_day)
+        return bool(self._release(keys=self._keys(day), args=[index, capacity]))
+
+
+def _lowest_bit(mask: int) -> int:
+    return (mask & -mask).bit_length() - 1
+
+
+class SlotScheduler:
+    """Finds, reserves and releases capacity-limited pickup slots."""
+
+    def __init__(self, store, capacity: int, slot_minutes: int = 5):
+        if 1440 % slot_minutes:
+            raise ValueError("slot_minutes must divide a day evenly")
+        self.store = store
+        self.capacity = int(capacity)
+        self.slot_minutes = int(slot_minutes)
+        self.slot_seconds = self.slot_minutes * 60
+        self.slots_per_day = 1440 // self.slot_minutes
+        self._all = (1 << self.slots_per_day) - 1
+
+    @property
+    def enabled(self) -> bool:
+        return self.capacity > 0
+
+    def slot_of(self, dt: datetime) -> int:
+        return int(dt.timestamp()) // self.slot_seconds
+
+    def first_slot_at_or_after(self, dt: datetime) -> int:
+        return -(-int(dt.timestamp()) // self.slot_seconds)
+
+    def slot_start(self, slot: int, tz: Optional[tzinfo] = None) -> datetime:
+        return datetime.fromtimestamp(slot * self.slot_seconds, tz)
+
+    def _free(self, day: int) -> int:
+        return ~self.store.full_mask(day, self.slots_per_day) & self._all
+
+    def find_nearest(self, requested: int, earliest: Optional[int] = None) -> Optional[int]:
+        """
+        Nearest slot with capacity to ``requested``, never before ``earliest``.
+
+        Looks forward through the rest of the day and the next day, and
+        backward as far as ``earliest``, into the previous day if need be
+        (days are UTC epoch days, so a boundary can fall mid-service); ties
+        go to the later slot.
+        """
+        if not self.enabled:
+            return requested
+        earliest = requested if earliest is None else min(earliest, requested)
+        day, index = divmod(requested, self.slots_per_day)
+        free_today = self._free(day)
+
+        forward = None
+        ahead = free_today >> index
+        if ahead:
+            forward = requested + _lowest_bit(ahead)
+        else:
+            free_tomorrow = self._free(day + 1)
+            if free_tomorrow:
+                forward = (day + 1) * self.slots_per_day + _lowest_bit(free_tomorrow)
+
+        backward = None
+        floor_index = max(0, earliest - day * self.slots_per_day)
+        if floor_index < index:
+            behind = free_today & ((1 << index) - 1) & ~((1 << floor_index) - 1)
+            if behind:
+                backward = day * self.slots_per_day + behind.bit_length() - 1
+        if backward is None and earliest < day * self.slots_per_day:
+            floor_index = max(0, earliest - (day - 1) * self.slots_per_day)
+            behind = self._free(day - 1) & ~((1 << floor_index) - 1)
+            if behind:
+                backward = (day - 1) * self.slots_per_day + behind.bit_length() - 1
+
+        if forward is None:
+            return backward
+        if backward is None or forward - requested <= requested - backward:
+            return forward
+        return backward
+
+    def reserve(self, slot: int) -> bool:
+        if not self.enabled:
+            return True
+        return self.store.reserve(slot, self.capacity, self.slots_per_day)
+
+    def release(self, slot: int) -> bool:
+        if not self.enabled:
+            return False
+        return self.store.release(slot, self.capacity, self.slots_per_day)
+
+    def restore(self, booked: Iterable[int]) -> None:
+        """Set the in-process counts from the slots of orders already placed."""
+        self.store.restore(Counter(booked), self.capacity, self.slots_per_day)
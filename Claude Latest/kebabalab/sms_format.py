@@ -0,0 +1,142 @@
+"""
+SMS encoding and segment budgeting
+==================================
+
+A single emoji or bullet forces the whole message into UCS-2, where a
+segment holds 70 characters instead of 160 (67 vs 153 once a message is
+split). This module measures messages the way carriers bill them, produces
+GSM-7-safe variants, and picks the cheapest rendering that fits a segment
+budget.
+"""
+
+import math
+import unicodedata
+from typing import Callable, List, NamedTuple, Optional, Sequence
+
+GSM7_BASIC = (
+    "@£$¥èéùìòÇ\nØø\rÅåΔ_ΦΓΛΩΠΨΣΘΞÆæßÉ !\"#¤%&'()*+,-./0123456789:;<=>?"
+    "¡ABCDEFGHIJKLMNOPQRSTUVWXYZÄÖÑÜ§¿abcdefghijklmnopqrstuvwxyzäöñüà"
+)
+GSM7_EXTENDED = "^{}\\[~]|€\f"
+
+_GSM7_BASIC_SET = frozenset(GSM7_BASIC)
+_GSM7_EXTENDED_SET = frozenset(GSM7_EXTENDED)
+
+# Common typographic characters with GSM-7 equivalents
+_REPLACEMENTS = {
+    "•": "-",
+    "·": "-",
+    "–": "-",
+    "—": "-",
+    "‘": "'",
+    "’": "'",
+    "‚": "'",
+    "“": '"',
+    "”": '"',
+    "„": '"',
+    "…": "...",
+    "×": "x",
+    " ": " ",
+    "\t": " ",
+}
+
+GSM7 = "GSM-7"
+UCS2 = "UCS-2"
+
+
+class SegmentInfo(NamedTuple):
+    encoding: str
+    units: int
+    segments: int
+
+
+def is_gsm7(text: str) -> bool:
+    return all(ch in _GSM7_BASIC_SET or ch in _GSM7_EXTENDED_SET for ch in text)
+
+
+def segment_info(text: str) -> SegmentInfo:
+    """Return the encoding, billable length and segment count for ``text``."""
+    if is_gsm7(text):
+        units = sum(2 if ch in _GSM7_EXTENDED_SET else 1 for ch in text)
+        single, multi, encoding = 160, 153, GSM7
+    else:
+        units = len(text.encode("utf-16-le")) // 2
+        single, multi, encoding = 70, 67, UCS2
+    segments = 1 if units <= single else math.ceil(units / multi)
+    return SegmentInfo(encoding, units, segments)
+
+
+def _gsm7_char(ch: str) -> str:
+    if ch in _GSM7_BASIC_SET or ch in _GSM7_EXTENDED_SET:
+        return ch
+    if ch in _REPLACEMENTS:
+        return _REPLACEMENTS[ch]
+    # Fall back to the unaccented letter (e.g. "ç" -> "c"), or drop it (emoji)
+    decomposed = unicodedata.normalize("NFKD", ch)
+    return "".join(c for c in decomposed if c in _GSM7_BASIC_SET)
+
+
+def to_gsm7(text: str) -> str:
+    """Rewrite ``text`` using only GSM-7 characters."""
+    lines = []
+    for line in text.split("\n"):
+        converted = "".join(_gsm7_char(ch) for ch in line)
+        # A dropped leading emoji leaves a stray space ("🥙 ORDER" -> " ORDER")
+        if converted.startswith(" ") and not line.startswith(" "):
+            converted = converted.lstrip(" ")
+        lines.append(converted.rstrip(" "))
+    return "\n".join(lines)
+
+
+class SmsPlan(NamedTuple):
+    text: str
+    info: SegmentInfo
+    variant: str
+
+
+def _cheapest(candidates: Sequence[SmsPlan]) -> SmsPlan:
+    # Earlier candidates win ties, so callers list their preferred rendering first
+    best = candidates[0]
+    for plan in candidates[1:]:
+        if plan.info.segments < best.info.segments:
+            best = plan
+    return best
+
+
+def _plan(text: str, variant: str) -> SmsPlan:
+    return SmsPlan(text, segment_info(text), variant)
+
+
+def fit_message(
+    render: Callable[[List[str], str], str],
+    full_items: Sequence[str],
+    compact_items: Sequence[str],
+    budget: Optional[int] = None,
+    allow_truncate: bool = False,
+    more_label: Callable[[int], str] = lambda n: f"+{n} more item{'s' if n != 1 else ''}",
+) -> SmsPlan:
+    """
+    Choose the cheapest rendering of a message.
+
+    ``render(items, separator)`` builds the full text from item strings.
+    Preference order: the rich original, its GSM-7 variant if that saves
+    segments, then compact item lines if the budget is still exceeded, and
+    finally (when ``allow_truncate``) dropping trailing items behind a
+    "+N more" line.
+    """
+    rich = _plan(render(list(full_items), "\n\n"), "rich")
+    best = _cheapest([rich, _plan(to_gsm7(rich.text), "gsm7")])
+    if budget is None or best.info.segments <= budget:
+        return best
+
+    compact = _plan(to_gsm7(render(list(compact_items), "\n")), "compact")
+    best = _cheapest([best, compact])
+    if best.info.segments <= budget or not allow_truncate:
+        return best
+
+    for keep in range(len(compact_items) - 1, 0, -1):
+        lines = list(compact_items[:keep]) + [more_label(len(compact_items) - keep)]
+        plan = _plan(to_gsm7(render(lines, "\n")), "truncated")
+        if plan.info.segments <= budget:
+            return plan
+    return best
@@ -0,0 +1,252 @@
+"""
+Shop tenants
+============
+
+One process can answer calls for several shops. Each tenant is a shop with
+its own data directory (``business.json``, ``hours.json``, ``menu.json``),
+its own orders database, SMS settings and session namespace. Calls are
+routed to a tenant by the number that was dialled or by the assistant that
+answered, as found in the VAPI payload.
+
+Tenants are declared in a JSON file::
+
+    {
+      "tenants": [
+        {
+          "id": "cranny-boys-pizza",
+          "data_dir": "../cranny-boys-pizza/data",
+          "phone_numbers": ["+61 3 9770 4755"],
+          "assistant_ids": ["asst-cranny"],
+          "sms": {"order_to": "+61423680596", "menu_url": "https://example.com/menu"}
+        }
+      ]
+    }
+
+``menu_file``, ``hours_file`` and ``db_file`` default to files in
+``data_dir``; relative paths are resolved against the project root. Shop
+name, address and timezone come from ``business.json``.
+
+Declarations are cheap and all kept; a tenant's loaded state (menu indexes,
+schedule, kitchen queue, rendered lines) is built on first use and lives in
+an LRU of active tenants, so a quiet shop costs nothing until it rings.
+Calls that match no tenant are handled by the default shop (the server's
+module settings).
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import pytz
+
+from .render_cache import RenderCache
+
+logger = logging.getLogger(__name__)
+
+_PHONE_CHARS = re.compile(r"^[\d\s()+.-]+$")
+
+
+def routing_key(value: Any) -> Optional[str]:
+    """Normalise a dialled number or assistant id for lookup"""
+    if value is None:
+        return None
+    text = str(value).strip()
+    if not text:
+        return None
+    if _PHONE_CHARS.match(text):
+        digits = re.sub(r"\D", "", text)
+        if len(digits) == 10 and digits.startswith("0"):
+            digits = "61" + digits[1:]  # Australian local -> international
+        return digits or None
+    return text
+
+
+def routing_keys(message: Dict[str, Any]) -> List[str]:
+    """Candidate routing keys from a VAPI message: dialled number first, then assistant"""
+    call = message.get("call") or {}
+    phone_number = message.get("phoneNumber") or call.get("phoneNumber") or {}
+    assistant = message.get("assistant") or call.get("assistant") or {}
+    candidates = [
+        phone_number.get("number") if isinstance(phone_number, dict) else None,
+        phone_number.get("id") if isinstance(phone_number, dict) else None,
+        call.get("phoneNumberId"),
+        call.get("assistantId"),
+        assistant.get("id") if isinstance(assistant, dict) else None,
+    ]
+    keys = []
+    for candidate in candidates:
+        key = routing_key(candidate)
+        if key and key not in keys:
+            keys.append(key)
+    return keys
+
+
+class TenantSpec:
+    """A tenant as declared in the tenants file (nothing loaded yet)."""
+
+    __slots__ = ("id", "data_dir", "menu_file", "hours_file", "db_file", "routes", "sms")
+
+    def __init__(self, entry: Dict[str, Any], base_dir: str):
+        tenant_id = str(entry.get("id") or "").strip()
+        if not tenant_id or ":" in tenant_id:
+            raise ValueError(f"Tenant id must be a non-empty string without ':' (got {entry.get('id')!r})")
+        if not entry.get("data_dir"):
+            raise ValueError(f"Tenant '{tenant_id}' needs a data_dir")
+
+        def path(value: str) -> str:
+            return os.path.normpath(os.path.join(base_dir, value))
+
+        self.id = tenant_id
+        self.data_dir = path(entry["data_dir"])
+        self.menu_file = path(entry.get("menu_file") or os.path.join(self.data_dir, "menu.json"))
+        self.hours_file = path(entry.get("hours_file") or os.path.join(self.data_dir, "hours.json"))
+        self.db_file = path(entry.get("db_file") or os.path.join(self.data_dir, "orders.db"))
+        declared = list(entry.get("phone_numbers") or []) + list(entry.get("assistant_ids") or [])
+        self.routes = [key for key in map(routing_key, declared) if key]
+        self.sms = dict(entry.get("sms") or {})
+
+
+class TenantUnavailable(Exception):
+    """A declared tenant that can't take calls (e.g. its menu won't load); it isn't kept loaded."""
+
+    def __init__(self, tenant_id: str, reason: str):
+        super().__init__(f"Tenant '{tenant_id}' unavailable: {reason}")
+        self.tenant_id = tenant_id
+        self.reason = reason
+
+
+class Tenant:
+    """A loaded tenant: shop settings plus per-shop state built on first use."""
+
+    def __init__(self, spec: TenantSpec):
+        self.id = spec.id
+        self.data_dir = spec.data_dir
+        self.menu_file = spec.menu_file
+        self.hours_file = spec.hours_file
+        self.db_file = spec.db_file
+        self.settings = self._read_settings(spec)
+        self.render_cache = RenderCache()
+        self._state: Dict[str, Any] = {}
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def _read_settings(spec: TenantSpec) -> Dict[str, Any]:
+        business: Dict[str, Any] = {}
+        try:
+            with open(os.path.join(spec.data_dir, "business.json"), "r", encoding="utf-8") as f:
+                business = json.load(f)
+        except FileNotFoundError:
+            logger.warning(f"Tenant '{spec.id}' has no business.json in {spec.data_dir}")
+        details = business.get("business_details") or {}
+        contact = business.get("contact") or {}
+        timezone_name = details.get("timezone") or "Australia/Melbourne"
+        try:
+            timezone = pytz.timezone(timezone_name)
+        except pytz.exceptions.UnknownTimeZoneError:
+            logger.warning(f"Tenant '{spec.id}': unknown timezone '{timezone_name}', using Australia/Melbourne")
+            timezone = pytz.timezone("Australia/Melbourne")
+        return {
+            "name": details.get("name") or spec.id,
+            "address": details.get("address") or "",
+            "timezone": timezone,
+            "order_to": spec.sms.get("order_to") or contact.get("notification_phone") or details.get("phone") or "",
+            "menu_url": spec.sms.get("menu_url") or details.get("website") or "",
+            "archive_dir": os.path.join(spec.data_dir, "archive"),
+        }
+
+    def lazy(self, name: str, build: Callable[[], Any]) -> Any:
+        """Return per-tenant state ``name``, building it on first use"""
+        try:
+            return self._state[name]
+        except KeyError:
+            pass
+        with self._lock:
+            if name not in self._state:
+                self._state[name] = build()
+            return self._state[name]
+
+    def peek(self, name: str) -> Any:
+        """Per-tenant state ``name`` if it has been built, else None"""
+        return self._state.get(name)
+
+
+class TenantRegistry:
+    """Routes calls to tenants and keeps the most recently used ones loaded."""
+
+    def __init__(
+        self,
+        specs: Iterable[TenantSpec],
+        maxsize: int = 32,
+        on_load: Optional[Callable[[Tenant], None]] = None,
+    ):
+        self.specs: Dict[str, TenantSpec] = {}
+        self.routes: Dict[str, str] = {}
+        for spec in specs:
+            if spec.id in self.specs:
+                raise ValueError(f"Duplicate tenant id '{spec.id}'")
+            self.specs[spec.id] = spec
+            for key in spec.routes:
+                owner = self.routes.setdefault(key, spec.id)
+                if owner != spec.id:
+                    raise ValueError(f"Route '{key}' is claimed by both '{owner}' and '{spec.id}'")
+        self.maxsize = max(1, int(maxsize))
+        self._on_load = on_load
+        self._active: "OrderedDict[str, Tenant]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.evictions = 0
+
+    @classmethod
+    def from_file(cls, path: str, base_dir: str, **kwargs) -> "TenantRegistry":
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        entries = data.get("tenants") if isinstance(data, dict) else data
+        if not isinstance(entries, list):
+            raise ValueError(f"{path} must hold a list of tenants")
+        return cls([TenantSpec(entry, base_dir) for entry in entries], **kwargs)
+
+    def __len__(self) -> int:
+        return len(self.specs)
+
+    def get(self, tenant_id: str) -> Tenant:
+        """
+        The loaded tenant ``tenant_id`` (KeyError if it isn't declared). If
+        ``on_load`` raises (TenantUnavailable), nothing is cached and the
+        next call tries again.
+        """
+        with self._lock:
+            tenant = self._active.get(tenant_id)
+            if tenant is not None:
+                self._active.move_to_end(tenant_id)
+                return tenant
+            tenant = Tenant(self.specs[tenant_id])
+            if self._on_load is not None:
+                self._on_load(tenant)
+            self._active[tenant_id] = tenant
+            self.loads += 1
+            while len(self._active) > self.maxsize:
+                evicted, _ = self._active.popitem(last=False)
+                self.evictions += 1
+                logger.info(f"Tenant '{evicted}' unloaded (least recently used)")
+            return tenant
+
+    def resolve(self, message: Dict[str, Any]) -> Optional[Tenant]:
+        """The tenant a VAPI message is for, or None for the default shop"""
+        for key in routing_keys(message):
+            tenant_id = self.routes.get(key)
+            if tenant_id is not None:
+                return self.get(tenant_id)
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "declared": len(self.specs),
+                "active": list(self._active),
+                "loads": self.loads,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+"""
+Kebabalab VAPI Load Generator
+=============================
+Replays realistic phone orders against /webhook with many calls in flight:
+
+    greeting -> adds -> edits -> meals -> pickup -> createOrder -> endCall
+
+Each simulated call has its own call id and caller number, so sessions
+don't collide, and every tool call uses the same `tool-calls` payload VAPI
+sends (see tests/test_webhook_live.py). Reports latency percentiles per
+tool and per conversation, error rates and throughput.
+
+Orders are created with sendSMS=false, so a load test doesn't text anyone.
+
+Usage:
+    python scripts/load_test.py [--url http://localhost:8000] [--calls 50]
+                                [--concurrency 10] [--ramp 5] [--think-ms 0]
+                                [--seed 1] [--json report.json]
+
+    python scripts/load_test.py --in-process --calls 20
+
+`--in-process` drives the Flask app directly (no server, no network). It
+uses Redis when REDIS_HOST points at one, and in-memory sessions otherwise.
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.dirname(SCRIPT_DIR)
+
+KEBABS = ["large chicken kebab", "small lamb kebab", "large mix kebab", "small falafel kebab"]
+HSPS = ["large chicken hsp", "small lamb hsp", "large mix hsp"]
+SIDES = ["small chips", "large chips", "coke", "pepsi", "water"]
+EDITS = [
+    {"size": "large"},
+    {"salads": ["lettuce", "tomato", "onion"]},
+    {"sauces": ["garlic", "chilli"]},
+    {"cheese": True},
+]
+PICKUPS = ["in 20 minutes", "in 30 minutes", "in 45 minutes", "7pm", "7:30pm"]
+NAMES = ["Sam", "Alex", "Jordan", "Priya", "Mohammed", "Chen", "Maria"]
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Conversations
+# ──────────────────────────────────────────────────────────────────────────────
+
+def build_conversation(rng: random.Random, phone: str) -> List[Tuple[str, Dict[str, Any]]]:
+    """A randomised but realistic sequence of (tool, arguments) for one call."""
+    steps: List[Tuple[str, Dict[str, Any]]] = [
+        ("checkOpen", {}),
+        ("getCallerSmartContext", {"callerPhone": phone}),
+    ]
+
+    mains = rng.sample(KEBABS + HSPS, rng.randint(1, 3))
+    for description in mains:
+        steps.append(("quickAddItem", {"description": description}))
+    if rng.random() < 0.5:
+        sides = rng.sample(SIDES, rng.randint(1, 2))
+        steps.append(("addMultipleItemsToCart", {"items": [{"description": d} for d in sides]}))
+    steps.append(("getCartState", {}))
+
+    for _ in range(rng.randint(0, 2)):
+        steps.append(("editCartItem", {"itemIndex": 0, "modifications": rng.choice(EDITS)}))
+    if rng.random() < 0.2:
+        steps.append(("quickAddItem", {"description": "coke"}))
+        steps.append(("removeCartItem", {"itemIndex": len(mains)}))
+
+    if rng.random() < 0.6:
+        steps.append(("convertItemsToMeals", {}))
+    steps.append(("priceCart", {}))
+    steps.append(("getOrderSummary", {}))
+
+    if rng.random() < 0.5:
+        steps.append(("setPickupTime", {"requestedTime": rng.choice(PICKUPS)}))
+    else:
+        steps.append(("estimateReadyTime", {}))
+
+    steps.append(("createOrder", {"customerName": rng.choice(NAMES), "customerPhone": phone, "sendSMS": False}))
+    steps.append(("endCall", {"reason": "order-complete"}))
+    return steps
+
+
+def tool_call_payload(call_id: str, phone: str, turn: int, tool: str, args: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "message": {
+            "type": "tool-calls",
+            "toolCalls": [
+                {
+                    "id": f"{call_id}-{turn}",
+                    "type": "function",
+                    "function": {"name": tool, "arguments": json.dumps(args)},
+                }
+            ],
+            "call": {"id": call_id, "customer": {"number": phone}},
+        }
+    }
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Transports
+# ──────────────────────────────────────────────────────────────────────────────
+
+class HttpClient:
+    """POSTs to a running server, one keep-alive session per thread."""
+
+    def __init__(self, base_url: str, timeout: float = 30.0):
+        import requests
+
+        self._requests = requests
+        self.url = base_url.rstrip("/") + "/webhook"
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def post(self, payload: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = self._requests.Session()
+        response = session.post(self.url, json=payload, timeout=self.timeout)
+        try:
+            body = response.json()
+        except ValueError:
+            body = {}
+        return response.status_code, body
+
+
+class InProcessClient:
+    """Calls the Flask app through its test client (no server or network)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    def post(self, payload: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        response = self.app.test_client().post("/webhook", json=payload)
+        return response.status_code, response.get_json(silent=True) or {}
+
+
+def in_process_app(db_file: Optional[str] = None):
+    sys.path.insert(0, BASE_DIR)
+    from kebabalab.server import create_app
+
+    db_file = db_file or os.path.join(tempfile.mkdtemp(prefix="kebabalab-load-"), "orders.db")
+    return create_app({"DB_FILE": db_file})
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Stats
+# ──────────────────────────────────────────────────────────────────────────────
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100.0 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarise(latencies: List[float]) -> Dict[str, float]:
+    values = sorted(latencies)
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "p50_ms": round(percentile(values, 50) * 1000, 2),
+        "p90_ms": round(percentile(values, 90) * 1000, 2),
+        "p95_ms": round(percentile(values, 95) * 1000, 2),
+        "p99_ms": round(percentile(values, 99) * 1000, 2),
+        "max_ms": round(values[-1] * 1000, 2),
+        "mean_ms": round(sum(values) / len(values) * 1000, 2),
+    }
+
+
+class LoadStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.tool_latency: Dict[str, List[float]] = defaultdict(list)
+        self.tool_errors: Dict[str, int] = defaultdict(int)      # {"ok": false} results
+        self.transport_errors: Dict[str, int] = defaultdict(int)  # HTTP errors / exceptions
+        self.conversation_latency: List[float] = []
+        self.conversations_failed = 0
+        self.orders_created = 0
+
+    def record_tool(self, tool: str, elapsed: float, ok: bool, transport_ok: bool) -> None:
+        with self._lock:
+            self.tool_latency[tool].append(elapsed)
+            if not transport_ok:
+                self.transport_errors[tool] += 1
+            elif not ok:
+                self.tool_errors[tool] += 1
+
+    def record_conversation(self, elapsed: float, completed: bool, ordered: bool) -> None:
+        with self._lock:
+            self.conversation_latency.append(elapsed)
+            if not completed:
+                self.conversations_failed += 1
+            if ordered:
+                self.orders_created += 1
+
+    def report(self, wall_seconds: float) -> Dict[str, Any]:
+        total_calls = sum(len(v) for v in self.tool_latency.values())
+        tools = {}
+        for tool in sorted(self.tool_latency):
+            summary = summarise(self.tool_latency[tool])
+            count = summary["count"]
+            summary["tool_error_rate"] = round(self.tool_errors[tool] / count, 4) if count else 0.0
+            summary["transport_error_rate"] = round(self.transport_errors[tool] / count, 4) if count else 0.0
+            tools[tool] = summary
+        conversations = len(self.conversation_latency)
+        return {
+            "wall_seconds": round(wall_seconds, 3),
+            "conversations": conversations,
+            "conversations_failed": self.conversations_failed,
+            "orders_created": self.orders_created,
+            "tool_calls": total_calls,
+            "tool_errors": sum(self.tool_errors.values()),
+            "transport_errors": sum(self.transport_errors.values()),
+            "throughput": {
+                "tool_calls_per_s": round(total_calls / wall_seconds, 2) if wall_seconds else 0.0,
+                "conversations_per_s": round(conversations / wall_seconds, 3) if wall_seconds else 0.0,
+            },
+            "end_to_end": summarise(self.conversation_latency),
+            "tools": tools,
+        }
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Runner
+# ──────────────────────────────────────────────────────────────────────────────
+
+def run_conversation(client, stats: LoadStats, index: int, seed: int, think_ms: float, run_id: str) -> None:
+    rng = random.Random(seed * 100003 + index)
+    call_id = f"load-{run_id}-{index}"
+    phone = f"+614{90000000 + (seed * 7919 + index) % 10000000:08d}"
+    completed, ordered = True, False
+    started = time.perf_counter()
+
+    for turn, (tool, args) in enumerate(build_conversation(rng, phone)):
+        if think_ms and turn:
+            time.sleep(think_ms / 1000.0)
+        t0 = time.perf_counter()
+        try:
+            status, body = client.post(tool_call_payload(call_id, phone, turn, tool, args))
+            results = body.get("results") or []
+            result = results[0].get("result", {}) if results else {}
+            transport_ok = status == 200 and bool(results)
+        except Exception:
+            result, transport_ok = {}, False
+        elapsed = time.perf_counter() - t0
+
+        ok = transport_ok and result.get("ok", True) is not False
+        stats.record_tool(tool, elapsed, ok, transport_ok)
+        if not transport_ok:
+            completed = False
+            break
+        if tool == "createOrder":
+            ordered = ok
+            completed = completed and ok
+
+    stats.record_conversation(time.perf_counter() - started, completed, ordered)
+
+
+def run_load(
+    client,
+    calls: int = 50,
+    concurrency: int = 10,
+    ramp: float = 0.0,
+    think_ms: float = 0.0,
+    seed: int = 1,
+    progress: Optional[Callable[[int], None]] = None,
+) -> Dict[str, Any]:
+    """
+    Run ``calls`` conversations with at most ``concurrency`` in flight.
+
+    ``ramp`` is how many new calls start per second while ramping up to
+    ``concurrency`` (0 starts them all at once).
+    """
+    stats = LoadStats()
+    run_id = f"{int(time.time())}-{seed}"
+    started = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        futures = []
+        for index in range(calls):
+            if ramp > 0 and 0 < index < concurrency:
+                time.sleep(1.0 / ramp)
+            futures.append(pool.submit(run_conversation, client, stats, index, seed, think_ms, run_id))
+        for done, future in enumerate(futures, 1):
+            future.result()
+            if progress:
+                progress(done)
+
+    return stats.report(time.perf_counter() - started)
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    e2e = report["end_to_end"]
+    print(f"\n{'=' * 78}")
+    print(
+        f"{report['conversations']} calls in {report['wall_seconds']}s  |  "
+        f"{report['throughput']['tool_calls_per_s']} tool calls/s  |  "
+        f"{report['orders_created']} orders"
+    )
+    print(
+        f"errors: {report['transport_errors']} transport, {report['tool_errors']} tool (ok=false), "
+        f"{report['conversations_failed']} calls failed"
+    )
+    if e2e.get("count"):
+        print(f"end-to-end: p50 {e2e['p50_ms']}ms  p95 {e2e['p95_ms']}ms  p99 {e2e['p99_ms']}ms  max {e2e['max_ms']}ms")
+    print(f"{'=' * 78}")
+    print(f"{'tool':<24}{'count':>7}{'p50':>9}{'p90':>9}{'p95':>9}{'p99':>9}{'max':>9}{'err%':>8}")
+    for tool, s in report["tools"].items():
+        err = (s["tool_error_rate"] + s["transport_error_rate"]) * 100
+        print(
+            f"{tool:<24}{s['count']:>7}{s['p50_ms']:>9.1f}{s['p90_ms']:>9.1f}"
+            f"{s['p95_ms']:>9.1f}{s['p99_ms']:>9.1f}{s['max_ms']:>9.1f}{err:>7.1f}%"
+        )
+    print()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Concurrent VAPI conversation load generator")
+    parser.add_argument("--url", default=os.getenv("SERVER_URL", "http://localhost:8000"))
+    parser.add_argument("--in-process", action="store_true", help="Drive the Flask app directly, no server needed")
+    parser.add_argument("--db", default=None, help="Orders database for --in-process (default: a temp file)")
+    parser.add_argument("--calls", type=int, default=50, help="Conversations to run")
+    parser.add_argument("--concurrency", type=int, default=10, help="Conversations in flight at once")
+    parser.add_argument("--ramp", type=float, default=0.0, help="New calls per second while ramping up (0 = no ramp)")
+    parser.add_argument("--think-ms", type=float, default=0.0, help="Pause between turns of a call")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", dest="json_path", default=None, help="Also write the report as JSON")
+    args = parser.parse_args(argv)
+
+    client = InProcessClient(in_process_app(args.db)) if args.in_process else HttpClient(args.url)
+    target = "in-process app" if args.in_process else args.url
+    print(f"Running {args.calls} calls against {target} ({args.concurrency} concurrent)")
+
+    def progress(done: int) -> None:
+        if done % max(1, args.calls // 10) == 0 or done == args.calls:
+            print(f"  {done}/{args.calls} calls finished")
+
+    report = run_load(client, args.calls, args.concurrency, args.ramp, args.think_ms, args.seed, progress)
+    print_report(report)
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.json_path}")
+    return 1 if report["transport_errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -37,7 +37,7 @@ fi
 # ── Start Flask server ───────────────────────────────────────
 echo ""
 echo "Starting Kebabalab server on port $PORT …"
-python3 kebabalab/server.py &
+python3 -m kebabalab &
 SERVER_PID=$!
 echo "[server] PID $SERVER_PID"
 
@@ -0,0 +1,57 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def _ignore_trading_hours(monkeypatch):
+    """Pickup-time tests shouldn't depend on the wall clock; test_schedule opts back in."""
+    from kebabalab import server as server_module
+
+    monkeypatch.setattr(server_module, "ENFORCE_TRADING_HOURS", False)
+
+
+@pytest.fixture(autouse=True)
+def _fresh_pickup_slots(monkeypatch):
+    """Each test starts with empty pickup slots."""
+    from kebabalab import server as server_module
+
+    monkeypatch.setattr(server_module, "SLOTS", None)
+
+
+@pytest.fixture(autouse=True)
+def _no_rate_limits(monkeypatch):
+    """Tests replay many calls from one caller; test_rate_limits opts back in."""
+    from kebabalab import server as server_module
+
+    monkeypatch.setattr(server_module, "RATE_LIMITS_ENABLED", False)
+    monkeypatch.setattr(server_module, "RATE_LIMITER", None)
+
+
+@pytest.fixture(autouse=True)
+def _no_caller_prefetch(monkeypatch):
+    """Background prefetches would outlive a test's database; test_caller_prefetch opts back in."""
+    from kebabalab import server as server_module
+
+    monkeypatch.setattr(server_module, "CALLER_PREFETCH", False)
+
+
+@pytest.fixture
+def orders_db_file(tmp_path, monkeypatch):
+    """Point the server at an orders database and archive directory under tmp_path (neither created yet)."""
+    from kebabalab import server as server_module
+
+    db_path = tmp_path / "orders.db"
+    monkeypatch.setattr(server_module, "DB_FILE", str(db_path))
+    monkeypatch.setattr(server_module, "ARCHIVE_DIR", str(tmp_path / "archive"))
+    monkeypatch.setattr(server_module, "KITCHEN", None)
+    monkeypatch.setattr(server_module, "get_redis_client", lambda: None)
+    monkeypatch.setattr(server_module, "_send_sms", lambda phone, body: (True, None))
+    return db_path
+
+
+@pytest.fixture
+def orders_db(orders_db_file):
+    """A fresh, initialised orders database with in-memory sessions and SMS that always send."""
+    from kebabalab.server import init_database
+
+    init_database()
+    return orders_db_file
@@ -0,0 +1,93 @@
+import json
+import sqlite3
+from datetime import datetime
+
+import pytest
+
+from kebabalab import server as server_module
+from kebabalab.archive import iter_archived_rows, list_archives, months_back, rollover_orders
+from kebabalab.phones import customer_key
+from kebabalab.server import SESSIONS, app, session_get, tool_get_caller_smart_context, tool_repeat_last_order
+
+
+@pytest.fixture
+def archived_db(orders_db, tmp_path):
+    conn = sqlite3.connect(orders_db)
+    orders = [
+        ("20250110-001", "0412345678", "2025-01-10 09:00:00", "lamb"),
+        ("20250214-001", "0412345678", "2025-02-14 09:00:00", "chicken"),
+        ("20250601-001", "0499999999", "2025-06-01 09:00:00", "mixed"),
+    ]
+    for number, phone, created_at, protein in orders:
+        cart = [{"category": "kebabs", "protein": protein, "size": "small", "quantity": 1, "price": 10.0}]
+        cursor = conn.execute(
+            '''
+            INSERT INTO orders (order_number, customer_name, customer_phone, customer_key, cart_json,
+                                subtotal, gst, total, created_at)
+            VALUES (?, 'Test', ?, ?, ?, 9.09, 0.91, 10.0, ?)
+            ''',
+            (number, phone, customer_key(phone), json.dumps(cart), created_at),
+        )
+        conn.execute(
+            "INSERT INTO order_items (order_id, line_no, category, protein, size, quantity, unit_price) "
+            "VALUES (?, 0, 'kebabs', ?, 'small', 1, 10.0)",
+            (cursor.lastrowid, protein),
+        )
+    conn.commit()
+    conn.close()
+    return orders_db, tmp_path / "archive"
+
+
+def test_rollover_moves_old_orders_into_monthly_files(archived_db):
+    db_path, archive_dir = archived_db
+
+    stats = rollover_orders(str(db_path), str(archive_dir), older_than_days=30, now=datetime(2025, 6, 15))
+
+    assert stats == {"orders": 2, "items": 2, "months": 2}
+    assert [month for month, _ in list_archives(str(archive_dir))] == ["2025-02", "2025-01"]
+
+    conn = sqlite3.connect(db_path)
+    assert conn.execute("SELECT order_number FROM orders").fetchall() == [("20250601-001",)]
+    assert conn.execute("SELECT COUNT(*) FROM order_items").fetchone()[0] == 1
+    conn.close()
+
+    # Re-running is a no-op
+    assert rollover_orders(str(db_path), str(archive_dir), older_than_days=30, now=datetime(2025, 6, 15))["orders"] == 0
+
+
+def test_history_lookups_fall_back_to_archives(archived_db, monkeypatch):
+    db_path, archive_dir = archived_db
+    monkeypatch.setattr(server_module, "CALLER_HISTORY_MONTHS", 0)
+    rollover_orders(str(db_path), str(archive_dir), older_than_days=30, now=datetime(2025, 6, 15))
+
+    payload = {"message": {"call": {"id": "archive-lookup", "customer": {"number": "0412345678"}}}}
+    with app.test_request_context(json=payload):
+        repeat = tool_repeat_last_order({"phoneNumber": "0412345678"})
+        assert repeat["ok"] is True
+        assert session_get("cart")[0]["protein"] == "chicken"
+
+        context = tool_get_caller_smart_context({})
+        assert context["isReturningCustomer"] is True
+        assert context["orderCount"] == 2
+        assert [o["orderNumber"] for o in context["orderHistory"]] == ["20250214-001", "20250110-001"]
+
+
+def test_history_lookback_stops_at_older_archives(archived_db, monkeypatch):
+    db_path, archive_dir = archived_db
+    rollover_orders(str(db_path), str(archive_dir), older_than_days=30, now=datetime(2025, 6, 15))
+
+    assert months_back(4, datetime(2025, 6, 15)) == "2025-02"
+    assert months_back(6, datetime(2025, 3, 1)) == "2024-09"
+    conn = sqlite3.connect(db_path)
+    attached = []
+    conn.set_trace_callback(lambda sql: attached.append(sql) if sql.startswith("ATTACH") else None)
+    rows = list(iter_archived_rows(conn, str(archive_dir), "SELECT order_number FROM arc.orders", since="2025-02"))
+    conn.close()
+    assert rows == [("20250214-001",)] and len(attached) == 1
+
+    # Archives from before the lookback aren't searched for a caller's history
+    monkeypatch.setattr(server_module, "CALLER_HISTORY_MONTHS", 1)
+    SESSIONS.pop("0412345678", None)
+    payload = {"message": {"call": {"id": "archive-lookback", "customer": {"number": "0412345678"}}}}
+    with app.test_request_context(json=payload):
+        assert tool_get_caller_smart_context({})["isReturningCustomer"] is False
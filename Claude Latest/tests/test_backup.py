@@ -0,0 +1,121 @@
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from kebabalab import server as server_module
+from kebabalab.backup import BackupError, BackupScheduler, backup_database, list_backups, verify_backup
+from kebabalab.server import main
+
+
+@pytest.fixture
+def busy_db(orders_db, tmp_path, monkeypatch):
+    monkeypatch.setattr(server_module, "BACKUP_DIR", str(tmp_path / "backups"))
+    conn = sqlite3.connect(orders_db)
+    conn.executemany(
+        "INSERT INTO orders (order_number, customer_name, customer_phone, cart_json, subtotal, gst, total)"
+        " VALUES (?, 'Sam', '0400000000', ?, 10, 1, 11)",
+        [(f"20250101-{n:04d}", "x" * 500) for n in range(2000)],
+    )
+    conn.commit()
+    conn.close()
+    return orders_db
+
+
+def _order_count(path):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("SELECT COUNT(*) FROM orders").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_backup_copies_in_steps_and_verifies(busy_db, tmp_path):
+    stats = backup_database(str(busy_db), str(tmp_path / "backups"), pages_per_step=16, step_pause=0)
+
+    assert os.path.basename(stats["path"]).startswith("orders-backup-")
+    assert stats["verified"] and stats["steps"] > 1
+    assert stats["pages"] > 16 and stats["pages_per_second"] > 0
+    assert _order_count(stats["path"]) == 2000
+    assert not [name for name in os.listdir(tmp_path / "backups") if name.endswith(".part")]
+
+
+def test_writers_are_not_blocked_during_backup(busy_db, tmp_path):
+    inserted = []
+    done = threading.Event()
+
+    def writer():
+        conn = sqlite3.connect(busy_db, timeout=1.0)
+        n = 0
+        while not done.is_set():
+            conn.execute(
+                "INSERT INTO orders (order_number, customer_name, customer_phone, cart_json, subtotal, gst, total)"
+                " VALUES (?, 'Jo', '0400000001', '[]', 1, 0.1, 1.1)",
+                (f"live-{n}",),
+            )
+            conn.commit()
+            inserted.append(n)
+            n += 1
+            time.sleep(0.001)
+        conn.close()
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    try:
+        stats = backup_database(str(busy_db), str(tmp_path / "backups"), pages_per_step=8, step_pause=0.002)
+    finally:
+        done.set()
+        thread.join()
+
+    assert inserted  # no "database is locked" from the writer
+    assert 2000 <= _order_count(stats["path"]) <= 2000 + len(inserted)
+    verify_backup(stats["path"])
+
+
+def test_rotation_keeps_newest(busy_db, tmp_path):
+    backup_dir = str(tmp_path / "backups")
+    start = datetime(2025, 1, 1, 12, 0, 0)
+    for n in range(4):
+        stats = backup_database(str(busy_db), backup_dir, keep=2, step_pause=0, now=start + timedelta(hours=n))
+
+    assert stats["removed"] == 1
+    assert [os.path.basename(path) for path in list_backups(backup_dir)] == [
+        "orders-backup-20250101-150000.db",
+        "orders-backup-20250101-140000.db",
+    ]
+
+
+def test_failed_verification_leaves_no_snapshot(tmp_path):
+    not_a_db = tmp_path / "orders.db"
+    not_a_db.write_bytes(b"this is not sqlite" * 100)
+    with pytest.raises(BackupError):
+        backup_database(str(not_a_db), str(tmp_path / "backups"), step_pause=0)
+    assert [name for name in os.listdir(tmp_path / "backups") if not name.startswith(".")] == []
+
+
+def test_scheduler_skips_when_a_recent_snapshot_exists(tmp_path):
+    backup_dir = str(tmp_path / "backups")
+    runs = []
+    scheduler = BackupScheduler(backup_dir, interval=3600, run=lambda: runs.append(1))
+
+    assert scheduler.run_if_due()
+    os.makedirs(backup_dir, exist_ok=True)
+    (tmp_path / "backups" / "orders-backup-20250101-120000.db").write_bytes(b"")
+    assert not scheduler.run_if_due()
+    assert runs == [1]
+
+
+def test_run_backup_records_metrics_and_cli(busy_db, tmp_path, capsys):
+    server_module.METRICS.reset()
+    server_module.run_backup()
+    snapshot = server_module.METRICS.snapshot()
+    assert snapshot["counters"]["backups_total"] == 1
+    assert snapshot["gauges"]["backup_pages"] > 0
+
+    target = tmp_path / "cli-backups"
+    assert main(["backup", "--backup-dir", str(target)]) == 0
+    assert "pages/s" in capsys.readouterr().out
+    assert len(list_backups(str(target))) == 1
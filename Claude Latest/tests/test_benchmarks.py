@@ -0,0 +1,39 @@
+import importlib.util
+import os
+
+_SPEC = importlib.util.spec_from_file_location(
+    "bench", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks", "bench.py")
+)
+bench = importlib.util.module_from_spec(_SPEC)
+_SPEC.loader.exec_module(bench)
+
+
+def test_compare_flags_regressions_over_threshold():
+    baseline = {"results": {"a": {"median_us": 100.0}, "b": {"median_us": 100.0}, "c": {"median_us": 100.0}}}
+    current = {"results": {"a": {"median_us": 109.0}, "b": {"median_us": 125.0}, "c": {"median_us": 60.0},
+                           "d": {"median_us": 5.0}}}
+
+    rows = {row["name"]: row for row in bench.compare(current, baseline, threshold=10)}
+
+    assert rows["a"]["regressed"] is False
+    assert rows["b"]["regressed"] is True and rows["b"]["change_pct"] == 25.0
+    assert rows["c"]["regressed"] is False and rows["c"]["change_pct"] == -40.0
+    assert rows["d"]["baseline_us"] is None and rows["d"]["regressed"] is False
+
+
+def test_benchmarks_run_and_save_baseline(tmp_path):
+    path = tmp_path / "baseline.json"
+    code = bench.main(["--filter", "parse_size", "--repeat", "2", "--min-time", "0.001", "--save", str(path)])
+    assert code == 0
+    assert path.exists()
+
+    # Comparing a run with itself never trips a generous threshold
+    assert bench.main(["--filter", "parse_size", "--repeat", "2", "--min-time", "0.001",
+                       "--compare", str(path), "--threshold", "1000"]) == 0
+
+
+def test_session_and_webhook_benchmarks_run():
+    report = bench.run_benchmarks(name_filter="memory", repeat=1, min_time=0.0)
+    assert set(report["results"]) == {"session_get_memory", "session_set_memory"}
+    report = bench.run_benchmarks(name_filter="webhook", repeat=1, min_time=0.0)
+    assert all(result["median_us"] > 0 for result in report["results"].values())
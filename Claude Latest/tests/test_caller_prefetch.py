@@ -0,0 +1,71 @@
+import json
+import sqlite3
+
+import pytest
+
+from kebabalab import server as server_module
+from kebabalab.metrics import METRICS
+from kebabalab.server import SESSIONS, app, stop_deferred
+
+CALLER = "+61400000055"
+
+
+@pytest.fixture
+def caller_db(orders_db, monkeypatch):
+    monkeypatch.setattr(server_module, "CALLER_PREFETCH", True)
+    cart = [{"category": "kebabs", "size": "large", "protein": "lamb", "quantity": 1, "price": 15.0}]
+    with sqlite3.connect(orders_db) as conn:
+        conn.execute(
+            "INSERT INTO orders (order_number, customer_name, customer_phone, customer_key, cart_json, subtotal, gst,"
+            " total, ready_at, notes, status)"
+            " VALUES ('20250101-001', 'Sam', '0400000055', ?, ?, 15.0, 1.36, 15.0, '', '', 'completed')",
+            (CALLER, json.dumps(cart)),
+        )
+    SESSIONS.pop(CALLER, None)
+    METRICS.reset()
+    yield orders_db
+    stop_deferred()
+    SESSIONS.pop(CALLER, None)
+
+
+def _post(call_id, tool=None, **args):
+    message = {"type": "status-update", "call": {"id": call_id, "customer": {"number": CALLER}}}
+    if tool:
+        message.update(
+            type="tool-calls",
+            toolCalls=[{"id": "t1", "function": {"name": tool, "arguments": json.dumps(args)}}],
+        )
+    data = app.test_client().post("/webhook", json={"message": message}).get_json()
+    return data["results"][0]["result"] if tool else data
+
+
+def test_call_start_prefetches_history_for_both_tools(caller_db, monkeypatch):
+    _post("call-1")
+    _post("call-1")  # later messages of the same call don't fetch again
+    stop_deferred()
+    assert METRICS.get("deferred_tasks_total", task="_prefetch_caller_history") == 1
+    assert SESSIONS[CALLER]["caller_history"]["callId"] == "call-1"
+
+    def no_database(*args, **kwargs):
+        raise AssertionError("should have been answered from the session")
+
+    monkeypatch.setattr(server_module, "_fetch_caller_orders", no_database)
+    context = _post("call-1", "getCallerSmartContext")
+    assert context["isReturningCustomer"] is True and context["orderCount"] == 1
+    repeated = _post("call-1", "repeatLastOrder", phoneNumber=CALLER)
+    assert repeated["ok"] is True and repeated["lastTotal"] == 15.0
+    assert METRICS.get("caller_history_lookups_total", source="session") == 2
+
+
+def test_history_falls_back_to_the_database(caller_db, monkeypatch):
+    monkeypatch.setattr(server_module, "CALLER_PREFETCH", False)
+    assert _post("call-2", "getCallerSmartContext")["orderCount"] == 1
+    assert METRICS.get("caller_history_lookups_total", source="database") == 1
+
+    # A different number than the caller's is looked up, not answered from their history
+    assert _post("call-2", "repeatLastOrder", phoneNumber="0499999999")["ok"] is False
+    assert METRICS.get("caller_history_lookups_total", source="database") == 2
+
+    # ... and doesn't replace it
+    assert _post("call-2", "getCallerSmartContext")["orderCount"] == 1
+    assert METRICS.get("caller_history_lookups_total", source="session") == 1
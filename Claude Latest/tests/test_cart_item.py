@@ -0,0 +1,135 @@
+import json
+import sqlite3
+
+import pytest
+
+from kebabalab import server as server_module
+from kebabalab.cart import CartItem, copy_cart, decode_cart, dumps_cart, encode_cart, loads_cart
+from kebabalab.server import app, session_get, session_set
+
+KEBAB = {
+    "category": "kebabs",
+    "name": "Large Lamb Kebab",
+    "size": "large",
+    "protein": "lamb",
+    "salads": ["lettuce", "tomato", "onion"],
+    "sauces": ["garlic", "chilli"],
+    "extras": [],
+    "quantity": 2,
+    "is_combo": False,
+    "cheese": True,
+    "price": 18.0,
+}
+COMBO = {
+    "category": "kebabs",
+    "name": "Small Chicken Kebab Combo",
+    "size": "small",
+    "protein": "chicken",
+    "salads": [],
+    "sauces": ["bbq"],
+    "extras": ["halloumi"],
+    "quantity": 1,
+    "is_combo": True,
+    "cheese": False,
+    "price": 19.5,
+    "chips_size": "small",
+    "chips_salt": "chicken",
+    "drink_brand": "coke",
+}
+DRINK = {"category": "drinks", "name": "Coke", "quantity": 3, "price": 3.5}
+
+
+def test_wire_round_trip_is_lossless():
+    for item in (KEBAB, COMBO, DRINK, {}):
+        wire = CartItem.from_dict(item).to_wire()
+        restored = CartItem.from_wire(json.loads(json.dumps(wire))).to_dict()
+        assert restored == item
+        assert list(restored) == list(item)
+
+
+def test_unknown_keys_and_none_values_survive():
+    item = dict(DRINK, size=None, note="no ice", combo_parts={"chips": "large"})
+    restored = loads_cart(dumps_cart([item]))[0]
+    assert restored == item
+    assert "protein" not in restored  # absent stays absent, not None
+
+
+def test_decode_reads_legacy_dict_carts():
+    legacy = json.dumps([KEBAB, DRINK])
+    assert loads_cart(legacy) == [KEBAB, DRINK]
+    assert decode_cart(encode_cart([KEBAB]) + [DRINK]) == [KEBAB, DRINK]
+    assert loads_cart(None) == []
+    assert decode_cart("not a cart") == "not a cart"
+
+
+def test_compact_encoding_is_smaller():
+    cart = [KEBAB, COMBO, DRINK]
+    assert len(dumps_cart(cart)) < 0.6 * len(json.dumps(cart))
+
+
+def test_copy_cart_is_independent():
+    cart = [KEBAB, COMBO]
+    copied = copy_cart(cart)
+    assert copied == cart
+    copied[0]["salads"].append("pickles")
+    copied[1]["quantity"] = 5
+    assert KEBAB["salads"] == ["lettuce", "tomato", "onion"]
+    assert COMBO["quantity"] == 1
+
+
+def test_redis_sessions_store_carts_compactly(monkeypatch):
+    fakeredis = pytest.importorskip("fakeredis")
+    client = fakeredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(server_module, "get_redis_client", lambda: client)
+
+    with app.test_request_context(json={"message": {"call": {"id": "cart-wire"}}}):
+        session_set("cart", [KEBAB, DRINK])
+        session_set("customer", {"name": "Sam"})
+
+        stored = json.loads(client.get("session:cart-wire:cart"))
+        assert all(isinstance(entry, list) for entry in stored)
+        assert session_get("cart") == [KEBAB, DRINK]
+        assert session_get("customer") == {"name": "Sam"}
+
+        # Carts written before the compact format still load
+        client.set("session:cart-wire:last_order_cart", json.dumps([COMBO]))
+        assert session_get("last_order_cart") == [COMBO]
+
+
+def test_orders_keep_plain_cart_json(orders_db):
+    conn = sqlite3.connect(orders_db)
+    conn.executemany(
+        "INSERT INTO orders (order_number, customer_name, customer_phone, cart_json, subtotal, gst, total)"
+        " VALUES (?, 'Sam', '0400000000', ?, 0, 0, 0)",
+        [("20250101-001", dumps_cart([KEBAB])), ("20250101-002", json.dumps([DRINK]))],
+    )
+    conn.commit()
+
+    # A row an earlier build wrote compactly is rewritten as item dicts at startup
+    server_module.init_database()
+    stored = dict(conn.execute("SELECT order_number, cart_json FROM orders").fetchall())
+    conn.close()
+    assert {number: json.loads(text) for number, text in stored.items()} == {
+        "20250101-001": [KEBAB], "20250101-002": [DRINK],
+    }
+
+    pending = {number: cart for number, cart, _ in server_module.load_pending_orders(str(orders_db))}
+    assert pending == {"20250101-001": [KEBAB], "20250101-002": [DRINK]}
+
+
+def test_new_orders_store_item_dicts(orders_db):
+    def call(tool, **args):
+        message = {
+            "type": "tool-calls",
+            "toolCalls": [{"id": "t1", "function": {"name": tool, "arguments": json.dumps(args)}}],
+            "call": {"id": "cart-json", "customer": {"number": "+61400000037"}},
+        }
+        return app.test_client().post("/webhook", json={"message": message}).get_json()["results"][0]["result"]
+
+    call("quickAddItem", description="large lamb kebab with garlic")
+    call("setPickupTime", requestedTime="in 30 minutes")
+    assert call("createOrder", customerName="Sam", customerPhone="0412345678")["ok"] is True
+
+    (cart_json,) = sqlite3.connect(orders_db).execute("SELECT cart_json FROM orders").fetchone()
+    (item,) = json.loads(cart_json)
+    assert item["protein"] == "lamb" and item["size"] == "large"
@@ -78,7 +78,7 @@ def test_cart_modifications():
     call_tool("addItemToCart")
 
     # Check cart
-    cart_result = call_tool("getCartState")
+    cart_result = call_tool("getCartState", {"verbosity": "full"})
     cart = cart_result.get("cart", [])
     print(f"  {Colors.GREEN}✓{Colors.RESET} Cart has {len(cart)} items")
 
@@ -87,7 +87,8 @@ def test_cart_modifications():
     result = call_tool("editCartItem", {
         "itemIndex": 0,
         "field": "salads",
-        "value": json.dumps(["lettuce", "tomato"])
+        "value": json.dumps(["lettuce", "tomato"]),
+        "verbosity": "full",
     })
 
     if result.get("ok"):
@@ -105,7 +106,8 @@ def test_cart_modifications():
     result = call_tool("editCartItem", {
         "itemIndex": 2,
         "field": "salt_type",
-        "value": "none"
+        "value": "none",
+        "verbosity": "full",
     })
 
     if result.get("ok"):
@@ -132,7 +134,7 @@ def test_cart_modifications():
         print(f"  {Colors.RED}✗ FAIL{Colors.RESET} - Error: {result.get('error')}")
 
     # Verify cart state
-    cart_result = call_tool("getCartState")
+    cart_result = call_tool("getCartState", {"verbosity": "full"})
     cart = cart_result.get("cart", [])
     print(f"  Cart now has: {len(cart)} items")
     for i, item in enumerate(cart):
@@ -148,7 +150,7 @@ def test_cart_modifications():
         print(f"  {Colors.GREEN}✓ PASS{Colors.RESET} - Cleared {items_cleared} items")
 
         # Verify cart is empty
-        cart_result = call_tool("getCartState")
+        cart_result = call_tool("getCartState", {"verbosity": "full"})
         cart = cart_result.get("cart", [])
         if len(cart) == 0:
             print(f"  {Colors.GREEN}✓ PASS{Colors.RESET} - Cart is now empty")
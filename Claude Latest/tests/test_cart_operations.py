@@ -0,0 +1,106 @@
+import pytest
+
+from kebabalab import server as server_module
+from kebabalab.server import (
+    TOOLS,
+    app,
+    session_batch,
+    session_get,
+    session_set,
+    tool_apply_cart_operations,
+    tool_quick_add_item,
+)
+
+
+def _call(session_id):
+    return app.test_request_context(json={"message": {"call": {"id": session_id}}})
+
+
+@pytest.fixture
+def memory_sessions(monkeypatch):
+    monkeypatch.setattr(server_module, "get_redis_client", lambda: None)
+
+
+def test_operations_apply_in_order_and_return_priced_cart(memory_sessions):
+    with _call("ops-ok"):
+        session_set("cart", [])
+        tool_quick_add_item({"description": "small lamb kebab with garlic sauce"})
+        tool_quick_add_item({"description": "small chips"})
+
+        result = tool_apply_cart_operations({"operations": [
+            {"op": "removeCartItem", "itemIndex": 1},
+            {"op": "editCartItem", "itemIndex": 0, "modifications": {"size": "large"}},
+            {"op": "quickAddItem", "description": "2 cokes"},
+        ]})
+
+        assert result["ok"] is True, result
+        assert result["applied"] == 3
+        assert [item["category"] for item in result["cart"]] == ["kebabs", "drinks"]
+        assert result["cart"][0]["size"] == "large"
+        assert result["total"] == pytest.approx(sum(i["price"] * i["quantity"] for i in result["cart"]))
+        assert session_get("cart") == result["cart"]
+        assert session_get("cart_priced") is True
+        assert session_get("last_total") == result["total"]
+
+
+def test_failed_operation_leaves_session_untouched(memory_sessions):
+    with _call("ops-fail"):
+        session_set("cart", [])
+        tool_quick_add_item({"description": "small lamb kebab"})
+        before = session_get("cart")
+        snapshot = [dict(item) for item in before]
+
+        result = tool_apply_cart_operations({"operations": [
+            {"op": "editCartItem", "itemIndex": 0, "modifications": {"size": "large"}},
+            {"op": "removeCartItem", "itemIndex": 5},
+        ]})
+
+        assert result["ok"] is False
+        assert result["failedOperation"] == 1
+        assert result["cartUnchanged"] is True
+        assert session_get("cart") == snapshot
+
+
+def test_rejects_unknown_ops_and_empty_lists(memory_sessions):
+    with _call("ops-bad"):
+        assert tool_apply_cart_operations({})["ok"] is False
+        result = tool_apply_cart_operations({"operations": [{"op": "createOrder"}]})
+        assert result["ok"] is False
+        assert "unknown op" in result["error"]
+    assert TOOLS["applyCartOperations"] is tool_apply_cart_operations
+
+
+def test_redis_batch_reads_once_and_writes_in_one_pipeline(monkeypatch):
+    fakeredis = pytest.importorskip("fakeredis")
+    client = fakeredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(server_module, "get_redis_client", lambda: client)
+
+    with _call("ops-redis"):
+        session_set("cart", [])
+        tool_quick_add_item({"description": "small chicken hsp"})
+
+        calls = []
+        original_get = client.get
+        monkeypatch.setattr(client, "get", lambda key: calls.append(key) or original_get(key))
+
+        result = tool_apply_cart_operations({"operations": [
+            {"op": "quickAddItem", "description": "coke"},
+            {"op": "editCartItem", "itemIndex": 0, "modifications": {"size": "large"}},
+        ]})
+
+        assert result["ok"] is True, result
+        assert calls == []  # everything came from the single MGET
+        monkeypatch.setattr(client, "get", original_get)
+        assert [item["category"] for item in session_get("cart")] == ["hsp", "drinks"]
+
+
+def test_batch_discarded_on_exception(memory_sessions):
+    with _call("ops-raise"):
+        session_set("cart", [{"category": "drinks", "name": "Coke", "quantity": 1, "price": 3.5}])
+        with pytest.raises(RuntimeError):
+            with session_batch(("cart",)):
+                session_get("cart").append({"category": "drinks"})
+                session_set("cart_priced", True)
+                raise RuntimeError("boom")
+        assert len(session_get("cart")) == 1
+        assert session_get("cart_priced") is None
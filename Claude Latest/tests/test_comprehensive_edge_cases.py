@@ -205,7 +205,7 @@ class ComprehensiveTestSuite:
             self.call_tool("addItemToCart")
 
         # Get cart state
-        resp = self.call_tool("getCartState")
+        resp = self.call_tool("getCartState", {"verbosity": "full"})
         assert resp["ok"], "Failed to get cart state"
 
         # Should have: 3 kebabs + 2 HSP + 2 chips = 7 items
@@ -760,7 +760,7 @@ class ComprehensiveTestSuite:
             self.call_tool("addItemToCart")
 
         # Get both views
-        resp1 = self.call_tool("getCartState")
+        resp1 = self.call_tool("getCartState", {"verbosity": "full"})
         resp2 = self.call_tool("getDetailedCart")
 
         assert resp1["ok"] and resp2["ok"], "Failed to get cart states"
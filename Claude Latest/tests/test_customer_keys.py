@@ -0,0 +1,156 @@
+import json
+import shutil
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+from kebabalab import server as server_module
+from kebabalab.archive import list_archives, rollover_orders
+from kebabalab.phones import customer_key
+from kebabalab.server import SESSIONS, app, backfill_customer_keys, init_database, main
+from kebabalab.tenants import TenantRegistry, TenantSpec
+
+ROOT = Path(__file__).resolve().parents[1]
+
+LEGACY_SCHEMA = """
+    CREATE TABLE orders (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        order_number TEXT UNIQUE NOT NULL,
+        customer_name TEXT NOT NULL,
+        customer_phone TEXT NOT NULL,
+        cart_json TEXT NOT NULL,
+        subtotal REAL NOT NULL,
+        gst REAL NOT NULL,
+        total REAL NOT NULL,
+        ready_at TEXT,
+        notes TEXT,
+        status TEXT DEFAULT 'pending',
+        created_at TEXT DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+
+@pytest.mark.parametrize("phone", [
+    "0412345678", "0412 345 678", "+61412345678", "61412345678", "+61 0412 345 678", "0061 412 345 678",
+])
+def test_every_spelling_of_a_number_gets_one_key(phone):
+    assert customer_key(phone) == "+61412345678"
+
+
+def test_numbers_that_are_not_phones_have_no_key():
+    assert customer_key("(03) 9770 4755") == "+61397704755"
+    assert customer_key("+1 415 555 2671") == "+14155552671"
+    for phone in ("unknown", "anonymous", "", None, "12345"):
+        assert customer_key(phone) is None
+
+
+def _legacy_orders(db_file, rows):
+    conn = sqlite3.connect(db_file)
+    conn.execute(LEGACY_SCHEMA)
+    conn.executemany(
+        "INSERT INTO orders (order_number, customer_name, customer_phone, cart_json, subtotal, gst, total, created_at)"
+        " VALUES (?, 'Sam', ?, '[]', 10, 0.91, 10, ?)",
+        rows,
+    )
+    conn.commit()
+    conn.close()
+
+
+def _call(tool, caller, **args):
+    message = {
+        "type": "tool-calls",
+        "toolCalls": [{"id": "t1", "function": {"name": tool, "arguments": json.dumps(args)}}],
+        "call": {"id": f"call-{caller}", "customer": {"number": caller}},
+    }
+    response = app.test_client().post("/webhook", json={"message": message})
+    return response.get_json()["results"][0]["result"]
+
+
+def test_returning_caller_is_recognised_from_their_carrier_number(orders_db):
+    caller = "+61412345670"
+    _call("clearCart", caller)
+    _call("quickAddItem", caller, description="small lamb kebab")
+    _call("setPickupTime", caller, requestedTime="in 20 minutes")
+    # The customer reads their number out in local form
+    assert _call("createOrder", caller, customerName="Sam", customerPhone="0412 345 670")["ok"] is True
+
+    context = _call("getCallerSmartContext", caller)
+    assert context["isReturningCustomer"] is True and context["orderCount"] == 1
+
+
+def test_history_query_is_an_index_range(orders_db):
+    conn = sqlite3.connect(orders_db)
+    plan = " ".join(row[3] for row in conn.execute(
+        "EXPLAIN QUERY PLAN SELECT order_number, cart_json, total, created_at FROM orders "
+        "WHERE customer_key = ? ORDER BY created_at DESC LIMIT 5",
+        ("+61412345678",),
+    ))
+    assert "USING INDEX idx_customer_key (customer_key=?)" in plan
+    assert "TEMP B-TREE" not in plan  # no sort: the index is already in created_at order
+
+
+def test_backfill_keys_legacy_orders_and_archives(orders_db_file, capsys, monkeypatch):
+    monkeypatch.setattr(server_module, "CALLER_HISTORY_MONTHS", 0)  # the 2025 archives are past the lookback
+    _legacy_orders(orders_db_file, [
+        ("20250110-001", "0412345678", "2025-01-10 09:00:00"),
+        ("20250601-001", "61412345678", "2025-06-01 09:00:00"),
+        ("20250602-001", "unknown", "2025-06-02 09:00:00"),
+    ])
+    # January was archived before the column existed
+    rollover_orders(orders_db_file, server_module.ARCHIVE_DIR, older_than_days=30, now=datetime(2025, 6, 15))
+
+    init_database()
+    stats = backfill_customer_keys(batch_size=1)
+    assert stats == {"orders": 2, "unkeyed": 1, "batches": 3, "archives": 1}
+
+    hot = sqlite3.connect(orders_db_file).execute("SELECT customer_phone, customer_key FROM orders ORDER BY id")
+    assert hot.fetchall() == [("61412345678", "+61412345678"), ("unknown", None)]
+    [(_, archive)] = list_archives(server_module.ARCHIVE_DIR)
+    archived = sqlite3.connect(archive).execute("SELECT customer_key FROM orders").fetchall()
+    assert archived == [("+61412345678",)]
+
+    context = _call("getCallerSmartContext", "+61 412 345 678")
+    assert context["orderCount"] == 2
+
+    assert main(["backfill-customer-keys"]) == 0
+    assert "Keyed 0 orders" in capsys.readouterr().out
+
+
+def test_archives_made_before_the_column_are_upgraded_at_startup(orders_db_file, monkeypatch):
+    monkeypatch.setattr(server_module, "CALLER_HISTORY_MONTHS", 0)  # the 2025 archives are past the lookback
+    _legacy_orders(orders_db_file, [("20250110-001", "0412345678", "2025-01-10 09:00:00")])
+    rollover_orders(orders_db_file, server_module.ARCHIVE_DIR, older_than_days=30, now=datetime(2025, 6, 15))
+
+    init_database()  # no backfill yet
+    [(_, archive)] = list_archives(server_module.ARCHIVE_DIR)
+    columns = {row[1] for row in sqlite3.connect(archive).execute("PRAGMA table_info(orders)")}
+    assert "customer_key" in columns
+
+    # Lookups reach the archive without failing; its orders are found once they are keyed
+    context = _call("getCallerSmartContext", "+61412345678")
+    assert context["ok"] is True and context["isReturningCustomer"] is False
+    backfill_customer_keys()
+    SESSIONS.pop("+61412345678", None)  # the first lookup's answer is kept for the call
+    assert _call("getCallerSmartContext", "+61412345678")["orderCount"] == 1
+
+
+def test_backfill_covers_every_tenant(orders_db, tmp_path, monkeypatch, capsys):
+    data_dir = tmp_path / "burgers"
+    data_dir.mkdir()
+    shutil.copy(ROOT / "data" / "menu.json", data_dir / "menu.json")
+    (data_dir / "business.json").write_text(json.dumps({"business_details": {"name": "Burger Barn"}}))
+    _legacy_orders(str(data_dir / "orders.db"), [("20250601-001", "0412345678", "2025-06-01 09:00:00")])
+    registry = TenantRegistry(
+        [TenantSpec({"id": "burgers", "data_dir": str(data_dir)}, str(tmp_path))],
+        on_load=server_module._prepare_tenant,
+    )
+    monkeypatch.setattr(server_module, "TENANTS", registry)
+    monkeypatch.setattr(server_module, "_TENANTS_LOADED", True)
+
+    assert main(["backfill-customer-keys"]) == 0
+    out = capsys.readouterr().out
+    assert "the default shop's database" in out and "Keyed 1 orders" in out and "tenant 'burgers'" in out
+    keys = sqlite3.connect(data_dir / "orders.db").execute("SELECT customer_key FROM orders").fetchall()
+    assert keys == [("+61412345678",)]
@@ -0,0 +1,135 @@
+import json
+import sqlite3
+import time
+
+import pytest
+
+from kebabalab import server as server_module
+from kebabalab.deadline import (
+    Deadline, DeadlineExceeded, current_deadline, deadline_scope, parse_budgets, time_left,
+)
+from kebabalab.metrics import METRICS
+from kebabalab.server import _queue_sms, _session_read, app, stop_deferred
+
+
+@pytest.fixture(autouse=True)
+def _fresh_metrics():
+    METRICS.reset()
+
+
+def _call(tool, **args):
+    message = {
+        "type": "tool-calls",
+        "toolCalls": [{"id": "t1", "function": {"name": tool, "arguments": json.dumps(args)}}],
+        "call": {"id": "deadline-call", "customer": {"number": "+61400000099"}},
+    }
+    response = app.test_client().post("/webhook", json={"message": message})
+    return response.get_json()["results"][0]["result"]
+
+
+def test_layers_get_what_is_left():
+    assert time_left(10) == 10
+    with deadline_scope(Deadline(0.5)) as deadline:
+        assert current_deadline() is deadline
+        assert 0.4 < time_left(10) <= 0.5
+        assert deadline.within(5) is deadline and deadline.within(0.1).budget == 0.1
+    assert current_deadline() is None
+
+    with deadline_scope(Deadline(0)):
+        assert time_left(10) == 0.01
+        with pytest.raises(DeadlineExceeded):
+            _session_read("deadline-call", "cart")
+
+    assert parse_budgets("createOrder=10, bogus, sendReceipt=0") == {"createOrder": 10.0}
+
+
+def test_a_locked_database_answers_before_the_caller_gives_up(orders_db, monkeypatch):
+    monkeypatch.setattr(server_module, "TOOL_BUDGETS", {"createOrder": 0.5})
+    _call("clearCart")
+    _call("quickAddItem", description="small chicken kebab")
+    _call("setPickupTime", requestedTime="in 30 minutes")
+
+    blocker = sqlite3.connect(orders_db)
+    blocker.execute("BEGIN IMMEDIATE")
+    try:
+        started = time.monotonic()
+        result = _call("createOrder", customerName="Sam", customerPhone="0412345678")
+        elapsed = time.monotonic() - started
+    finally:
+        blocker.rollback()
+        blocker.close()
+
+    assert result["ok"] is False and result["timedOut"] is True
+    assert elapsed < 2  # not SQLITE_BUSY_TIMEOUT's 10 seconds
+    assert METRICS.get("tool_deadline_exceeded_total", tool="createOrder") == 1
+
+    # Nothing was lost: the cart is still there to try again
+    assert _call("createOrder", customerName="Sam", customerPhone="0412345678")["ok"] is True
+
+
+def test_an_order_committed_as_time_runs_out_is_still_confirmed(orders_db, monkeypatch):
+    monkeypatch.setattr(server_module, "TOOL_BUDGETS", {"createOrder": 0.3})
+    monkeypatch.setattr(server_module, "KITCHEN_RESYNC_SECONDS", 0)  # the kitchen resyncs through the database
+    insert_order_items = server_module.insert_order_items
+
+    def slow_insert(*args):
+        insert_order_items(*args)
+        time.sleep(0.4)
+
+    monkeypatch.setattr(server_module, "insert_order_items", slow_insert)
+    _call("clearCart")
+    _call("quickAddItem", description="small chicken kebab")
+    _call("setPickupTime", requestedTime="in 30 minutes")
+
+    result = _call("createOrder", customerName="Sam", customerPhone="0412345678")
+    assert result["ok"] is True and "timedOut" not in result
+    assert METRICS.get("tool_deadline_exceeded_total", tool="createOrder") == 0
+    assert sqlite3.connect(orders_db).execute("SELECT COUNT(*) FROM orders").fetchone() == (1,)
+
+    # The cart went with the order, so there's nothing to place twice
+    assert _call("createOrder", customerName="Sam", customerPhone="0412345678")["ok"] is False
+    assert sqlite3.connect(orders_db).execute("SELECT COUNT(*) FROM orders").fetchone() == (1,)
+
+
+def test_inline_sms_is_deferred_when_time_is_short(monkeypatch):
+    sent = []
+
+    def slow_send(phone, body):
+        time.sleep(0.2)
+        sent.append((phone, body, current_deadline()))
+        return True, None
+
+    monkeypatch.setattr(server_module, "NOTIFIER", None)
+    monkeypatch.setattr(server_module, "_get_twilio_transport", lambda: object())
+    monkeypatch.setattr(server_module, "_send_sms", slow_send)
+
+    with deadline_scope(Deadline(30)) as deadline:
+        assert _queue_sms("0412345678", "plenty of time") == (True, None)
+    assert sent == [("0412345678", "plenty of time", deadline)]  # sent inline
+
+    with deadline_scope(Deadline(1)):
+        started = time.monotonic()
+        assert _queue_sms("0412345678", "sent later") == (True, None)
+        assert time.monotonic() - started < 0.1
+    assert len(sent) == 1
+    stop_deferred()  # waits for it
+    assert sent[-1] == ("0412345678", "sent later", None)  # outside the caller's deadline
+
+
+def test_only_timeouts_are_reported_as_timeouts(monkeypatch):
+    def slow(outcome):
+        def tool(arguments):
+            time.sleep(0.1)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+        return tool
+
+    monkeypatch.setattr(server_module, "TOOL_BUDGETS", {"slowEmpty": 0.05, "slowLocked": 0.05})
+    monkeypatch.setitem(server_module.TOOLS, "slowEmpty", slow({"ok": False, "error": "Cart is empty"}))
+    monkeypatch.setitem(server_module.TOOLS, "slowLocked", slow(sqlite3.OperationalError("database is locked")))
+
+    # A real answer is passed on even when it arrives late
+    assert _call("slowEmpty") == {"ok": False, "error": "Cart is empty"}
+    assert _call("slowLocked")["timedOut"] is True
+    assert METRICS.get("tool_deadline_exceeded_total", tool="slowEmpty") == 0
@@ -0,0 +1,98 @@
+import sqlite3
+
+import pytest
+
+from kebabalab.kitchen import KitchenQueue
+from kebabalab.server import (
+    app,
+    load_pending_orders,
+    session_set,
+    set_order_status,
+    tool_create_order,
+    tool_estimate_ready_time,
+    tool_quick_add_item,
+    tool_set_pickup_time,
+)
+
+KEBAB = {"category": "kebabs", "quantity": 1}
+
+
+def test_estimate_counts_quantities_and_queue():
+    kitchen = KitchenQueue(prep_minutes={"kebabs": 4, "chips": 3}, base_minutes=8, stations=2, min_minutes=0)
+
+    assert kitchen.estimate([KEBAB]).minutes == 10
+    assert kitchen.estimate([dict(KEBAB, quantity=5)]).minutes == 18
+    assert kitchen.estimate([dict(KEBAB, is_combo=True)]).minutes == 12  # meal adds chips
+
+    kitchen.add_order("A", [dict(KEBAB, quantity=10)], expires_at=1000)
+    estimate = kitchen.estimate([KEBAB], now=0)
+    assert estimate.orders_ahead == 1
+    assert estimate.minutes == 30
+
+    assert kitchen.complete_order("A") is True
+    assert kitchen.estimate([KEBAB], now=0).minutes == 10
+
+
+def test_orders_drop_off_after_pickup_time():
+    kitchen = KitchenQueue(base_minutes=8, stations=1, min_minutes=0)
+    kitchen.add_order("A", [KEBAB], expires_at=100)
+    kitchen.add_order("B", [KEBAB], expires_at=200)
+
+    assert kitchen.snapshot(now=150) == (1, 4.0)
+    assert kitchen.snapshot(now=250) == (0, 0.0)
+
+
+def _place_order(call_id, description):
+    with app.test_request_context(json={"message": {"call": {"id": call_id}}}):
+        session_set("cart", [])
+        tool_quick_add_item({"description": description})
+        tool_set_pickup_time({"requestedTime": "in 30 minutes"})
+        return tool_create_order({"customerName": "Sam", "customerPhone": "0412345678"})
+
+
+def test_ready_estimate_tracks_pending_orders(orders_db):
+    def estimate():
+        with app.test_request_context(json={"message": {"call": {"id": "estimator"}}}):
+            session_set("cart", [])
+            tool_quick_add_item({"description": "small lamb kebab"})
+            return tool_estimate_ready_time({})
+
+    idle = estimate()
+    assert idle["ok"] is True
+    assert idle["ordersAhead"] == 0
+
+    orders = [_place_order(f"busy-{n}", "6 large chicken kebabs") for n in range(3)]
+    busy = estimate()
+    assert busy["ordersAhead"] == 3
+    assert busy["estimatedMinutes"] > idle["estimatedMinutes"] + 20
+
+    for order in orders:
+        assert set_order_status(order["orderNumber"], "completed") is True
+    assert estimate()["estimatedMinutes"] == idle["estimatedMinutes"]
+
+    with pytest.raises(ValueError):
+        set_order_status(orders[0]["orderNumber"], "eaten")
+
+
+def test_resync_reads_only_orders_still_queued(orders_db):
+    rows = [
+        ("due", "2030-01-01T12:30:00+11:00", "2030-01-01 01:00:00"),
+        ("picked-up-long-ago", "2020-01-01T12:30:00+11:00", "2020-01-01 01:00:00"),
+        ("no-time-recent", None, "2030-01-01 00:30:00"),
+        ("no-time-stale", "", "2029-12-31 12:00:00"),
+    ]
+    with sqlite3.connect(orders_db) as conn:
+        conn.executemany(
+            "INSERT INTO orders (order_number, customer_name, customer_phone, cart_json, subtotal, gst, total,"
+            " ready_at, created_at) VALUES (?, 'Sam', '0400000000', '[]', 0, 0, 0, ?, ?)",
+            rows,
+        )
+        plan = " ".join(row[3] for row in conn.execute(
+            "EXPLAIN QUERY PLAN SELECT * FROM orders WHERE status = 'pending' AND ready_at >= ''"
+        ))
+    assert "idx_status_ready" in plan
+
+    now = 1893457800.0  # 2030-01-01 00:30 UTC, 11:30 in Melbourne
+    pending = {number: expires_at for number, _, expires_at in load_pending_orders(str(orders_db), now=now)}
+    assert set(pending) == {"due", "no-time-recent"}
+    assert pending["no-time-recent"] == now + 4 * 3600
@@ -0,0 +1,38 @@
+import importlib.util
+import os
+import random
+
+from kebabalab import server as server_module
+
+_SPEC = importlib.util.spec_from_file_location(
+    "load_test", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts", "load_test.py")
+)
+load_test = importlib.util.module_from_spec(_SPEC)
+_SPEC.loader.exec_module(load_test)
+
+
+def test_percentile_is_nearest_rank():
+    values = [float(v) for v in range(1, 101)]
+    assert load_test.percentile(values, 50) == 50.0
+    assert load_test.percentile(values, 99) == 99.0
+    assert load_test.percentile(values, 100) == 100.0
+    assert load_test.percentile([], 95) == 0.0
+
+
+def test_conversation_follows_call_flow():
+    steps = [tool for tool, _ in load_test.build_conversation(random.Random(3), "+61490000001")]
+    assert steps[:2] == ["checkOpen", "getCallerSmartContext"]
+    assert "quickAddItem" in steps
+    assert steps[-2:] == ["createOrder", "endCall"]
+
+
+def test_concurrent_calls_in_process(orders_db, monkeypatch):
+    monkeypatch.setattr(server_module, "SLOT_CAPACITY", 0)
+
+    report = load_test.run_load(load_test.InProcessClient(server_module.app), calls=6, concurrency=3, seed=7)
+
+    assert report["conversations"] == 6
+    assert report["transport_errors"] == 0
+    assert report["orders_created"] == 6
+    assert report["tools"]["createOrder"]["count"] == 6
+    assert report["end_to_end"]["p95_ms"] >= report["end_to_end"]["p50_ms"] > 0
@@ -0,0 +1,85 @@
+import itertools
+import json
+import os
+import shutil
+from pathlib import Path
+
+import pytest
+
+from kebabalab import server as server_module
+from kebabalab.menu_index import (
+    ArtifactError, MenuIndex, artifact_path, compile_menu, load_menu_index, read_artifact,
+)
+from kebabalab.server import main
+
+MENU_FILE = Path(__file__).resolve().parents[1] / "data" / "menu.json"
+
+
+@pytest.fixture
+def menu_file(tmp_path):
+    path = tmp_path / "menu.json"
+    shutil.copy(MENU_FILE, path)
+    return str(path)
+
+
+def test_index_prices_match_a_full_scan():
+    menu = json.loads(MENU_FILE.read_text())
+    indexed = MenuIndex.from_menu(menu)
+    scanning = MenuIndex(menu, {"proteins": {}, "drinks": {}, "chips": {}, "extras": {}})
+
+    grid = itertools.product(
+        list(menu["categories"]) + ["unknown"],
+        ["", "lamb", "Chicken", "mix", "mixed", "falafel", "beef"],
+        ["small", "large", ""],
+        ["", "coke", "sprite", "water", "baklava", "something else"],
+        [[], ["cheese"], ["haloumi", "extra meat"], ["garlic"]],
+    )
+    for category, protein, size, name, extras in grid:
+        item = {"category": category, "protein": protein, "size": size, "name": name, "extras": extras}
+        assert indexed.price(item) == scanning.price(item), item
+
+
+def test_artifact_round_trip(menu_file):
+    stats = compile_menu(menu_file)
+    assert stats["path"] == artifact_path(menu_file) and stats["path"].endswith("menu.compiled")
+
+    for use_mmap in (False, True):
+        compiled, source = load_menu_index(menu_file, use_mmap=use_mmap)
+        assert source == "artifact"
+        assert compiled.menu == json.loads(Path(menu_file).read_text())
+        assert compiled.price({"category": "kebabs", "protein": "lamb", "size": "large"}) == 15.0
+
+
+def test_stale_or_corrupt_artifact_is_rebuilt_from_json(menu_file):
+    compile_menu(menu_file)
+    os.utime(menu_file, ns=(0, 0))  # touched, contents unchanged: still usable
+    assert load_menu_index(menu_file)[1] == "artifact"
+
+    menu = json.loads(Path(menu_file).read_text())
+    menu["categories"]["kebabs"][0]["sizes"]["large"] = 16.0
+    Path(menu_file).write_text(json.dumps(menu))
+    with pytest.raises(ArtifactError, match="stale"):
+        read_artifact(artifact_path(menu_file), menu_file)
+
+    compiled, source = load_menu_index(menu_file)
+    assert source == "json"
+    assert compiled.price({"category": "kebabs", "protein": "lamb", "size": "large"}) == 16.0
+    assert load_menu_index(menu_file)[1] == "artifact"  # written back
+
+    data = bytearray(Path(artifact_path(menu_file)).read_bytes())
+    data[-1] ^= 0xFF
+    Path(artifact_path(menu_file)).write_bytes(bytes(data))
+    with pytest.raises(ArtifactError, match="checksum"):
+        read_artifact(artifact_path(menu_file), menu_file)
+    assert load_menu_index(menu_file, write_back=False)[1] == "json"
+
+
+def test_compile_menu_cli(menu_file, monkeypatch, capsys):
+    monkeypatch.setattr(server_module, "TENANTS", None)
+    monkeypatch.setattr(server_module, "_TENANTS_LOADED", True)
+    monkeypatch.setattr(server_module, "MENU_FILE", menu_file)
+
+    assert main(["compile-menu", "--check"]) == 1
+    assert main(["compile-menu"]) == 0
+    assert main(["compile-menu", "--check"]) == 0
+    assert "up to date" in capsys.readouterr().out
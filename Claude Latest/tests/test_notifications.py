@@ -0,0 +1,87 @@
+import time
+
+import pytest
+
+from kebabalab.notifications import LocalTransport, NotificationService, SmsOutbox
+from kebabalab.server import (
+    app,
+    session_set,
+    start_notifications,
+    stop_notifications,
+    tool_create_order,
+    tool_quick_add_item,
+    tool_send_menu_link,
+    tool_set_pickup_time,
+)
+
+
+def test_worker_retries_with_backoff_until_sent(tmp_path):
+    outbox = SmsOutbox(str(tmp_path / "outbox.db"), max_attempts=5, backoff_base=0.01)
+    transport = LocalTransport(fail_times=2)
+    service = NotificationService(outbox, transport, workers=2, poll_interval=0.05).start()
+    try:
+        service.enqueue("+61412345678", "hello")
+        assert service.drain(timeout=5)
+    finally:
+        service.stop()
+
+    assert transport.sent == [("+61412345678", "hello")]
+    assert service.stats == {"sent": 1, "retried": 2, "failed": 0}
+    assert outbox.counts() == {"sent": 1}
+
+
+def test_message_marked_failed_after_max_attempts(tmp_path):
+    outbox = SmsOutbox(str(tmp_path / "outbox.db"), max_attempts=2, backoff_base=0.01)
+    service = NotificationService(outbox, LocalTransport(fail_times=10), poll_interval=0.05).start()
+    try:
+        service.enqueue("+61412345678", "never arrives")
+        assert service.drain(timeout=5)
+    finally:
+        service.stop()
+
+    assert outbox.counts() == {"failed": 1}
+
+
+def test_stuck_messages_are_requeued_on_start(tmp_path):
+    outbox = SmsOutbox(str(tmp_path / "outbox.db"))
+    outbox.enqueue("+61412345678", "crashed mid-send")
+    assert outbox.claim() is not None
+    assert outbox.counts() == {"sending": 1}
+
+    transport = LocalTransport()
+    service = NotificationService(outbox, transport, poll_interval=0.05).start()
+    try:
+        assert service.drain(timeout=5)
+    finally:
+        service.stop()
+    assert transport.sent == [("+61412345678", "crashed mid-send")]
+
+
+@pytest.fixture
+def outbox_server(orders_db):
+    transport = LocalTransport(delay=0.2)
+    service = start_notifications(transport=transport, workers=2)
+    yield service, transport
+    stop_notifications()
+
+
+def test_create_order_does_not_wait_for_sms(outbox_server):
+    service, transport = outbox_server
+
+    with app.test_request_context(json={"message": {"call": {"id": "outbox-order"}}}):
+        session_set("cart", [])
+        tool_quick_add_item({"description": "small chicken kebab with garlic sauce"})
+        tool_set_pickup_time({"requestedTime": "in 20 minutes"})
+
+        started = time.perf_counter()
+        result = tool_create_order({"customerName": "Tom", "customerPhone": "0423680596"})
+        elapsed = time.perf_counter() - started
+
+        assert result["ok"] is True
+        assert elapsed < 0.2
+
+        assert tool_send_menu_link({"phoneNumber": "0412345678"})["ok"] is True
+
+    assert service.drain(timeout=5)
+    recipients = sorted(to for to, _ in transport.sent)
+    assert recipients == ["+61412345678", "+61423680596", "+61423680596"]
@@ -0,0 +1,78 @@
+import json
+import sqlite3
+
+import pytest
+
+from kebabalab.server import (
+    app,
+    backfill_order_items,
+    session_set,
+    tool_create_order,
+    tool_quick_add_item,
+    tool_set_pickup_time,
+)
+
+
+def _insert_legacy_order(db_path, order_number, cart):
+    conn = sqlite3.connect(db_path)
+    conn.execute(
+        '''
+        INSERT INTO orders (order_number, customer_name, customer_phone, cart_json, subtotal, gst, total)
+        VALUES (?, 'Legacy', '0412345678', ?, 9.09, 0.91, 10.0)
+        ''',
+        (order_number, json.dumps(cart)),
+    )
+    conn.commit()
+    conn.close()
+
+
+def test_create_order_writes_order_items(orders_db):
+    ctx = app.test_request_context(json={"message": {"call": {"id": "order-items"}}})
+    ctx.__enter__()
+    try:
+        session_set("cart", [])
+        tool_quick_add_item({"description": "2 large lamb kebabs with garlic sauce and cheese"})
+        tool_quick_add_item({"description": "small chips"})
+        tool_set_pickup_time({"requestedTime": "in 20 minutes"})
+
+        result = tool_create_order({"customerName": "Tom", "customerPhone": "0423680596"})
+        assert result["ok"] is True
+    finally:
+        ctx.__exit__(None, None, None)
+
+    conn = sqlite3.connect(orders_db)
+    rows = conn.execute(
+        "SELECT category, protein, size, quantity, unit_price, extras FROM order_items ORDER BY line_no"
+    ).fetchall()
+    conn.close()
+
+    assert rows[0][:4] == ("kebabs", "lamb", "large", 2)
+    assert rows[0][4] == pytest.approx(15.0)
+    assert json.loads(rows[0][5]) == ["cheese"]
+    assert rows[1][0] == "chips"
+
+
+def test_backfill_is_batched_and_idempotent(orders_db):
+    for n in range(5):
+        _insert_legacy_order(
+            orders_db,
+            f"20250101-{n:03d}",
+            [{"category": "kebabs", "protein": "chicken", "size": "small", "quantity": 1, "price": 10.0}],
+        )
+    _insert_legacy_order(orders_db, "20250101-999", "not a cart")
+
+    stats = backfill_order_items(batch_size=2)
+    assert stats["orders"] == 5
+    assert stats["items"] == 5
+    assert stats["skipped"] == 1
+    assert stats["batches"] == 3
+
+    again = backfill_order_items(batch_size=2)
+    assert again["items"] == 0
+
+    conn = sqlite3.connect(orders_db)
+    total = conn.execute(
+        "SELECT SUM(quantity) FROM order_items WHERE category = 'kebabs' AND protein = 'chicken'"
+    ).fetchone()[0]
+    conn.close()
+    assert total == 5
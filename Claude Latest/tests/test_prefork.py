@@ -0,0 +1,84 @@
+import os
+import signal
+import subprocess
+import sys
+import threading
+import urllib.request
+
+import pytest
+
+from kebabalab import server as server_module
+from kebabalab.server import DatabaseConnection, SqlitePool
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_MASTER = """
+import os, sys, time
+from kebabalab.prefork import PreforkServer
+
+def app(environ, start_response):
+    if environ["PATH_INFO"] == "/slow":
+        time.sleep(1.0)
+    start_response("200 OK", [("Content-Type", "text/plain")])
+    return [str(os.getpid()).encode()]
+
+server = PreforkServer(app, host="127.0.0.1", port=0, workers=2, threads=2, drain_timeout=10)
+print(server.bind()[1], flush=True)
+sys.exit(server.run())
+"""
+
+
+def _get(port, path="/"):
+    with urllib.request.urlopen(f"http://127.0.0.1:{port}{path}", timeout=10) as response:
+        return response.status, response.read().decode()
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="pre-forking needs os.fork")
+def test_workers_serve_and_drain_on_sigterm():
+    env = dict(os.environ, PYTHONPATH=PROJECT_ROOT)
+    master = subprocess.Popen(
+        [sys.executable, "-c", _MASTER], env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True,
+    )
+    try:
+        port = int(master.stdout.readline())
+        statuses = [_get(port) for _ in range(6)]
+        assert all(status == 200 for status, _ in statuses)
+        assert all(int(pid) != master.pid for _, pid in statuses)
+
+        # A request already in flight when SIGTERM arrives still completes
+        slow = {}
+        thread = threading.Thread(target=lambda: slow.update(result=_get(port, "/slow")))
+        thread.start()
+        threading.Event().wait(0.3)
+        master.send_signal(signal.SIGTERM)
+        thread.join(10)
+
+        assert slow["result"][0] == 200
+        assert master.wait(15) == 0
+    finally:
+        if master.poll() is None:
+            master.kill()
+
+
+def test_sqlite_pool_reuses_connections(orders_db, tmp_path, monkeypatch):
+    pool = SqlitePool(str(orders_db), size=2)
+    monkeypatch.setattr(server_module, "DB_POOL", pool)
+
+    with DatabaseConnection() as cursor:
+        first = cursor.connection
+        cursor.execute("SELECT COUNT(*) FROM orders")
+    with DatabaseConnection() as cursor:
+        assert cursor.connection is first
+
+    # A failed block rolls back and the connection is still reusable
+    with pytest.raises(RuntimeError):
+        with DatabaseConnection() as cursor:
+            cursor.execute("DELETE FROM orders")
+            raise RuntimeError("boom")
+    with DatabaseConnection() as cursor:
+        assert cursor.connection is first
+        assert not cursor.connection.in_transaction
+
+    # Other databases bypass the pool
+    with DatabaseConnection(str(tmp_path / "other.db")) as cursor:
+        assert cursor.connection is not first
@@ -0,0 +1,101 @@
+import json
+import threading
+
+import fakeredis
+import pytest
+
+from kebabalab import server as server_module
+from kebabalab.metrics import METRICS
+from kebabalab.ratelimit import (
+    AdmissionControl, Limit, MemoryBucketStore, RateLimiter, RedisBucketStore, parse_limit, parse_tool_limits,
+)
+from kebabalab.server import app
+
+
+@pytest.fixture
+def limits(monkeypatch):
+    monkeypatch.setattr(server_module, "get_redis_client", lambda: None)
+    monkeypatch.setattr(server_module, "RATE_LIMITS_ENABLED", True)
+    monkeypatch.setattr(server_module, "RATE_LIMIT_SESSION", Limit(5, 60))
+    monkeypatch.setattr(server_module, "RATE_LIMIT_TOOLS", {"sendMenuLink": Limit(1, 600)})
+    METRICS.reset()
+
+
+def _call(tool, caller="+61400000077", **args):
+    message = {
+        "type": "tool-calls",
+        "toolCalls": [{"id": "t1", "function": {"name": tool, "arguments": json.dumps(args)}}],
+        "call": {"id": "limit-call", "customer": {"number": caller}},
+    }
+    response = app.test_client().post("/webhook", json={"message": message})
+    return response.get_json()["results"][0]["result"]
+
+
+def test_parse_limits():
+    assert parse_limit("30/60") == Limit(30, 60.0)
+    assert parse_limit("0") is None and parse_limit("") is None
+    assert parse_tool_limits("createOrder=3/300, bogus, sendReceipt=0") == {"createOrder": Limit(3, 300.0)}
+
+
+@pytest.mark.parametrize("store_factory", [
+    MemoryBucketStore,
+    lambda: RedisBucketStore(fakeredis.FakeRedis(decode_responses=True)),
+], ids=["memory", "redis"])
+def test_buckets_refill_and_charge_all_or_nothing(store_factory):
+    limiter = RateLimiter(store_factory(), Limit(3, 3), {"createOrder": Limit(1, 10)})
+
+    assert limiter.check("s1", "createOrder", now=100).allowed
+    denied = limiter.check("s1", "createOrder", now=100)
+    assert (denied.allowed, denied.scope, denied.retry_after) == (False, "tool", 10.0)
+
+    # The denied call took nothing from the session bucket: two calls are left
+    assert limiter.check("s1", "getCartState", now=100).allowed
+    assert limiter.check("s1", "getCartState", now=100).allowed
+    assert limiter.check("s1", "getCartState", now=100).scope == "session"
+    assert limiter.check("s2", "getCartState", now=100).allowed  # other callers are unaffected
+
+    assert limiter.check("s1", "getCartState", now=101).allowed  # one token a second
+    assert limiter.check("s1", "createOrder", now=111).allowed
+
+
+def test_webhook_refuses_calls_over_the_limit(limits):
+    assert "rateLimited" not in _call("sendMenuLink", phoneNumber="0412345678")
+    result = _call("sendMenuLink", phoneNumber="0412345678")
+    assert result["ok"] is False and result["rateLimited"] is True
+    assert result["retryAfterSeconds"] == 600
+
+    for _ in range(4):  # the refused call didn't use up a session token
+        assert _call("getCartState")["ok"] is True
+    assert _call("getCartState")["rateLimited"] is True
+    assert _call("getCartState", caller="+61400000078")["ok"] is True
+
+    assert METRICS.get("webhook_rate_limited_total", tool="sendMenuLink", scope="tool") == 1
+    assert METRICS.get("webhook_rate_limited_total", tool="getCartState", scope="session") == 1
+
+
+def test_busy_process_sheds_tool_calls(limits, monkeypatch):
+    admission = AdmissionControl(1, wait_seconds=0.01)
+    monkeypatch.setattr(server_module, "ADMISSION", admission)
+    monkeypatch.setattr(server_module, "RATE_LIMITS_ENABLED", False)
+
+    running, release = threading.Event(), threading.Event()
+
+    def hold():
+        with admission.admit():
+            running.set()
+            release.wait(5)
+
+    holder = threading.Thread(target=hold)
+    holder.start()
+    try:
+        assert running.wait(5)
+        result = _call("getCartState")
+        assert result["ok"] is False and result["busy"] is True
+        assert "one moment" in result["error"].lower()
+    finally:
+        release.set()
+        holder.join()
+
+    assert _call("getCartState")["ok"] is True
+    assert admission.in_flight == 0
+    assert METRICS.get("webhook_shed_total", tool="getCartState") == 1
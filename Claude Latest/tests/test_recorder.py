@@ -0,0 +1,116 @@
+import json
+import sqlite3
+
+import pytest
+
+from kebabalab import server as server_module
+from kebabalab.recorder import CallRecorder, load_recordings, read_records, replay, same_result
+from kebabalab.server import SESSIONS, app
+
+
+@pytest.fixture
+def recording(orders_db, tmp_path, monkeypatch):
+    recorder = CallRecorder(str(tmp_path / "calls"), flush_interval=0.05).start()
+    monkeypatch.setattr(server_module, "RECORDER", recorder)
+    yield recorder
+    recorder.stop()
+
+
+def _post(call_id, caller, *calls):
+    message = {
+        "type": "tool-calls",
+        "toolCalls": [
+            {"id": f"t{i}", "function": {"name": tool, "arguments": json.dumps(args)}}
+            for i, (tool, args) in enumerate(calls)
+        ],
+        "call": {"id": call_id, "customer": {"number": caller}},
+        "assistant": {"id": "asst-1", "model": {"messages": ["a long system prompt"]}},
+    }
+    return app.test_client().post("/webhook", json={"message": message}).get_json()["results"]
+
+
+def _conversation(call_id, caller):
+    _post(call_id, caller, ("clearCart", {}))
+    _post(call_id, caller, ("quickAddItem", {"description": "large lamb kebab with garlic"}),
+          ("getCartState", {"verbosity": "full"}))
+    _post(call_id, caller, ("priceCart", {}))
+
+
+def test_recorder_round_trip_and_torn_tail(tmp_path):
+    recorder = CallRecorder(str(tmp_path), flush_interval=0.01, block_records=2).start()
+    for i in range(5):
+        assert recorder.record({"t": i, "n": i})
+    recorder.stop()
+    assert [record["n"] for record in read_records(recorder.path)] == [0, 1, 2, 3, 4]
+
+    with open(recorder.path, "ab") as f:
+        f.write(b"\x00\x00\x01\x00partial")  # a block cut off mid-write
+    assert len(list(read_records(recorder.path))) == 5
+
+
+def test_webhooks_are_recorded_with_results_and_session_changes(recording):
+    _conversation("rec-1", "+61400000031")
+    recording.stop()
+
+    records = load_recordings([recording.path])
+    assert [len(record["calls"]) for record in records] == [1, 2, 1]
+    add, state = records[1]["calls"]
+    assert add["tool"] == "quickAddItem" and add["args"] == {"description": "large lamb kebab with garlic"}
+    assert add["result"]["ok"] is True and add["ms"] >= 0
+    assert add["session"]["cart"][0]["protein"] == "lamb"
+    assert state["args"] == {"verbosity": "full"} and state["session"] == {}
+    assert records[0]["message"] == {
+        "call": {"id": "rec-1", "customer": {"number": "+61400000031"}}, "assistant": {"id": "asst-1"},
+    }
+    assert records[0]["session"] == "+61400000031" and records[0]["callId"] == "rec-1"
+
+
+def test_replay_reproduces_the_recorded_results(recording):
+    _conversation("rec-2", "+61400000032")
+    _conversation("rec-3", "+61400000033")
+    recording.stop()
+    records = load_recordings([recording.path])
+
+    for caller in ("+61400000032", "+61400000033"):
+        SESSIONS.pop(caller, None)
+
+    def send(message):
+        return app.test_client().post("/webhook", json={"message": message}).get_json()["results"]
+
+    stats = replay(records, send, speed=0, concurrency=2)
+    assert stats["webhooks"] == 6 and stats["toolCalls"] == 8
+    assert stats["matched"] == 8 and stats["mismatched"] == [] and stats["errors"] == 0
+
+
+def test_results_are_compared_without_volatile_fields():
+    assert same_result({"ok": True, "orderNumber": "20250101-001"}, {"ok": True, "orderNumber": "20250102-007"})
+    assert not same_result({"ok": True, "total": 10.0}, {"ok": True, "total": 12.0})
+
+
+
+def test_in_process_replay_stays_out_of_the_live_shop(recording, orders_db, monkeypatch):
+    _conversation("rec-4", "+61400000034")
+    _post("rec-4", "+61400000034", ("setPickupTime", {"requestedTime": "in 30 minutes"}),
+          ("createOrder", {"customerName": "Sam", "customerPhone": "+61400000034"}))
+    recording.stop()
+    SESSIONS.pop("+61400000034", None)
+
+    def count_orders(path):
+        return sqlite3.connect(path).execute("SELECT COUNT(*) FROM orders").fetchone()[0]
+
+    assert count_orders(orders_db) == 1
+    for name in ("DB_FILE", "ARCHIVE_DIR", "BACKUP_DIR", "TENANTS_FILE", "SMS_TRANSPORT", "CALL_RECORD_DIR",
+                 "RATE_LIMITS_ENABLED", "RATE_LIMITER", "NOTIFIER", "SLOTS", "TENANTS", "_TENANTS_LOADED"):
+        monkeypatch.setattr(server_module, name, getattr(server_module, name))
+    monkeypatch.setattr(server_module, "_LOGGING_CONFIGURED", True)
+    monkeypatch.setattr(server_module, "_REDIS_CHECKED", False)  # the sandbox must not go looking for Redis
+    monkeypatch.setattr(server_module, "REDIS_CLIENT", None)
+    monkeypatch.setattr(server_module, "_send_sms", lambda *a, **k: pytest.fail("replay sent a real SMS"))
+
+    assert server_module.main(["replay", recording.path, "--in-process", "--speed", "0", "--db", str(orders_db)]) == 1
+    assert server_module.main(["replay", recording.path, "--in-process", "--speed", "0"]) == 0
+
+    sandbox_db = server_module.DB_FILE
+    assert sandbox_db != str(orders_db) and server_module.REDIS_CLIENT is None
+    assert server_module.get_tenants() is None
+    assert count_orders(sandbox_db) == 1 and count_orders(orders_db) == 1
@@ -0,0 +1,73 @@
+from kebabalab import server as server_module
+from kebabalab.render_cache import RenderCache, content_key
+from kebabalab.server import _format_item_for_sms, format_cart_item, load_menu
+
+KEBAB = {
+    "category": "kebabs",
+    "name": "Large Lamb Kebab",
+    "size": "large",
+    "protein": "lamb",
+    "salads": ["lettuce", "tomato"],
+    "sauces": ["garlic"],
+    "extras": [],
+    "quantity": 1,
+    "is_combo": False,
+    "cheese": False,
+}
+
+
+def test_repeat_renders_hit_the_cache():
+    cache = RenderCache()
+    calls = []
+
+    def render(item):
+        calls.append(item)
+        return item["name"]
+
+    assert cache.get("speech", KEBAB, render) == "Large Lamb Kebab"
+    assert cache.get("speech", dict(KEBAB), render) == "Large Lamb Kebab"
+    assert len(calls) == 1
+    assert cache.stats() == {"size": 1, "hits": 1, "misses": 1}
+
+    # Same item, different kind of render
+    cache.get("sms", KEBAB, render)
+    assert len(calls) == 2
+
+
+def test_in_place_edits_change_the_key():
+    item = dict(KEBAB, salads=list(KEBAB["salads"]))
+    before = content_key(item)
+    item["salads"].append("onion")
+    assert content_key(item) != before
+    item["salads"].pop()
+    assert content_key(item) == before
+
+    assert content_key({"name": "x", "meta": {"a": [1]}})  # nested values still get a key
+
+
+def test_lru_evicts_oldest_entries():
+    cache = RenderCache(maxsize=2)
+    for n in range(3):
+        cache.get("speech", {"n": n}, lambda item: str(item["n"]))
+    assert len(cache) == 2
+    assert cache.get("speech", {"n": 0}, lambda item: "fresh") == "fresh"
+
+
+def test_cached_lines_match_fresh_renders_and_follow_edits():
+    server_module.RENDER_CACHE.clear()
+    item = dict(KEBAB)
+    first = format_cart_item(item, 1)
+    assert format_cart_item(item, 3) == "3." + first[2:]
+    assert first == "1. " + server_module._render_cart_item(item)
+
+    item["size"] = "small"
+    assert "Small" in format_cart_item(item, 1)
+    assert _format_item_for_sms(item) == server_module._render_item_for_sms(item)
+    assert _format_item_for_sms(item, compact=True) == server_module._render_item_for_sms(item, compact=True)
+
+
+def test_menu_reload_clears_cache():
+    format_cart_item(KEBAB, 1)
+    assert len(server_module.RENDER_CACHE) > 0
+    load_menu()
+    assert len(server_module.RENDER_CACHE) == 0
@@ -0,0 +1,128 @@
+import csv
+import io
+import json
+import sqlite3
+from datetime import date
+
+import pytest
+import pytz
+
+from kebabalab import server as server_module
+from kebabalab.archive import rollover_orders
+from kebabalab.reports import iter_csv, iter_json_array, iter_order_export, sales_report, utc_bounds
+from kebabalab.server import app, main
+
+MELBOURNE = pytz.timezone("Australia/Melbourne")
+
+# created_at is UTC; Melbourne is UTC+11 in January and UTC+10 in June
+ORDERS = [
+    # number, created_at (UTC), total, status, items [(protein, qty, unit price)]
+    ("20250109-001", "2025-01-09 22:30:00", 30.0, "completed", [("lamb", 2, 15.0)]),   # 10 Jan 09:30 local
+    ("20250110-001", "2025-01-10 07:15:00", 25.0, "completed", [("chicken", 1, 15.0), ("lamb", 1, 10.0)]),
+    ("20250110-002", "2025-01-10 08:00:00", 99.0, "cancelled", [("lamb", 9, 11.0)]),
+    ("20250601-001", "2025-06-01 02:00:00", 15.0, "pending", [("mixed", 1, 15.0)]),     # 1 Jun 12:00 local
+]
+
+
+@pytest.fixture
+def sales_db(orders_db, monkeypatch):
+    monkeypatch.setattr(server_module, "SHOP_TIMEZONE", MELBOURNE)
+    monkeypatch.setattr(server_module, "ADMIN_API_TOKEN", "secret")
+
+    conn = sqlite3.connect(orders_db)
+    for number, created_at, total, status, items in ORDERS:
+        cursor = conn.execute(
+            "INSERT INTO orders (order_number, customer_name, customer_phone, cart_json, subtotal, gst, total,"
+            " status, created_at) VALUES (?, 'Sam', '0400000000', '[]', ?, ?, ?, ?, ?)",
+            (number, round(total / 1.1, 2), round(total - total / 1.1, 2), total, status, created_at),
+        )
+        for line_no, (protein, quantity, price) in enumerate(items):
+            conn.execute(
+                "INSERT INTO order_items (order_id, line_no, category, name, protein, size, quantity, unit_price)"
+                " VALUES (?, ?, 'kebabs', ?, ?, 'small', ?, ?)",
+                (cursor.lastrowid, line_no, f"Small {protein.title()} Kebab", protein, quantity, price),
+            )
+    conn.commit()
+    conn.close()
+    return orders_db
+
+
+def test_sales_report_groups_by_local_day_and_hour(sales_db):
+    report = sales_report(str(sales_db), MELBOURNE)
+
+    daily = report.rows("daily")
+    assert [row["date"] for row in daily] == ["2025-01-10", "2025-06-01"]
+    assert daily[0]["orders"] == 2 and daily[0]["items"] == 4
+    assert daily[0]["total"] == 55.0
+    assert daily[0]["gst"] == pytest.approx(5.0, abs=0.02)
+
+    assert report.rows("hourly") == [
+        {"hour": 9, "orders": 1, "total": 30.0},
+        {"hour": 12, "orders": 1, "total": 15.0},
+        {"hour": 18, "orders": 1, "total": 25.0},
+    ]
+
+    top = report.rows("items", top=1)
+    assert top == [{"category": "kebabs", "name": "Small Lamb Kebab", "size": "small", "protein": "lamb",
+                    "quantity": 3, "revenue": 40.0}]
+    assert report.summary()["orders"] == 3
+
+
+def test_date_range_uses_local_days(sales_db):
+    lower, upper = utc_bounds(date(2025, 1, 10), date(2025, 1, 10), MELBOURNE)
+    assert (lower, upper) == ("2025-01-09 13:00:00", "2025-01-10 13:00:00")
+
+    report = sales_report(str(sales_db), MELBOURNE, date(2025, 6, 1), None)
+    assert report.summary()["orders"] == 1
+
+
+def test_reports_include_archived_months(sales_db, tmp_path):
+    archive_dir = tmp_path / "archive"
+    stats = rollover_orders(str(sales_db), str(archive_dir), older_than_days=30)
+    assert stats["orders"] == 4
+
+    report = sales_report(str(sales_db), MELBOURNE, archive_dir=str(archive_dir))
+    assert report.summary()["orders"] == 3
+    exported = list(iter_order_export(str(sales_db), MELBOURNE, archive_dir=str(archive_dir)))
+    assert [row["order_number"] for row in exported] == ["20250109-001", "20250110-001", "20250601-001"]
+    assert exported[0]["created_at"] == "2025-01-10T09:30:00+11:00"
+
+
+def test_streaming_writers_emit_valid_documents():
+    rows = ({"n": n, "name": f"row {n}"} for n in range(450))
+    chunks = list(iter_csv(rows, ["n", "name"], batch=200))
+    assert len(chunks) == 3
+    parsed = list(csv.DictReader(io.StringIO("".join(chunks))))
+    assert len(parsed) == 450 and parsed[-1]["name"] == "row 449"
+
+    assert json.loads("".join(iter_json_array(iter([])))) == []
+    assert json.loads("".join(iter_json_array(({"n": n} for n in range(5)), batch=2)))[4] == {"n": 4}
+
+
+def test_report_endpoints(sales_db):
+    client = app.test_client()
+    assert client.get("/reports/sales").status_code == 403
+
+    headers = {"Authorization": "Bearer secret"}
+    data = client.get("/reports/sales?from=2025-01-01&to=2025-01-31", headers=headers).get_json()
+    assert data["summary"]["orders"] == 2 and data["daily"][0]["date"] == "2025-01-10"
+
+    response = client.get("/reports/sales?format=csv&section=hourly", headers=headers)
+    assert response.mimetype == "text/csv"
+    assert response.get_data(as_text=True).splitlines()[0] == "hour,orders,total"
+    assert client.get("/reports/sales?from=yesterday", headers=headers).status_code == 400
+
+    exported = client.get("/reports/orders?format=json", headers=headers).get_json()
+    assert len(exported) == 3 and "items" in exported[0]
+    csv_text = client.get("/reports/orders", headers=headers).get_data(as_text=True)
+    assert csv_text.splitlines()[0].startswith("order_number,created_at")
+
+
+def test_report_cli(sales_db, tmp_path, capsys):
+    out = tmp_path / "items.csv"
+    assert main(["report", "sales", "--format", "csv", "--section", "items", "--top", "0", "-o", str(out)]) == 0
+    rows = list(csv.DictReader(out.open()))
+    assert [row["protein"] for row in rows] == ["lamb", "chicken", "mixed"]
+
+    assert main(["report", "orders", "--format", "json", "--from", "2025-06-01"]) == 0
+    assert [row["order_number"] for row in json.loads(capsys.readouterr().out)] == ["20250601-001"]
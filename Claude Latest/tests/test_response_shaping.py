@@ -0,0 +1,87 @@
+import json
+
+import pytest
+
+from kebabalab import server as server_module
+from kebabalab.server import app
+from kebabalab.shaping import parse_fields, parse_overrides, shape_response
+
+ITEM = {"category": "drinks", "name": "Coke", "quantity": 1, "price": 3.5}
+
+
+@pytest.fixture
+def webhook(monkeypatch):
+    monkeypatch.setattr(server_module, "get_redis_client", lambda: None)
+    monkeypatch.setattr(server_module, "RESPONSE_VERBOSITY", "compact")
+    monkeypatch.setattr(server_module, "RESPONSE_VERBOSITY_OVERRIDES", {})
+    client = app.test_client()
+
+    def call(tool, **args):
+        payload = {
+            "message": {
+                "type": "tool-calls",
+                "toolCalls": [{"id": "t1", "function": {"name": tool, "arguments": json.dumps(args)}}],
+                "call": {"id": "shaping-call"},
+            }
+        }
+        response = client.post("/webhook", json=payload)
+        return response.get_json()["results"][0]["result"]
+
+    call("clearCart")
+    return call
+
+
+def test_compact_profiles_drop_or_render_structured_fields():
+    render = lambda item: f"{item['name']} - ${item['price']:.2f}"  # noqa: E731
+    result = {"ok": True, "message": "Added", "item": ITEM, "cartSize": 1}
+
+    assert shape_response("quickAddItem", result, render_line=render) == {
+        "ok": True, "message": "Added", "itemLine": "Coke - $3.50", "cartSize": 1,
+    }
+    assert shape_response("quickAddItem", result, "full") is result
+    assert shape_response("getCartState", {"ok": True, "cart": [ITEM], "itemCount": 1}) == {"ok": True, "itemCount": 1}
+    # Tools without a profile, and errors, pass through untouched
+    assert shape_response("checkOpen", {"ok": True, "isOpen": True}) == {"ok": True, "isOpen": True}
+    error = {"ok": False, "error": "bad", "cart": [ITEM]}
+    assert shape_response("getCartState", error) is error
+
+
+def test_fields_select_keys_and_keep_ok():
+    result = {"ok": True, "cart": [ITEM], "formattedItems": ["1. Coke"], "itemCount": 1}
+    assert shape_response("getCartState", result, fields=["itemCount", "missing"]) == {"ok": True, "itemCount": 1}
+    assert parse_fields("itemCount, formattedItems") == ["itemCount", "formattedItems"]
+    assert parse_fields(None) is None
+    assert parse_overrides("getCartState=full, editCartItem=bogus,=full") == {"getCartState": "full"}
+
+
+def test_webhook_shapes_by_default_and_per_call(webhook):
+    added = webhook("quickAddItem", description="large lamb kebab with garlic sauce")
+    assert "item" not in added and added["itemLine"].startswith("Large Lamb kebab")
+
+    compact = webhook("getCartState")
+    assert "cart" not in compact and compact["formattedItems"]
+
+    full = webhook("getCartState", verbosity="FULL")
+    assert full["cart"][0]["protein"] == "lamb"
+
+    picked = webhook("getCartState", fields=["itemCount"])
+    assert picked == {"ok": True, "itemCount": 1}
+
+
+def test_per_tool_override(webhook, monkeypatch):
+    monkeypatch.setattr(server_module, "RESPONSE_VERBOSITY_OVERRIDES", {"getCartState": "full"})
+    webhook("quickAddItem", description="coke")
+    assert "cart" in webhook("getCartState")
+
+
+def test_compact_responses_are_much_smaller(webhook):
+    for description in ["2 large lamb kebabs with garlic and chilli", "small chicken hsp", "large chips", "2 cokes"]:
+        webhook("quickAddItem", description=description)
+
+    compact = json.dumps(webhook("getCartState"))
+    full = json.dumps(webhook("getCartState", verbosity="full"))
+    assert len(compact) < 0.6 * len(full)
+
+    edit_compact = json.dumps(webhook("editCartItem", itemIndex=0, modifications={"size": "small"}))
+    edit_full = json.dumps(webhook("editCartItem", itemIndex=0, modifications={"size": "large"}, verbosity="full"))
+    assert len(edit_compact) < 0.6 * len(edit_full)
@@ -0,0 +1,68 @@
+from datetime import datetime
+
+import pytest
+import pytz
+
+from kebabalab import server as server_module
+from kebabalab.schedule import MINUTES_PER_WEEK, WeeklySchedule
+from kebabalab.server import HOURS_FILE, app, check_trading_hours, tool_check_open, tool_set_pickup_time
+
+MELBOURNE = pytz.timezone("Australia/Melbourne")
+
+
+@pytest.fixture
+def schedule():
+    return WeeklySchedule.from_file(HOURS_FILE)
+
+
+def test_past_midnight_windows_are_indexed(schedule):
+    # Friday 11:00-02:00 and Saturday 11:00-02:00 spill into the next day
+    assert not schedule.is_open(datetime(2025, 10, 17, 1, 30))  # Friday 01:30, Thursday closed at 23:59
+    assert schedule.is_open(datetime(2025, 10, 18, 1, 30))  # Saturday 01:30, still Friday night
+    assert schedule.is_open(datetime(2025, 10, 19, 1, 59))  # Sunday 01:59, still Saturday night
+    assert not schedule.is_open(datetime(2025, 10, 19, 2, 0))
+    assert all(start < end <= MINUTES_PER_WEEK for start, end in schedule.intervals)
+
+
+def test_next_open_and_close(schedule):
+    status = schedule.status(datetime(2025, 10, 17, 23, 0))  # Friday 23:00
+    assert status.is_open is True
+    assert status.next_close == datetime(2025, 10, 18, 2, 0)
+
+    status = schedule.status(datetime(2025, 10, 20, 8, 15, 42))  # Monday morning
+    assert status.is_open is False
+    assert status.next_open == datetime(2025, 10, 20, 11, 0)
+    assert status.minutes_to_change == 165
+
+
+def test_sunday_night_wraps_into_monday():
+    wrap = WeeklySchedule.from_dict({"sunday": [{"open": "20:00", "close": "01:00"}]})
+    assert wrap.intervals == [(0, 60), (MINUTES_PER_WEEK - 240, MINUTES_PER_WEEK)]
+    assert wrap.is_open(datetime(2025, 10, 20, 0, 30))  # Monday 00:30
+    assert wrap.status(datetime(2025, 10, 19, 23, 0)).minutes_to_change == 120
+
+
+def test_status_is_cached_per_minute(schedule):
+    first = schedule.status(datetime(2025, 10, 20, 12, 0, 5))
+    assert schedule.status(datetime(2025, 10, 20, 12, 0, 55)) is first
+    assert schedule.status(datetime(2025, 10, 20, 12, 1, 0)) is not first
+
+
+def test_pickup_rejected_outside_trading_hours(monkeypatch):
+    monkeypatch.setattr(server_module, "ENFORCE_TRADING_HOURS", True)
+    monday_morning = MELBOURNE.localize(datetime(2025, 10, 20, 9, 0))
+    monkeypatch.setattr(server_module, "get_current_time", lambda: monday_morning)
+
+    assert "11:00 AM" in check_trading_hours(monday_morning)
+
+    with app.test_request_context(json={"message": {"call": {"id": "hours-check"}}}):
+        closed = tool_set_pickup_time({"requestedTime": "in 30 minutes"})
+        assert closed["ok"] is False
+        assert "open again at 11:00 AM" in closed["error"]
+
+        later = tool_set_pickup_time({"requestedTime": "12:30 pm"})
+        assert later["ok"] is True
+
+        status = tool_check_open({})
+        assert status["isOpen"] is False
+        assert status["opensAt"] == "11:00 AM"
@@ -0,0 +1,82 @@
+import json
+
+import pytest
+
+from kebabalab import server as server_module
+from kebabalab.compression import HEADER, compress_value, decompress_value
+from kebabalab.metrics import METRICS
+from kebabalab.server import app, session_get, session_set
+
+OFFICE_ORDER = [
+    {
+        "category": "kebabs",
+        "name": f"Large {protein.title()} Kebab",
+        "size": "large",
+        "protein": protein,
+        "salads": ["lettuce", "tomato", "onion"],
+        "sauces": ["garlic", "chilli"],
+        "extras": ["cheese"],
+        "quantity": 1,
+        "is_combo": False,
+        "cheese": True,
+        "price": 17.0,
+    }
+    for protein in ["lamb", "chicken", "mixed"] * 12
+]
+
+
+def test_small_values_are_left_alone():
+    packed = compress_value('{"name": "Sam"}', threshold=1024)
+    assert packed.value == '{"name": "Sam"}'
+    assert not packed.compressed
+    assert packed.bytes_saved == 0
+
+
+def test_large_values_round_trip_and_shrink():
+    text = json.dumps(OFFICE_ORDER)
+    packed = compress_value(text, threshold=1024)
+    assert packed.compressed and packed.value.startswith(HEADER)
+    assert packed.ratio > 3
+    assert packed.bytes_saved == len(text) - len(packed.value)
+    assert decompress_value(packed.value) == text
+
+
+def test_uncompressed_and_header_like_values_read_back():
+    assert decompress_value('[1, 2, 3]') == '[1, 2, 3]'
+    assert decompress_value(None) is None
+
+    odd = HEADER + "not really compressed"
+    assert decompress_value(compress_value(odd, threshold=1024).value) == odd
+
+    with pytest.raises(ValueError):
+        decompress_value(HEADER + "z" + "!!!!")
+    with pytest.raises(ValueError):
+        decompress_value(HEADER + "q" + "abc")
+
+
+def test_redis_sessions_compress_large_values(monkeypatch):
+    fakeredis = pytest.importorskip("fakeredis")
+    client = fakeredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(server_module, "get_redis_client", lambda: client)
+    monkeypatch.setattr(server_module, "SESSION_COMPRESS_THRESHOLD", 512)
+    METRICS.reset()
+
+    with app.test_request_context(json={"message": {"call": {"id": "office"}}}):
+        session_set("last_order_cart", OFFICE_ORDER)
+        session_set("customer_name", "Sam")
+
+        assert client.get("session:office:last_order_cart").startswith(HEADER)
+        assert client.get("session:office:customer_name") == "Sam"
+        assert session_get("last_order_cart") == OFFICE_ORDER
+
+        # Values written before compression was enabled
+        client.set("session:office:cart", json.dumps(OFFICE_ORDER[:2]))
+        assert session_get("cart") == OFFICE_ORDER[:2]
+
+        # A corrupt value reads as missing instead of failing the tool call
+        client.set("session:office:cart", HEADER + "z@@@")
+        assert session_get("cart", []) == []
+
+    assert METRICS.get("session_values_compressed_total") == 1
+    assert METRICS.get("session_compression_bytes_saved") > 0
+    assert METRICS.summary("session_compression_ratio")["max"] > 1
@@ -0,0 +1,162 @@
+from datetime import datetime
+
+import pytest
+
+from kebabalab import server as server_module
+from kebabalab.server import (
+    SHOP_TIMEZONE,
+    app,
+    session_set,
+    set_order_status,
+    tool_create_order,
+    tool_quick_add_item,
+    tool_set_pickup_time,
+)
+from kebabalab.slots import MemorySlotStore, RedisSlotStore, SlotScheduler
+
+DAY = 288  # five-minute slots
+
+
+def _fill(slots, slot):
+    while slots.reserve(slot):
+        pass
+
+
+def test_find_nearest_prefers_requested_then_closest_later():
+    slots = SlotScheduler(MemorySlotStore(), capacity=2)
+    requested = 10 * DAY + 200
+
+    assert slots.find_nearest(requested) == requested
+    _fill(slots, requested)
+    assert slots.find_nearest(requested, earliest=requested - 5) == requested + 1
+
+    # Equal distance both ways goes to the later slot; closer earlier slot wins
+    _fill(slots, requested + 1)
+    assert slots.find_nearest(requested, earliest=requested - 5) == requested - 1
+    _fill(slots, requested - 1)
+    _fill(slots, requested + 2)
+    assert slots.find_nearest(requested, earliest=requested - 5) == requested - 2
+
+    # Never earlier than ``earliest``
+    assert slots.find_nearest(requested, earliest=requested) == requested + 3
+
+
+def test_find_nearest_rolls_into_next_day():
+    slots = SlotScheduler(MemorySlotStore(), capacity=1)
+    last = 10 * DAY + DAY - 1
+    slots.reserve(last)
+    assert slots.find_nearest(last) == 11 * DAY
+
+
+def test_find_nearest_looks_back_across_the_utc_day_boundary():
+    slots = SlotScheduler(MemorySlotStore(), capacity=1)
+    # 11:05 in Melbourne (AEDT) is 00:05 UTC: the day's bitmap starts mid-lunch
+    requested = slots.slot_of(SHOP_TIMEZONE.localize(datetime(2026, 3, 6, 11, 5)))
+    day, index = divmod(requested, DAY)
+    assert index == 1
+    for slot in range(day * DAY, requested + 6):
+        slots.reserve(slot)
+
+    nearest = slots.find_nearest(requested, earliest=requested - 3)
+    assert slots.slot_start(nearest, SHOP_TIMEZONE).strftime("%H:%M") == "10:55"
+    assert slots.find_nearest(requested, earliest=day * DAY) == requested + 6  # 10:55 is too early
+
+
+def test_release_reopens_a_full_slot():
+    store = MemorySlotStore()
+    slots = SlotScheduler(store, capacity=2)
+    slot = 3 * DAY + 7
+    assert slots.reserve(slot) and slots.reserve(slot)
+    assert slots.reserve(slot) is False
+    assert slots.find_nearest(slot) == slot + 1
+
+    assert slots.release(slot) is True
+    assert store.count(slot) == 1
+    assert slots.find_nearest(slot) == slot
+
+
+def test_zero_capacity_disables_limits():
+    slots = SlotScheduler(MemorySlotStore(), capacity=0)
+    assert slots.enabled is False
+    assert all(slots.reserve(42) for _ in range(100))
+    assert slots.find_nearest(42) == 42
+
+
+def test_redis_store_matches_memory_store():
+    fakeredis = pytest.importorskip("fakeredis")
+    client = fakeredis.FakeRedis(decode_responses=True)
+    slots = SlotScheduler(RedisSlotStore(client), capacity=2)
+    slot = 5 * DAY + 100
+
+    assert slots.reserve(slot) and slots.reserve(slot)
+    assert slots.reserve(slot) is False
+    assert slots.store.count(slot, DAY) == 2
+    assert slots.find_nearest(slot) == slot + 1
+
+    assert slots.release(slot) is True
+    assert slots.find_nearest(slot) == slot
+    assert client.ttl("slots:5:counts") > 0
+
+
+@pytest.fixture
+def busy_evening(orders_db, monkeypatch):
+    monkeypatch.setattr(server_module, "SLOT_CAPACITY", 2)
+    now = SHOP_TIMEZONE.localize(datetime(2026, 3, 6, 14, 0))
+    monkeypatch.setattr(server_module, "get_current_time", lambda: now)
+
+
+def _order_at(call_id, requested_time):
+    with app.test_request_context(json={"message": {"call": {"id": call_id}}}):
+        session_set("cart", [])
+        tool_quick_add_item({"description": "small lamb kebab"})
+        pickup = tool_set_pickup_time({"requestedTime": requested_time})
+        order = tool_create_order({"customerName": "Sam", "customerPhone": "0412345678"})
+        return pickup, order
+
+
+def test_full_slot_offers_nearest_and_cancel_frees_it(busy_evening):
+    first = [_order_at(f"seven-{n}", "7pm") for n in range(2)]
+    assert all(order["ok"] for _, order in first)
+    assert first[0][0]["slotAdjusted"] is False
+
+    pickup, order = _order_at("seven-late", "7pm")
+    assert pickup["slotAdjusted"] is True
+    assert pickup["requestedAt"] == "7:00 PM"
+    assert pickup["readyAt"] == "7:05 PM"
+    assert "7:05 PM" in pickup["message"]
+    assert order["ok"] is True
+
+    assert set_order_status(first[0][1]["orderNumber"], "cancelled") is True
+    pickup, _ = _order_at("seven-again", "7pm")
+    assert pickup["slotAdjusted"] is False
+
+
+def test_create_order_rejects_slot_taken_after_pickup_was_set(busy_evening):
+    with app.test_request_context(json={"message": {"call": {"id": "slow-caller"}}}):
+        session_set("cart", [])
+        tool_quick_add_item({"description": "small lamb kebab"})
+        assert tool_set_pickup_time({"requestedTime": "7pm"})["slotAdjusted"] is False
+
+    _order_at("fast-1", "7pm")
+    _order_at("fast-2", "7pm")
+
+    with app.test_request_context(json={"message": {"call": {"id": "slow-caller"}}}):
+        result = tool_create_order({"customerName": "Sam", "customerPhone": "0412345678"})
+    assert result["ok"] is False
+    assert result["slotFull"] is True
+    assert result["nearestAvailable"] == "7:05 PM"
+
+
+def test_slot_counts_survive_a_restart_without_redis(busy_evening):
+    booked = [_order_at(f"before-restart-{n}", "7pm") for n in range(3)]
+    assert set_order_status(booked[0][1]["orderNumber"], "cancelled") is True
+    assert set_order_status(booked[1][1]["orderNumber"], "completed") is True
+
+    server_module.SLOTS = None  # a new worker: counts come back from orders.db
+    slots = server_module.get_slot_scheduler()
+    seven = slots.slot_of(SHOP_TIMEZONE.localize(datetime(2026, 3, 6, 19, 0)))
+    assert slots.store.count(seven) == 1 and slots.store.count(seven + 1) == 1
+
+    _order_at("after-restart", "7pm")
+    pickup, _ = _order_at("after-restart-late", "7pm")
+    assert pickup["slotAdjusted"] is True and pickup["readyAt"] == "7:05 PM"
@@ -0,0 +1,68 @@
+from kebabalab import server as server_module
+from kebabalab.metrics import METRICS
+from kebabalab.server import _build_cart_sms, _format_item_for_sms, _send_order_notifications
+from kebabalab.sms_format import GSM7, UCS2, segment_info, to_gsm7
+
+
+def _kebab(n):
+    return {
+        "category": "kebabs",
+        "size": "large",
+        "protein": ["lamb", "chicken", "mixed"][n % 3],
+        "salads": ["lettuce", "tomato", "onion"],
+        "sauces": ["garlic", "chilli"],
+        "extras": ["cheese"],
+        "quantity": 1 + n % 2,
+        "price": 15.0,
+    }
+
+
+def test_segment_counts_follow_carrier_rules():
+    assert segment_info("a" * 160) == (GSM7, 160, 1)
+    assert segment_info("a" * 161) == (GSM7, 161, 2)
+    assert segment_info("[]" * 10).units == 40  # extension characters cost two septets
+    assert segment_info("•" + "a" * 69) == (UCS2, 70, 1)
+    assert segment_info("🥙" + "a" * 69).segments == 2  # emoji is a surrogate pair
+
+
+def test_gsm7_variant_drops_emoji_and_bullets():
+    text = "🥙 KEBABALAB ORDER #001\n\nLarge Lamb Kebab\n  • Sauces: Garlic\nGözleme"
+    converted = to_gsm7(text)
+    assert converted == "KEBABALAB ORDER #001\n\nLarge Lamb Kebab\n  - Sauces: Garlic\nGözleme"
+    assert segment_info(converted).encoding == GSM7
+
+
+def test_cart_sms_prefers_gsm7_and_compacts_to_budget():
+    cart = [_kebab(n) for n in range(6)]
+    header = "🥙 KEBABALAB ORDER #042"
+    footer = "TOTAL: $135.00\nReady in 20 minutes\n\nThank you, Sam!"
+
+    rich = f"{header}\n\n" + "\n\n".join(_format_item_for_sms(i) for i in cart) + f"\n\n{footer}"
+    unbounded = _build_cart_sms(header, cart, footer)
+    assert unbounded.variant == "gsm7"
+    assert unbounded.info.segments < segment_info(rich).segments
+
+    compact = _build_cart_sms(header, cart, footer, budget=4)
+    assert compact.variant == "compact"
+    assert compact.info.segments <= 4
+    assert "Large Lamb Kebab (Lettuce, Tomato, Onion; Garlic, Chilli; +Cheese)" in compact.text
+
+    truncated = _build_cart_sms(header, cart, footer, budget=1, allow_truncate=True)
+    assert truncated.variant == "truncated"
+    assert truncated.info.segments == 1
+    assert "more items" in truncated.text
+
+
+def test_order_notifications_report_segment_metrics(monkeypatch):
+    sent = []
+    monkeypatch.setattr(server_module, "_get_twilio_client", lambda: (object(), "+61400000000"))
+    monkeypatch.setattr(server_module, "_send_sms", lambda phone, body: sent.append(body) or (True, None))
+    METRICS.reset()
+
+    _send_order_notifications("#007", "Sam", "0412345678", [_kebab(n) for n in range(4)], 60.0, "in 20 minutes")
+
+    assert len(sent) == 2
+    assert all(segment_info(body).encoding == GSM7 for body in sent)
+    assert METRICS.get("sms_messages_total", kind="order_customer", encoding=GSM7) == 1
+    assert METRICS.summary("sms_segments_per_message", kind="order_shop")["count"] == 1
+    assert METRICS.summary("sms_segments_per_message", kind="order_customer")["max"] <= 2
@@ -0,0 +1,57 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Generous enough for a slow CI box; a Redis ping or eager menu load blows well past it
+IMPORT_BUDGET_SECONDS = float(os.getenv("IMPORT_BUDGET_SECONDS", "1.5"))
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import kebabalab.server as server
+elapsed = time.perf_counter() - start
+print(json.dumps({
+    "elapsed": elapsed,
+    "modules": [m for m in ("rapidfuzz", "twilio", "redis") if m in sys.modules],
+    "menu_loaded": bool(server.MENU),
+}))
+"""
+
+
+def test_cold_import_is_fast_and_side_effect_free(tmp_path):
+    env = dict(os.environ, PYTHONPATH=PROJECT_ROOT, PYTHONDONTWRITEBYTECODE="1")
+    output = subprocess.run(
+        [sys.executable, "-c", _PROBE], cwd=tmp_path, env=env,
+        capture_output=True, text=True, check=True, timeout=60,
+    ).stdout
+    probe = json.loads(output.strip().splitlines()[-1])
+
+    assert probe["elapsed"] < IMPORT_BUDGET_SECONDS, f"cold import took {probe['elapsed']:.2f}s"
+    assert probe["modules"] == []
+    assert probe["menu_loaded"] is False
+    assert not (tmp_path / "logs").exists()
+
+
+def test_create_app_applies_config_and_loads_data(tmp_path, monkeypatch):
+    from kebabalab import server as server_module
+
+    for name in ("DB_FILE", "LOG_DIR", "SLOT_CAPACITY"):
+        monkeypatch.setattr(server_module, name, getattr(server_module, name))
+    monkeypatch.setattr(server_module, "_LOGGING_CONFIGURED", True)
+    monkeypatch.setattr(server_module, "_REDIS_CHECKED", True)
+    monkeypatch.setattr(server_module, "REDIS_CLIENT", None)
+
+    app = server_module.create_app({"DB_FILE": str(tmp_path / "orders.db"), "SLOT_CAPACITY": 9})
+
+    assert app is server_module.app
+    assert server_module.SLOT_CAPACITY == 9
+    assert (tmp_path / "orders.db").exists()
+    assert server_module.get_menu().get("categories")
+    assert server_module.get_schedule() is not None
+
+    with pytest.raises(ValueError):
+        server_module.create_app({"NOT_A_SETTING": 1})
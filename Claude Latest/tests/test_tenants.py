@@ -0,0 +1,135 @@
+import json
+import shutil
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+from kebabalab import server as server_module
+from kebabalab.notifications import LocalTransport
+from kebabalab.server import app, start_notifications, stop_notifications
+from kebabalab.tenants import TenantRegistry, TenantSpec, routing_key, routing_keys
+
+ROOT = Path(__file__).resolve().parents[1]
+PIZZA_DATA = ROOT.parent / "cranny-boys-pizza" / "data"
+
+
+def _tenant_dir(tmp_path, name, business):
+    data_dir = tmp_path / name
+    data_dir.mkdir()
+    shutil.copy(ROOT / "data" / "menu.json", data_dir / "menu.json")
+    (data_dir / "business.json").write_text(json.dumps(business))
+    return data_dir
+
+
+@pytest.fixture
+def tenants(orders_db, tmp_path, monkeypatch):
+
+    pizza_business = json.loads((PIZZA_DATA / "business.json").read_text())
+    pizza_dir = _tenant_dir(tmp_path, "pizza", pizza_business)
+    shutil.copy(PIZZA_DATA / "hours.json", pizza_dir / "hours.json")
+    burger_dir = _tenant_dir(tmp_path, "burgers", {"business_details": {"name": "Burger Barn"}})
+
+    registry = TenantRegistry(
+        [
+            TenantSpec({"id": "pizza", "data_dir": str(pizza_dir), "phone_numbers": ["03 9770 4755"]}, str(tmp_path)),
+            TenantSpec({"id": "burgers", "data_dir": str(burger_dir), "assistant_ids": ["asst-burgers"]}, str(tmp_path)),
+        ],
+        maxsize=1,
+        on_load=server_module._prepare_tenant,
+    )
+    monkeypatch.setattr(server_module, "TENANTS", registry)
+    monkeypatch.setattr(server_module, "_TENANTS_LOADED", True)
+
+    transport = LocalTransport()
+    start_notifications(transport=transport, workers=1)
+    yield registry, transport
+    stop_notifications()
+
+
+def _call(tool, route=None, caller="+61400000001", **args):
+    message = {
+        "type": "tool-calls",
+        "toolCalls": [{"id": "t1", "function": {"name": tool, "arguments": json.dumps(args)}}],
+        "call": {"id": "tenant-call", "customer": {"number": caller}},
+    }
+    if route is not None:
+        message.update(route)
+    response = app.test_client().post("/webhook", json={"message": message})
+    return response.get_json()["results"][0]["result"]
+
+
+PIZZA = {"phoneNumber": {"number": "+61397704755"}}
+BURGERS = {"assistant": {"id": "asst-burgers"}}
+
+
+def test_routing_keys_normalise_numbers():
+    assert routing_key("03 9770 4755") == routing_key("+61 3 9770 4755") == "61397704755"
+    assert routing_key("asst-burgers") == "asst-burgers"
+    assert routing_keys({"call": {"assistantId": "a1", "phoneNumberId": "pn-1"}, "assistant": {"id": "a1"}}) == [
+        "pn-1", "a1",
+    ]
+
+
+def test_registry_keeps_an_lru_of_active_tenants(tenants):
+    registry, _ = tenants
+    pizza = registry.resolve({"phoneNumber": {"number": "0397704755"}})
+    assert pizza.id == "pizza"
+    assert pizza.settings["name"] == "Cranny Boys Pizza"
+    assert registry.resolve({"call": {"assistantId": "unknown"}}) is None
+
+    assert registry.get("burgers").id == "burgers"
+    assert registry.stats()["active"] == ["burgers"]
+    assert registry.get("pizza") is not pizza  # evicted, reloaded on demand
+    assert registry.stats()["loads"] == 3 and registry.stats()["evictions"] == 2
+
+
+def test_sessions_are_namespaced_per_shop(tenants):
+    for route in (None, PIZZA, BURGERS):
+        _call("clearCart", route)
+    _call("quickAddItem", PIZZA, description="large lamb kebab")
+
+    assert _call("getCartState", PIZZA)["itemCount"] == 1
+    assert _call("getCartState", BURGERS)["itemCount"] == 0
+    assert _call("getCartState")["itemCount"] == 0
+
+
+def test_orders_and_sms_use_the_tenant_database_and_settings(tenants, orders_db, tmp_path):
+    _, transport = tenants
+    _call("clearCart", PIZZA)
+    _call("quickAddItem", PIZZA, description="small chicken kebab")
+    _call("setPickupTime", PIZZA, requestedTime="in 30 minutes")
+    assert _call("createOrder", PIZZA, customerName="Sam", customerPhone="0412345678")["ok"] is True
+
+    count = "SELECT COUNT(*) FROM orders"
+    assert sqlite3.connect(tmp_path / "pizza" / "orders.db").execute(count).fetchone()[0] == 1
+    assert sqlite3.connect(orders_db).execute(count).fetchone()[0] == 0
+
+    assert server_module.NOTIFIER.drain(timeout=5)
+    shop_sms = [body for to, body in transport.sent if to == "+61423680596" and "NEW ORDER" in body]
+    assert shop_sms and "Cranbourne West" in shop_sms[0]
+    assert any("CRANNY BOYS PIZZA ORDER" in body for _, body in transport.sent)
+
+
+def test_admin_endpoints_take_a_tenant(tenants, monkeypatch):
+    monkeypatch.setattr(server_module, "ADMIN_API_TOKEN", "secret")
+    headers = {"Authorization": "Bearer secret"}
+    client = app.test_client()
+
+    assert client.get("/reports/sales?tenant=nope", headers=headers).status_code == 404
+    data = client.get("/reports/sales?tenant=burgers", headers=headers).get_json()
+    assert data["ok"] is True and data["summary"]["orders"] == 0
+
+
+def test_a_shop_without_a_menu_refuses_calls_until_it_has_one(tenants, tmp_path):
+    registry, _ = tenants
+    pizza_menu = tmp_path / "pizza" / "menu.json"
+    pizza_menu.rename(tmp_path / "menu.json.bak")
+
+    result = _call("quickAddItem", PIZZA, description="large lamb kebab")
+    assert result["ok"] is False and result["unavailable"] is True
+    assert "pizza" not in registry.stats()["active"]  # the failure isn't cached
+    assert not (tmp_path / "pizza" / "orders.db").exists()
+
+    (tmp_path / "menu.json.bak").rename(pizza_menu)
+    assert _call("quickAddItem", PIZZA, description="large lamb kebab")["ok"] is True
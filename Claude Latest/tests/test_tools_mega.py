@@ -185,7 +185,7 @@ def test_small_chicken_kebab():
     result = call_tool("addItemToCart")
     r = get_result(result)
 
-    cart_result = call_tool("getCartState")
+    cart_result = call_tool("getCartState", {"verbosity": "full"})
     cart = get_result(cart_result).get("cart", [])
 
     return (
@@ -249,7 +249,7 @@ def test_kebab_no_salads():
     result = call_tool("addItemToCart")
     r = get_result(result)
 
-    cart_result = call_tool("getCartState")
+    cart_result = call_tool("getCartState", {"verbosity": "full"})
     cart = get_result(cart_result).get("cart", [])
 
     return (
@@ -340,7 +340,7 @@ def test_small_chips_chicken_salt():
     result = call_tool("addItemToCart")
     r = get_result(result)
 
-    cart_result = call_tool("getCartState")
+    cart_result = call_tool("getCartState", {"verbosity": "full"})
     cart = get_result(cart_result).get("cart", [])
 
     return (
@@ -358,7 +358,7 @@ def test_large_chips_normal_salt():
     result = call_tool("addItemToCart")
     r = get_result(result)
 
-    cart_result = call_tool("getCartState")
+    cart_result = call_tool("getCartState", {"verbosity": "full"})
     cart = get_result(cart_result).get("cart", [])
 
     return assert_equal(cart[0].get("salt_type"), "normal", "Salt type is normal")
@@ -373,7 +373,7 @@ def test_small_chips_no_salt():
     result = call_tool("addItemToCart")
     r = get_result(result)
 
-    cart_result = call_tool("getCartState")
+    cart_result = call_tool("getCartState", {"verbosity": "full"})
     cart = get_result(cart_result).get("cart", [])
 
     return assert_equal(cart[0].get("salt_type"), "none", "No salt")
@@ -402,7 +402,7 @@ def test_multiple_drinks():
         call_tool("setItemProperty", {"field": "brand", "value": drink})
         call_tool("addItemToCart")
 
-    cart_result = call_tool("getCartState")
+    cart_result = call_tool("getCartState", {"verbosity": "full"})
     cart = get_result(cart_result).get("cart", [])
 
     return assert_equal(len(cart), len(drinks), f"Cart has {len(drinks)} drinks")
@@ -728,7 +728,7 @@ def test_multiple_quantity():
     result = call_tool("addItemToCart")
     r = get_result(result)
 
-    cart_result = call_tool("getCartState")
+    cart_result = call_tool("getCartState", {"verbosity": "full"})
     cart = get_result(cart_result).get("cart", [])
 
     price_result = call_tool("priceCart")
@@ -896,7 +896,7 @@ def test_same_item_twice():
     call_tool("setItemProperty", {"field": "sauces", "value": ["garlic"]})
     call_tool("addItemToCart")
 
-    cart_result = call_tool("getCartState")
+    cart_result = call_tool("getCartState", {"verbosity": "full"})
     cart = get_result(cart_result).get("cart", [])
 
     return assert_equal(len(cart), 2, "Cart has 2 separate items")
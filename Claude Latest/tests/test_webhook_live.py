@@ -128,7 +128,7 @@ def run():
 
     # ── 7. getCartState ───────────────────────────────────────────
     print("\n[ getCartState ]")
-    passed, cart_resp = check("getCartState returns cart key", call_tool("getCartState", {}), expect_key="cart")
+    passed, cart_resp = check("getCartState returns cart key", call_tool("getCartState", {"verbosity": "full"}), expect_key="cart")
     if passed:
         cart_items = cart_resp.get("cart", [])
         ok = len(cart_items) >= 1
@@ -151,7 +151,7 @@ def run():
     # Add a drink to remove
     call_tool("quickAddItem", {"description": "pepsi"})
     # Now get cart to find last index
-    cart = call_tool("getCartState", {})
+    cart = call_tool("getCartState", {"verbosity": "full"})
     last_index = len(cart.get("cart", [])) - 1
     check(f"removeCartItem: remove item at index {last_index}",
           call_tool("removeCartItem", {"itemIndex": last_index}))
@@ -233,7 +233,7 @@ def run():
     print("\n[ clearCart ]")
     call_tool("quickAddItem", {"description": "chicken kebab"})
     check("clearCart empties cart", call_tool("clearCart", {}))
-    cart_after = call_tool("getCartState", {})
+    cart_after = call_tool("getCartState", {"verbosity": "full"})
     ok = len(cart_after.get("cart", [])) == 0
     results.append({"pass": ok, "name": "Cart is empty after clearCart", "detail": str(cart_after.get("cart", []))})
     print(f"  [{'PASS' if ok else 'FAIL'}] Cart is empty after clearCart")
@@ -276,7 +276,7 @@ def run():
         ("E2E: checkOpen", lambda: call_e2e("checkOpen", {}), True, "isOpen"),
         ("E2E: add chicken kebab", lambda: call_e2e("quickAddItem", {"description": "large chicken kebab"}), True, None),
         ("E2E: add chips", lambda: call_e2e("quickAddItem", {"description": "small chips"}), True, None),
-        ("E2E: view cart", lambda: call_e2e("getCartState", {}), True, "cart"),
+        ("E2E: view cart", lambda: call_e2e("getCartState", {"verbosity": "full"}), True, "cart"),
         ("E2E: set pickup time", lambda: call_e2e("setPickupTime", {"requestedTime": "15 minutes"}), True, None),
         ("E2E: create order", lambda: call_e2e("createOrder", {"customerName": "End Test", "customerPhone": "+61499000001"}), True, "orderNumber"),
     ]